@@ -0,0 +1,104 @@
+"""
+Configuração do gunicorn (`gunicorn -c python:app.gunicorn_conf ...`).
+
+Dimensiona processos e threads pela CPU e memória disponíveis para o
+container (limites do cgroup, quando houver), com o app pré-carregado e
+timeouts pensados para os uploads. Tudo pode ser sobrescrito por variáveis
+de ambiente (ver README, "Runtime do gunicorn"):
+
+* workers = min(2 × CPUs + 1, memória livre ÷ GUNICORN_WORKER_MEMORY_MB),
+  reservando GUNICORN_RESERVED_MB para o worker da fila e o ffmpeg;
+  WEB_CONCURRENCY fixa o número;
+* GUNICORN_THREADS threads por processo (gthread): enquanto uma thread
+  espera o banco, o disco ou o pool de codificação de imagens, as outras
+  atendem — um upload não trava o processo inteiro.
+"""
+import math
+import os
+
+
+def _env_int(name, default):
+    value = os.environ.get(name, "")
+    return int(value) if value.strip() else default
+
+
+def cpu_count():
+    """CPUs do container: cota do cgroup v2 (`cpu.max`), senão afinidade do processo."""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as fp:
+            quota, period = fp.read().split()[:2]
+        if quota != "max":
+            return max(1, math.ceil(int(quota) / int(period)))
+    except (OSError, ValueError):
+        pass
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def memory_bytes():
+    """Memória do container: limite do cgroup v2 (`memory.max`), senão a RAM da máquina. None se não souber."""
+    try:
+        with open("/sys/fs/cgroup/memory.max") as fp:
+            value = fp.read().strip()
+        if value != "max":
+            return int(value)
+    except (OSError, ValueError):
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, OSError, ValueError):
+        return None
+
+
+def worker_count():
+    if os.environ.get("WEB_CONCURRENCY", "").strip():
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    workers = 2 * cpu_count() + 1
+    memory = memory_bytes()
+    if memory:
+        free_mb = memory // (1024 * 1024) - _env_int("GUNICORN_RESERVED_MB", 256)
+        workers = min(workers, free_mb // _env_int("GUNICORN_WORKER_MEMORY_MB", 160))
+    return max(1, workers)
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+workers = worker_count()
+threads = max(1, _env_int("GUNICORN_THREADS", 4))
+# Com -k uvicorn_worker.UvicornWorker (SERVER_MODE=asgi) a linha de comando prevalece
+worker_class = "gthread" if threads > 1 else "sync"
+
+# Cada worker tem seu pool de codificação de imagens (imaging.get_pool): divide
+# as CPUs entre eles em vez de abrir CPUs × workers processos
+os.environ.setdefault("DIAGNOSTICS_IMAGE_WORKERS", str(max(1, cpu_count() // workers)))
+
+# Django, Pillow e o ORM carregados uma vez no master: forks mais rápidos e
+# páginas de memória compartilhadas (copy-on-write) entre os workers
+preload_app = os.environ.get("GUNICORN_PRELOAD", "true").lower() == "true"
+
+# Worker sem sinal de vida por `timeout` s é reiniciado. No modo sync é o
+# limite de cada request: cabe um pedaço de upload (DIAGNOSTICS_UPLOAD_CHUNK_MB)
+# numa conexão lenta. No gthread, só um processo travado chega a ele.
+timeout = _env_int("GUNICORN_TIMEOUT", 120)
+graceful_timeout = _env_int("GUNICORN_GRACEFUL_TIMEOUT", 30)
+keepalive = _env_int("GUNICORN_KEEPALIVE", 5)
+
+# Recicla os workers de tempos em tempos (fragmentação de memória do Pillow)
+max_requests = _env_int("GUNICORN_MAX_REQUESTS", 1000)
+max_requests_jitter = max(1, max_requests // 10) if max_requests else 0
+
+# Heartbeat dos workers em memória: /tmp do container pode ser disco lento
+if os.path.isdir("/dev/shm"):
+    worker_tmp_dir = "/dev/shm"
+
+errorlog = "-"
+loglevel = os.environ.get("GUNICORN_LOG_LEVEL", "info")
+accesslog = "-" if os.environ.get("GUNICORN_ACCESS_LOG", "").lower() == "true" else None
+
+
+def post_fork(server, worker):
+    # Conexões abertas pelo master no preload não podem ser herdadas pelos forks
+    if server.cfg.preload_app:
+        from django.db import connections
+
+        connections.close_all()
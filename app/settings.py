@@ -10,8 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+import dj_database_url
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -23,7 +26,8 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-4)u_9y-d3h8qqdia=_^%^z0ie%aguf%@ph_c$3)l5-tg*=**hk'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# DJANGO_DEBUG (ou DEBUG, como no render.yaml); sem nenhuma, modo dev
+DEBUG = os.environ.get("DJANGO_DEBUG", os.environ.get("DEBUG", "true")).lower() == "true"
 
 ALLOWED_HOSTS = ["*"]
 
@@ -42,8 +46,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'diagnostics.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    "whitenoise.middleware.WhiteNoiseMiddleware",
+    "app.middleware.WhiteNoiseMiddleware",
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -77,13 +82,65 @@ WSGI_APPLICATION = 'app.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# DATABASE_URL (Render/Postgres) ou, sem ela, SQLite local.
+# DB_CONN_MAX_AGE: segundos que cada worker mantém a conexão aberta entre
+# requests (0 = uma conexão nova por request), com health check antes do reuso.
+# DB_POOL=true (Postgres): pool de conexões do próprio Django/psycopg 3 por
+# processo, no lugar das conexões persistentes.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    "default": dj_database_url.config(
+        default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",
+        conn_max_age=int(os.environ.get("DB_CONN_MAX_AGE", "60")),
+        conn_health_checks=True,
+    )
 }
 
+if DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql":
+    if os.environ.get("DB_POOL", "false").lower() == "true":
+        DATABASES["default"]["CONN_MAX_AGE"] = 0
+        DATABASES["default"]["OPTIONS"] = {
+            "pool": {
+                "min_size": int(os.environ.get("DB_POOL_MIN_SIZE", "2")),
+                "max_size": int(os.environ.get("DB_POOL_MAX_SIZE", "10")),
+                "timeout": int(os.environ.get("DB_POOL_TIMEOUT", "10")),
+            },
+        }
+    # Atrás de um PgBouncer em modo transação, cursores no servidor
+    # (QuerySet.iterator() da exportação) não sobrevivem: desligue aqui
+    DATABASES["default"]["DISABLE_SERVER_SIDE_CURSORS"] = (
+        os.environ.get("DB_DISABLE_SERVER_SIDE_CURSORS", "false").lower() == "true"
+    )
+elif DATABASES["default"]["ENGINE"] == "django.db.backends.sqlite3":
+    # WAL: leituras não bloqueiam a escrita (gunicorn + worker da fila no
+    # mesmo arquivo). IMMEDIATE pega o lock de escrita no início da
+    # transação, e o timeout espera por ele em vez de falhar com
+    # "database is locked".
+    DATABASES["default"]["OPTIONS"] = {
+        "timeout": int(os.environ.get("DB_SQLITE_TIMEOUT", "20")),
+        "transaction_mode": "IMMEDIATE",
+        "init_command": "PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL",
+    }
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# Com DJANGO_CACHE_DIR definido, usa cache em arquivo (compartilhado entre os
+# workers do gunicorn no mesmo container); senão, memória local (dev/testes).
+
+if os.environ.get("DJANGO_CACHE_DIR"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.environ["DJANGO_CACHE_DIR"],
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -118,10 +175,102 @@ USE_TZ = True
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Mesmos handlers padrão do Django, calculando o SHA-256 de cada upload
+# durante o recebimento (deduplicação dos anexos, ver MediaBlob)
+FILE_UPLOAD_HANDLERS = [
+    "diagnostics.uploads.HashingMemoryFileUploadHandler",
+    "diagnostics.uploads.HashingTemporaryFileUploadHandler",
+]
+
 STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / "static"]
 STATIC_ROOT = BASE_DIR / "staticfiles"
 
+# Produção: collectstatic grava os arquivos com hash no nome (manifest) e as
+# versões .br/.gz; o WhiteNoise entrega a versão comprimida que o navegador
+# aceita, com cache de 1 ano `immutable` nos nomes com hash. Em dev (e nos
+# testes), o storage simples dispensa rodar collectstatic.
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    "staticfiles": {
+        "BACKEND": (
+            "django.contrib.staticfiles.storage.StaticFilesStorage" if DEBUG
+            else "whitenoise.storage.CompressedManifestStaticFilesStorage"
+        ),
+    },
+}
+
+# Fila de processamento de mídia (manage.py process_jobs)
+DIAGNOSTICS_JOB_CONCURRENCY = int(os.environ.get("DIAGNOSTICS_JOB_CONCURRENCY", "1"))
+DIAGNOSTICS_JOB_MAX_ATTEMPTS = int(os.environ.get("DIAGNOSTICS_JOB_MAX_ATTEMPTS", "3"))
+DIAGNOSTICS_TRANSCODE_TIMEOUT = int(os.environ.get("DIAGNOSTICS_TRANSCODE_TIMEOUT", "300"))
+# Vídeos acima disso (lado maior em px / bitrate em bit/s) são recomprimidos
+DIAGNOSTICS_VIDEO_MAX_DIMENSION = int(os.environ.get("DIAGNOSTICS_VIDEO_MAX_DIMENSION", "1280"))
+DIAGNOSTICS_VIDEO_MAX_BITRATE = int(os.environ.get("DIAGNOSTICS_VIDEO_MAX_BITRATE", "2500000"))
+# Gera também a tira de prévias (miniaturas ao passar o mouse) além da capa
+DIAGNOSTICS_VIDEO_SPRITES = os.environ.get("DIAGNOSTICS_VIDEO_SPRITES", "false").lower() == "true"
+
+# Upload retomável de vídeos: teto por vídeo, maior pedaço aceito por request,
+# horas sem atividade até a sessão expirar e onde ficam os arquivos parciais
+# (fora do MEDIA_ROOT, que é público; no mesmo disco, a montagem final é um rename)
+DIAGNOSTICS_VIDEO_UPLOAD_MAX_MB = int(os.environ.get("DIAGNOSTICS_VIDEO_UPLOAD_MAX_MB", "200"))
+DIAGNOSTICS_UPLOAD_CHUNK_MB = int(os.environ.get("DIAGNOSTICS_UPLOAD_CHUNK_MB", "8"))
+DIAGNOSTICS_UPLOAD_EXPIRE_HOURS = int(os.environ.get("DIAGNOSTICS_UPLOAD_EXPIRE_HOURS", "24"))
+DIAGNOSTICS_UPLOAD_PARTIAL_DIR = Path(os.environ.get("DIAGNOSTICS_UPLOAD_PARTIAL_DIR", BASE_DIR / "uploads-partial"))
+
+# Processos usados para codificar lotes de imagens (padrão: nº de CPUs)
+DIAGNOSTICS_IMAGE_WORKERS = int(os.environ.get("DIAGNOSTICS_IMAGE_WORKERS", "0")) or None
+
+# Variantes gravadas de cada imagem (o WEBP é sempre gerado; servidas conforme o Accept),
+# esforço do encoder (fast | balanced | max: latência da ingestão × tamanho) e
+# qualidade por formato (ex.: "avif=55,webp=80,jpeg=82"; vazio = padrões de imaging.py)
+DIAGNOSTICS_IMAGE_FORMATS = [f.strip() for f in os.environ.get("DIAGNOSTICS_IMAGE_FORMATS", "avif,webp,jpeg").split(",") if f.strip()]
+DIAGNOSTICS_IMAGE_EFFORT = os.environ.get("DIAGNOSTICS_IMAGE_EFFORT", "balanced")
+DIAGNOSTICS_IMAGE_QUALITY = {
+    fmt.strip(): int(value)
+    for fmt, _sep, value in (item.partition("=") for item in os.environ.get("DIAGNOSTICS_IMAGE_QUALITY", "").split(","))
+    if value.strip()
+}
+
+# Métricas (/metrics, formato Prometheus) e log de requests lentos (0 = desligado)
+DIAGNOSTICS_METRICS_TOKEN = os.environ.get("DIAGNOSTICS_METRICS_TOKEN", "")
+DIAGNOSTICS_SLOW_REQUEST_SECONDS = float(os.environ.get("DIAGNOSTICS_SLOW_REQUEST_SECONDS", "0"))
+# Orçamento de queries por view (metrics.QUERY_BUDGETS): "raise" (padrão em
+# dev e nos testes) falha o request que passar do limite, "warn" só loga, "off"
+DIAGNOSTICS_QUERY_BUDGET = os.environ.get("DIAGNOSTICS_QUERY_BUDGET", "raise" if DEBUG else "off").lower()
+
+# API de ingestão em lote: tokens aceitos (separados por vírgula) e limites
+DIAGNOSTICS_INGEST_TOKENS = [t.strip() for t in os.environ.get("DIAGNOSTICS_INGEST_TOKENS", "").split(",") if t.strip()]
+DIAGNOSTICS_INGEST_MAX_ITEMS = int(os.environ.get("DIAGNOSTICS_INGEST_MAX_ITEMS", "1000"))
+DIAGNOSTICS_INGEST_MAX_BYTES = int(os.environ.get("DIAGNOSTICS_INGEST_MAX_BYTES", str(10 * 1024 * 1024)))
+
+# Entrega de MEDIA_ROOT: "sendfile" (o próprio Django/gunicorn), "x-accel-redirect"
+# (nginx, com um location internal em DIAGNOSTICS_MEDIA_ACCEL_PREFIX) ou "x-sendfile"
+DIAGNOSTICS_MEDIA_SERVE = os.environ.get("DIAGNOSTICS_MEDIA_SERVE", "sendfile")
+DIAGNOSTICS_MEDIA_ACCEL_PREFIX = os.environ.get("DIAGNOSTICS_MEDIA_ACCEL_PREFIX", "/protected-media/")
+# max-age dos arquivos de mídia que não têm nome imutável (uuid)
+DIAGNOSTICS_MEDIA_MAX_AGE = int(os.environ.get("DIAGNOSTICS_MEDIA_MAX_AGE", "3600"))
+
+# Total de resultados na busca: "cached" (COUNT guardado por TTL), "exact" ou "none"
+DIAGNOSTICS_LIST_COUNT = os.environ.get("DIAGNOSTICS_LIST_COUNT", "cached")
+DIAGNOSTICS_LIST_COUNT_TTL = int(os.environ.get("DIAGNOSTICS_LIST_COUNT_TTL", "60"))
+
+# Tempo (s) das páginas de listagem e fragmentos do detalhe no cache
+DIAGNOSTICS_PAGE_CACHE_SECONDS = int(os.environ.get("DIAGNOSTICS_PAGE_CACHE_SECONDS", "300"))
+
+# Admin: anexos exibidos por tipo no formulário do relatório (os demais via link)
+DIAGNOSTICS_ADMIN_INLINE_LIMIT = int(os.environ.get("DIAGNOSTICS_ADMIN_INLINE_LIMIT", "20"))
+
+# Resumo "situação por SU": recalculado após escritas; este é só o teto (s)
+DIAGNOSTICS_SU_SUMMARY_CACHE_SECONDS = int(os.environ.get("DIAGNOSTICS_SU_SUMMARY_CACHE_SECONDS", "3600"))
+
+# Cache em disco das miniaturas da galeria (LRU, limitado em MB). Sem
+# diretório, usa MEDIA_ROOT/cache/thumbnails (lido a cada uso, não aqui)
+DIAGNOSTICS_THUMBNAIL_CACHE_DIR = os.environ.get("DIAGNOSTICS_THUMBNAIL_CACHE_DIR", "")
+DIAGNOSTICS_THUMBNAIL_CACHE_MB = int(os.environ.get("DIAGNOSTICS_THUMBNAIL_CACHE_MB", "512"))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
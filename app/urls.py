@@ -1,13 +1,19 @@
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
+
+from diagnostics import media
+from diagnostics.views import healthz, metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
+    path('healthz', healthz, name='healthz'),
     path('', include('pages.urls')),
     path('diagnostics/', include(('diagnostics.urls', 'diagnostics'), namespace='diagnostics')),
 ]
 
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Mídia enviada pelos usuários (também em produção): Range, ETag e sendfile/X-Accel-Redirect
+urlpatterns += [
+    re_path(r"^%s(?P<path>.+)$" % settings.MEDIA_URL.lstrip("/"), media.serve, name="media"),
+]
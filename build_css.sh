@@ -0,0 +1,29 @@
+#!/usr/bin/env bash
+# Gera static/css/app.css (Tailwind purgado + minificado) a partir dos templates.
+#   ./build_css.sh            # build único
+#   ./build_css.sh --watch    # dev: recompila ao salvar os templates
+# Usa o executável standalone do Tailwind (sem Node); baixa em .bin/ na primeira vez.
+set -euo pipefail
+
+TAILWIND_VERSION="${TAILWIND_VERSION:-v3.4.17}"
+cd "$(dirname "$0")"
+
+TAILWIND_BIN="${TAILWIND_BIN:-}"
+if [ -z "$TAILWIND_BIN" ]; then
+  case "$(uname -s)-$(uname -m)" in
+    Linux-x86_64)  platform=linux-x64 ;;
+    Linux-aarch64) platform=linux-arm64 ;;
+    Darwin-arm64)  platform=macos-arm64 ;;
+    Darwin-x86_64) platform=macos-x64 ;;
+    *) echo "plataforma sem binário do Tailwind: $(uname -s)-$(uname -m)" >&2; exit 1 ;;
+  esac
+  TAILWIND_BIN=".bin/tailwindcss-${TAILWIND_VERSION}-${platform}"
+  if [ ! -x "$TAILWIND_BIN" ]; then
+    mkdir -p .bin
+    curl -fsSL -o "$TAILWIND_BIN" \
+      "https://github.com/tailwindlabs/tailwindcss/releases/download/${TAILWIND_VERSION}/tailwindcss-${platform}"
+    chmod +x "$TAILWIND_BIN"
+  fi
+fi
+
+exec "$TAILWIND_BIN" -c tailwind.config.js -i assets/css/tailwind.css -o static/css/app.css --minify "$@"
@@ -1,26 +1,218 @@
-from django.contrib import admin
-from .models import DiagnosticReport, ImageAttachment, VideoAttachment
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.db.models import QuerySet
+from django.forms.models import BaseInlineFormSet
+from django.template.defaultfilters import filesizeformat
+from django.urls import reverse
+from django.utils.html import format_html, format_html_join
+from . import bulk, pagination, search
+from .models import DiagnosticReport, ImageAttachment, MediaBlob, ProcessingJob, ReportMediaUsage, VideoAttachment
+
+# Relatórios listados pelo nome na confirmação de exclusão (o resto vai só na contagem)
+DELETE_PREVIEW_LIMIT = 50
+
+
+def inline_limit():
+    return getattr(settings, "DIAGNOSTICS_ADMIN_INLINE_LIMIT", 20)
+
+
+def image_preview(attachment):
+    # Derivado "sm" do cache de miniaturas (ver thumbnails.py), nunca o original
+    if not attachment.pk:
+        return "—"
+    return format_html(
+        '<a href="{}" target="_blank"><img src="{}" alt="" loading="lazy" width="120" style="border-radius:4px"></a>',
+        attachment.file.url, reverse("diagnostics:image_thumbnail", args=[attachment.pk, "sm"]),
+    )
+
+
+def video_preview(attachment):
+    if not attachment.pk:
+        return "—"
+    blob = attachment.blob
+    if blob is not None and blob.poster:
+        return format_html(
+            '<a href="{}" target="_blank"><img src="{}" alt="" loading="lazy" width="120" style="border-radius:4px"></a>',
+            attachment.file.url, blob.poster.url,
+        )
+    return format_html('<a href="{}" target="_blank">Abrir vídeo</a>', attachment.file.url)
+
+
+class RecentAttachmentsFormSet(BaseInlineFormSet):
+    """Só os `inline_limit()` anexos mais recentes do relatório; os demais, pelo link em "Anexos"."""
+
+    def get_queryset(self):
+        if not hasattr(self, "_queryset"):
+            self._queryset = super().get_queryset()[:inline_limit()]
+        return self._queryset
+
 
 class ImageInline(admin.TabularInline):
     model = ImageAttachment
+    formset = RecentAttachmentsFormSet
     extra = 0
+    fields = ("preview", "blob", "created_at")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("blob")
+
+    @admin.display(description="Prévia")
+    def preview(self, obj):
+        return image_preview(obj)
 
 class VideoInline(admin.TabularInline):
     model = VideoAttachment
+    formset = RecentAttachmentsFormSet
     extra = 0
+    fields = ("preview", "blob", "status", "decision", "bytes_saved", "processed_at")
+    readonly_fields = fields
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("blob")
+
+    @admin.display(description="Prévia")
+    def preview(self, obj):
+        return video_preview(obj)
+
+class SearchRankChangeList(ChangeList):
+    def get_ordering(self, request, queryset):
+        # Buscando sem ordenação escolhida na tabela: mais relevantes primeiro
+        if self.query and not self.params.get(ORDER_VAR) and "search_rank" in queryset.query.annotations:
+            return ["-search_rank", "-created_at", "-pk"]
+        return super().get_ordering(request, queryset)
 
 @admin.register(DiagnosticReport)
 class DiagnosticReportAdmin(admin.ModelAdmin):
     list_display = ("title", "category", "su_identifier", "user_name", "created_at")
-    list_filter = ("category", "created_at")
+    list_filter = ("category",)
     search_fields = ("title", "su_identifier", "user_name", "user_email", "message")
     ordering = ("-created_at",)
+    # Filtros por intervalo de created_at: usam o índice (-created_at, -id)
+    date_hierarchy = "created_at"
+    # Sem o COUNT(*) da tabela inteira; o total filtrado vem do cache
+    show_full_result_count = False
+    paginator = pagination.CachedCountPaginator
+    readonly_fields = ("attachments", "disk_usage")
     inlines = [ImageInline, VideoInline]
+    actions = ["mark_critica", "mark_normal"]
+
+    def get_search_results(self, request, queryset, search_term):
+        # Usa o índice textual (FTS5/GIN) em vez de icontains em cada campo
+        if not search_term:
+            return queryset, False
+        return search.search_reports(queryset, search_term), False
+
+    def get_changelist(self, request, **kwargs):
+        return SearchRankChangeList
+
+    @admin.display(description="Anexos")
+    def attachments(self, obj):
+        if not obj.pk:
+            return "—"
+        links = [
+            (reverse(f"admin:diagnostics_{model._meta.model_name}_changelist") + f"?report__id__exact={obj.pk}",
+             related.count(), label)
+            for model, related, label in (
+                (ImageAttachment, obj.images, "imagem(ns)"),
+                (VideoAttachment, obj.videos, "vídeo(s)"),
+            )
+        ]
+        return format_html(
+            "{} <br><small>Abaixo, só os {} mais recentes de cada tipo.</small>",
+            format_html_join(" · ", '<a href="{}">{} {}</a>', links), inline_limit(),
+        )
+
+    @admin.display(description="Uso de disco")
+    def disk_usage(self, obj):
+        usage = ReportMediaUsage.objects.filter(report_id=obj.pk).first() if obj.pk else None
+        return filesizeformat(usage.bytes) if usage else "—"
+
+    def _recategorize(self, request, queryset, category):
+        changed = bulk.recategorize(queryset, category)
+        self.message_user(
+            request, f"{changed} relatório(s) marcado(s) como {category.label}.", messages.SUCCESS,
+        )
+
+    @admin.action(description="Marcar como crítica", permissions=["change"])
+    def mark_critica(self, request, queryset):
+        self._recategorize(request, queryset, DiagnosticReport.Category.CRITICA)
+
+    @admin.action(description="Marcar como normal", permissions=["change"])
+    def mark_normal(self, request, queryset):
+        self._recategorize(request, queryset, DiagnosticReport.Category.NORMAL)
+
+    def get_deleted_objects(self, objs, request):
+        """
+        Confirmação de exclusão com contagens, em vez da árvore de cada
+        anexo de cada relatório que o Django montaria objeto a objeto.
+        """
+        if not isinstance(objs, QuerySet):
+            objs = DiagnosticReport.objects.filter(pk__in=[o.pk for o in objs])
+        counts = bulk.summarize(objs)
+        model_count = {model._meta.verbose_name_plural: n for model, n in counts.items() if n}
+        perms_needed = {
+            model._meta.verbose_name
+            for model, n in counts.items()
+            if n and not request.user.has_perm(f"{model._meta.app_label}.delete_{model._meta.model_name}")
+        }
+        to_delete = [str(report) for report in objs[:DELETE_PREVIEW_LIMIT]]
+        if counts[DiagnosticReport] > DELETE_PREVIEW_LIMIT:
+            to_delete.append(f"… e mais {counts[DiagnosticReport] - DELETE_PREVIEW_LIMIT} relatório(s)")
+        return to_delete, model_count, perms_needed, []
+
+    def delete_queryset(self, request, queryset):
+        # Ação "excluir selecionados": DELETE por lote, com anexos e mídia órfã
+        bulk.delete_reports(queryset)
 
 @admin.register(ImageAttachment)
 class ImageAttachmentAdmin(admin.ModelAdmin):
-    list_display = ("id", "report", "created_at")
+    list_display = ("id", "preview", "report", "created_at")
+    list_select_related = ("report",)
+    raw_id_fields = ("report", "blob")
+    readonly_fields = ("preview",)
+    ordering = ("-id",)
+    show_full_result_count = False
+    paginator = pagination.CachedCountPaginator
+
+    @admin.display(description="Prévia")
+    def preview(self, obj):
+        return image_preview(obj)
 
 @admin.register(VideoAttachment)
 class VideoAttachmentAdmin(admin.ModelAdmin):
-    list_display = ("id", "report", "created_at")
+    list_display = ("id", "preview", "report", "status", "decision", "bytes_saved", "created_at", "processed_at")
+    list_filter = ("status", "decision")
+    list_select_related = ("report", "blob")
+    raw_id_fields = ("report", "blob")
+    readonly_fields = ("preview",)
+    ordering = ("-id",)
+    show_full_result_count = False
+    paginator = pagination.CachedCountPaginator
+
+    @admin.display(description="Prévia")
+    def preview(self, obj):
+        return video_preview(obj)
+
+@admin.register(ProcessingJob)
+class ProcessingJobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "object_id", "status", "attempts", "duration_ms", "created_at", "finished_at")
+    list_filter = ("kind", "status")
+    readonly_fields = ("started_at", "finished_at", "duration_ms", "locked_by", "last_error")
+
+@admin.register(MediaBlob)
+class MediaBlobAdmin(admin.ModelAdmin):
+    list_display = ("id", "kind", "sha256", "size", "ref_count", "status", "decision", "bytes_saved", "created_at")
+    list_filter = ("kind", "status", "decision")
+    search_fields = ("sha256",)
+    readonly_fields = (
+        "kind", "sha256", "file", "avif", "jpeg", "size", "derived_size", "ref_count", "status", "decision",
+        "bytes_saved", "created_at",
+    )
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class DiagnosticsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'diagnostics'
+
+    def ready(self):
+        from . import search, signals  # noqa: F401
+
+        # Índice de busca textual (FTS5/GIN) não vem das migrações geradas
+        post_migrate.connect(search.install, sender=self)
@@ -0,0 +1,196 @@
+"""
+Suíte de regressão de desempenho das páginas (`manage.py bench_views` e
+diagnostics/tests.py).
+
+Cada caso é um GET (pelo `django.test.Client`, no próprio processo) numa
+view com uma combinação de filtros/ordenação. Para cada um, mede o número
+de queries e a mediana do tempo de `runs` execuções, com o cache limpo
+antes de cada uma (o pior caso: nenhuma página ou contagem guardada), e
+compara com os orçamentos de `perf_budgets.json`. O resultado é um dict
+serializável em JSON, para comparar execuções (`compare`).
+"""
+import json
+import re
+import statistics
+import time
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import DiagnosticReport, ImageAttachment, VideoAttachment
+
+BUDGETS_PATH = Path(__file__).with_name("perf_budgets.json")
+
+LIST_ORDERINGS = ["-created_at", "created_at", "title", "-title"]
+NEXT_CURSOR_RE = re.compile(r'[?&]cursor=([^"&]+)[^"]*"[^>]*>\s*Pr[óo]xima')
+TIMELINE_NEXT_RE = re.compile(r'\?cursor=([^"&]+)"[^>]*>\s*Mais antigos')
+
+
+def build_cases():
+    """{nome: caminho} de todos os casos, com parâmetros tirados dos dados atuais."""
+    latest = DiagnosticReport.objects.order_by("-created_at", "-id").first()
+    if latest is None:
+        return {}
+    top_su = (
+        DiagnosticReport.objects.exclude(su_identifier="").values("su_identifier")
+        .annotate(n=Count("id")).order_by("-n", "su_identifier").values_list("su_identifier", flat=True).first()
+    ) or ""
+    end = timezone.localdate(latest.created_at)
+    filters = {
+        "all": {},
+        "category": {"category": DiagnosticReport.Category.CRITICA},
+        "su": {"su": top_su},
+        "su_prefix": {"su": top_su[:5] + "*"},
+        "dates": {"start_date": (end - timedelta(days=30)).isoformat(), "end_date": end.isoformat()},
+        "category_dates": {
+            "category": DiagnosticReport.Category.CRITICA,
+            "start_date": (end - timedelta(days=30)).isoformat(), "end_date": end.isoformat(),
+        },
+        "q": {"q": "sensor"},
+    }
+
+    list_url = reverse("diagnostics:list")
+    cases = {}
+    for order_by in LIST_ORDERINGS:
+        for name, params in filters.items():
+            cases[f"list:{order_by}:{name}"] = f"{list_url}?{urlencode({**params, 'order_by': order_by})}"
+    cases["list:relevance:q"] = f"{list_url}?{urlencode({'q': 'sensor', 'order_by': 'relevance'})}"
+
+    with_images = ImageAttachment.objects.order_by("-id").values_list("report_id", flat=True).first()
+    with_video = VideoAttachment.objects.order_by("-id").values_list("report_id", flat=True).first()
+    plain = (
+        DiagnosticReport.objects.filter(images__isnull=True, videos__isnull=True)
+        .order_by("-id").values_list("id", flat=True).first()
+    )
+    for name, pk in (("images", with_images), ("video", with_video), ("plain", plain)):
+        if pk:
+            cases[f"detail:{name}"] = reverse("diagnostics:detail", args=[pk])
+    image = ImageAttachment.objects.order_by("-id").values_list("id", flat=True).first()
+    if image:
+        cases["thumbnail:sm"] = reverse("diagnostics:image_thumbnail", args=[image, "sm"])
+
+    cases["dashboard"] = reverse("diagnostics:dashboard")
+    cases["api:dashboard"] = reverse("diagnostics:api_dashboard")
+    if top_su:
+        cases["dashboard:su"] = f"{reverse('diagnostics:dashboard')}?{urlencode({'su': top_su})}"
+        cases["su_timeline"] = reverse("diagnostics:su_timeline", args=[top_su])
+    cases["su_summary"] = reverse("diagnostics:su_summary")
+    cases["new"] = reverse("diagnostics:new")
+    cases["home"] = reverse("pages:index")
+    cases["healthz"] = reverse("healthz")
+    return cases
+
+
+def add_next_pages(client, cases):
+    """Casos de 2ª página (cursor) a partir dos links "Próxima"/"Mais antigos" da 1ª."""
+    for name, pattern in [(f"list:{o}:all", NEXT_CURSOR_RE) for o in LIST_ORDERINGS] + [("su_timeline", TIMELINE_NEXT_RE)]:
+        if name not in cases:
+            continue
+        match = pattern.search(client.get(cases[name]).content.decode())
+        if match:
+            sep = "&" if "?" in cases[name] else "?"
+            cases[f"{name}:page2"] = f"{cases[name]}{sep}cursor={match.group(1)}"
+    return cases
+
+
+def measure(client, path, runs=5):
+    """Queries (da última execução) e tempos de `runs` GETs em `path`, cada um com o cache vazio."""
+    timings = []
+    for _run in range(runs):
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            start = time.perf_counter()
+            response = client.get(path)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            timings.append((time.perf_counter() - start) * 1000)
+    return {
+        "path": path,
+        "status": response.status_code,
+        "queries": len(ctx.captured_queries),
+        "median_ms": round(statistics.median(timings), 2),
+        "max_ms": round(max(timings), 2),
+    }
+
+
+def load_budgets(path=BUDGETS_PATH):
+    with open(path, encoding="utf-8") as fp:
+        return json.load(fp)
+
+
+def check(result, budget, time_factor=1.0):
+    """
+    Lista de violações do orçamento (vazia se ok). Sem orçamento para o
+    caso: só confere o status. O tempo vale `time_factor` × `max_ms`
+    (None: tempo não é conferido, só queries).
+    """
+    problems = []
+    if result["status"] != 200:
+        problems.append(f"HTTP {result['status']}")
+    if budget:
+        if result["queries"] > budget["max_queries"]:
+            problems.append(f"{result['queries']} queries (orçamento {budget['max_queries']})")
+        if time_factor is not None and result["median_ms"] > budget["max_ms"] * time_factor:
+            problems.append(f"{result['median_ms']:.1f} ms (orçamento {budget['max_ms'] * time_factor:g} ms)")
+    return problems
+
+
+def run_suite(runs=5, budgets=None, only=None, time_factor=1.0):
+    """
+    Mede todos os casos (ou os que contêm `only`). Retorna o dict do
+    resultado: metadados + {caso: medição, orçamento e violações}.
+    `time_factor` como em `check`.
+    """
+    budgets = (budgets if budgets is not None else load_budgets()).get("cases", {})
+    client = Client()
+    cases = add_next_pages(client, build_cases())
+    results = {}
+    for name, path in cases.items():
+        if only and only not in name:
+            continue
+        result = measure(client, path, runs)
+        result["budget"] = budgets.get(name)
+        result["problems"] = check(result, result["budget"], time_factor)
+        results[name] = result
+    return {
+        "meta": {
+            "created_at": timezone.now().isoformat(),
+            "vendor": connection.vendor,
+            "reports": DiagnosticReport.objects.count(),
+            "runs": runs,
+        },
+        "cases": results,
+    }
+
+
+def budgets_from(suite, time_factor=3.0, time_slack_ms=50):
+    """Orçamentos a partir de uma execução: as queries exatas e `time_factor` × a mediana + folga."""
+    return {
+        "cases": {
+            name: {
+                "max_queries": r["queries"],
+                "max_ms": round(r["median_ms"] * time_factor + time_slack_ms),
+            }
+            for name, r in suite["cases"].items()
+        },
+    }
+
+
+def compare(current, previous):
+    """[(caso, ms antes, ms agora, variação %, queries antes, queries agora)] dos casos presentes nas duas execuções."""
+    rows = []
+    for name, now in current["cases"].items():
+        before = previous.get("cases", {}).get(name)
+        if before is None:
+            continue
+        delta = (now["median_ms"] - before["median_ms"]) / before["median_ms"] * 100 if before["median_ms"] else 0.0
+        rows.append((name, before["median_ms"], now["median_ms"], delta, before["queries"], now["queries"]))
+    return rows
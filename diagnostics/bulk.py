@@ -0,0 +1,110 @@
+"""
+Operações em massa sobre relatórios (ações do admin) com algumas queries por
+lote de BATCH_SIZE relatórios, em vez de um save()/delete() por objeto.
+
+Como não passam pelos signals, cada função faz o que eles fariam: mantém a
+rollup do painel e o uso de disco, tira as referências dos blobs de mídia
+(apagando os arquivos órfãos após o commit) e invalida listagens e o resumo
+por SU.
+"""
+from collections import Counter
+
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from . import caching, mediastore, rollups, units
+from .models import DiagnosticReport, ImageAttachment, MediaBlob, ReportMediaUsage, VideoAttachment
+
+BATCH_SIZE = 500
+
+
+def _id_batches(queryset):
+    # Os ids primeiro: o queryset do admin pode ter JOIN/anotações da busca,
+    # e os lotes seguintes não podem depender de linhas já apagadas
+    ids = list(queryset.order_by().values_list("pk", flat=True))
+    for start in range(0, len(ids), BATCH_SIZE):
+        yield ids[start:start + BATCH_SIZE]
+
+
+def _delete_where_in(model, field_name, values):
+    """
+    DELETE FROM <tabela> WHERE <campo> IN (...) em SQL explícito. Não carrega
+    os objetos nem dispara signals ou cascata: quem chama já tratou o que os
+    signals fariam e apagou antes as linhas que apontam para estas. Retorna
+    quantas linhas saíram.
+    """
+    if not values:
+        return 0
+    quote = connection.ops.quote_name
+    column = model._meta.get_field(field_name).column
+    placeholders = ", ".join(["%s"] * len(values))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"DELETE FROM {quote(model._meta.db_table)} WHERE {quote(column)} IN ({placeholders})", list(values),
+        )
+        return cursor.rowcount
+
+
+def _invalidate():
+    caching.bump_list_generation()
+    units.invalidate_summary()
+
+
+def recategorize(queryset, category):
+    """Muda a categoria dos relatórios de `queryset` com UPDATE por lote. Retorna quantos mudaram."""
+    changed = 0
+    for ids in _id_batches(queryset):
+        with transaction.atomic():
+            moving = DiagnosticReport.objects.filter(pk__in=ids).exclude(category=category)
+            deltas = Counter()
+            for (day, su, old), n in rollups.counts(moving).items():
+                deltas[(day, su, old)] -= n
+                deltas[(day, su, category)] += n
+            # updated_at novo: ETag do detalhe e fragmentos em cache mudam junto
+            changed += moving.update(category=category, updated_at=timezone.now())
+            rollups.apply(deltas)
+    if changed:
+        _invalidate()
+    return changed
+
+
+def delete_reports(queryset):
+    """
+    Apaga os relatórios de `queryset` e os anexos deles com DELETE por lote.
+    Blobs sem outra referência são apagados, e os arquivos saem após o
+    commit. Retorna quantos relatórios foram apagados.
+    """
+    deleted = 0
+    for ids in _id_batches(queryset):
+        with transaction.atomic():
+            reports = DiagnosticReport.objects.filter(pk__in=ids)
+            deltas = Counter({key: -n for key, n in rollups.counts(reports).items()})
+            refs = Counter()
+            legacy_files = []
+            for model in (ImageAttachment, VideoAttachment):
+                attachments = model.objects.filter(report_id__in=ids)
+                rows = attachments.exclude(blob=None).order_by().values("blob_id").annotate(n=Count("id"))
+                for row in rows:
+                    refs[row["blob_id"]] += row["n"]
+                legacy_files += attachments.filter(blob=None).values_list("file", flat=True)
+                _delete_where_in(model, "report", ids)
+            # Sem signals nem dependentes: o delete() do Django já é um DELETE só
+            ReportMediaUsage.objects.filter(report_id__in=ids).delete()
+            deleted += _delete_where_in(DiagnosticReport, "id", ids)
+            rollups.apply(deltas)
+            MediaBlob.release_many(refs)
+            mediastore.delete_on_commit(legacy_files)
+    if deleted:
+        _invalidate()
+    return deleted
+
+
+def summarize(queryset):
+    """Quantos relatórios, imagens e vídeos `delete_reports(queryset)` apagaria."""
+    ids = queryset.order_by().values("pk")
+    return {
+        DiagnosticReport: queryset.count(),
+        ImageAttachment: ImageAttachment.objects.filter(report_id__in=ids).count(),
+        VideoAttachment: VideoAttachment.objects.filter(report_id__in=ids).count(),
+    }
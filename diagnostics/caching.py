@@ -0,0 +1,199 @@
+"""
+Cache das páginas de diagnósticos.
+
+* Listagem: o HTML renderizado fica no cache do Django, com a chave formada
+  pela "geração" da listagem + querystring. Qualquer escrita em relatórios ou
+  anexos incrementa a geração (ver signals.py), invalidando todas as páginas
+  de uma vez, sem precisar saber quais chaves existem.
+* Detalhe: ETag/Last-Modified a partir de `DiagnosticReport.updated_at`, que
+  é "tocado" quando um anexo muda; os fragmentos do template usam a mesma
+  versão na chave do `{% cache %}`.
+
+Com mais de um processo (gunicorn), o cache precisa ser compartilhado entre
+eles (ver CACHES em settings.py) para a invalidação valer para todos.
+"""
+import hashlib
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+LIST_GENERATION_KEY = "diagnostics:list-generation"
+
+# Relatórios a tocar no fim do `deferred_touches()` em andamento (None: fora de um)
+_deferred_touches = ContextVar("diagnostics_deferred_touches", default=None)
+
+
+def page_cache_seconds():
+    return getattr(settings, "DIAGNOSTICS_PAGE_CACHE_SECONDS", 300)
+
+
+def generation(key):
+    """Contador de versão guardado no cache em `key`, incrementado por `bump_generation`."""
+    gen = cache.get(key)
+    if gen is None:
+        # Valor inicial distinto a cada "reset" do cache: nunca reaproveita
+        # entradas gravadas antes de a chave expirar/ser despejada
+        gen = int(timezone.now().timestamp() * 1000)
+        cache.add(key, gen, timeout=None)
+        gen = cache.get(key, gen)
+    return gen
+
+
+def bump_generation(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        generation(key)
+
+
+def list_generation():
+    return generation(LIST_GENERATION_KEY)
+
+
+async def alist_generation():
+    gen = await cache.aget(LIST_GENERATION_KEY)
+    if gen is None:
+        gen = int(timezone.now().timestamp() * 1000)
+        await cache.aadd(LIST_GENERATION_KEY, gen, timeout=None)
+        gen = await cache.aget(LIST_GENERATION_KEY, gen)
+    return gen
+
+
+def bump_list_generation():
+    bump_generation(LIST_GENERATION_KEY)
+
+
+def touch_report(report_id):
+    """Marca o relatório como alterado (anexos mudaram) e invalida as listagens."""
+    pending = _deferred_touches.get()
+    if pending is not None:
+        pending.add(report_id)
+        return
+    touch_reports([report_id])
+
+
+def touch_reports(report_ids):
+    from .models import DiagnosticReport
+
+    DiagnosticReport.objects.filter(pk__in=report_ids).update(updated_at=timezone.now())
+    bump_list_generation()
+
+
+@contextmanager
+def deferred_touches():
+    """
+    Agrupa os `touch_report` do bloco (um por anexo salvo, via signals):
+    no fim, um só UPDATE e um só incremento da geração das listagens.
+    Aninhado, quem toca é o bloco de fora.
+    """
+    if _deferred_touches.get() is not None:
+        yield
+        return
+    pending = set()
+    token = _deferred_touches.set(pending)
+    try:
+        yield
+    except BaseException:
+        _deferred_touches.reset(token)
+        if pending:
+            # Os anexos salvos antes do erro ainda invalidam o cache (se a
+            # transação em volta já está quebrada, o rollback desfaz tudo)
+            with suppress(DatabaseError):
+                touch_reports(pending)
+        raise
+    _deferred_touches.reset(token)
+    if pending:
+        touch_reports(pending)
+
+
+def report_etag(report):
+    return quote_etag(f"r{report.pk}-{report.updated_at.timestamp():.6f}")
+
+
+def conditional_report_response(request, report):
+    """304 se o navegador já tem a versão atual do relatório; senão None."""
+    return get_conditional_response(
+        request,
+        etag=report_etag(report),
+        last_modified=int(report.updated_at.timestamp()),
+    )
+
+
+def set_report_validators(response, report):
+    response["ETag"] = report_etag(report)
+    response["Last-Modified"] = http_date(report.updated_at.timestamp())
+    # Sempre revalida: com o ETag, a revalidação vira um 304 barato
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def cache_list_page(view):
+    """
+    Cacheia o HTML da listagem por geração + querystring e responde 304
+    quando o navegador já tem a página da geração atual. Aceita views
+    síncronas e assíncronas.
+    """
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return await view(request, *args, **kwargs)
+
+            etag, key = _list_page_keys(request, await alist_generation())
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            content = await cache.aget(key)
+            if content is None:
+                response = await view(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                await cache.aset(key, response.content, page_cache_seconds())
+            else:
+                response = HttpResponse(content)
+            return _set_list_validators(response, etag)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return view(request, *args, **kwargs)
+
+        etag, key = _list_page_keys(request, list_generation())
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        content = cache.get(key)
+        if content is None:
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cache.set(key, response.content, page_cache_seconds())
+        else:
+            response = HttpResponse(content)
+        return _set_list_validators(response, etag)
+
+    return wrapper
+
+
+def _list_page_keys(request, gen):
+    digest = hashlib.sha1(request.GET.urlencode().encode()).hexdigest()
+    return quote_etag(f"l{gen}-{digest[:16]}"), f"diagnostics:list-page:{gen}:{digest}"
+
+
+def _set_list_validators(response, etag):
+    response["ETag"] = etag
+    patch_cache_control(response, no_cache=True)
+    return response
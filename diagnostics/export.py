@@ -0,0 +1,127 @@
+"""
+Exportação de relatórios filtrados em CSV ou JSONL, gerada linha a linha
+(`QuerySet.iterator`) para manter a memória constante em tabelas grandes.
+Em Postgres o iterator usa cursor no servidor; em SQLite, busca em blocos
+de CHUNK_SIZE.
+"""
+import csv
+import json
+
+from django.core.files.storage import default_storage
+from django.db.models import Aggregate, CharField, Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import ImageAttachment, VideoAttachment
+
+FORMATS = ("csv", "jsonl")
+CHUNK_SIZE = 2000
+
+FIELDS = [
+    "id", "title", "category", "su_identifier", "user_name", "user_email",
+    "message", "created_at", "updated_at",
+]
+MEDIA_FIELDS = ["image_count", "video_count", "image_urls", "video_urls"]
+
+# Separador das listas de arquivos agregadas no SQL (não aparece nos caminhos
+# gerados por report_image_upload_to/report_video_upload_to)
+FILE_SEP = ","
+
+
+class GroupConcat(Aggregate):
+    """GROUP_CONCAT (SQLite) / STRING_AGG (Postgres) dos valores, separados por FILE_SEP."""
+    function = "GROUP_CONCAT"
+    output_field = CharField()
+
+    def as_sql(self, compiler, connection, **extra_context):
+        if connection.vendor == "postgresql":
+            return super().as_sql(
+                compiler, connection, function="STRING_AGG",
+                template=f"%(function)s(%(expressions)s::text, '{FILE_SEP}')", **extra_context,
+            )
+        return super().as_sql(compiler, connection, **extra_context)
+
+
+def _per_report(model, aggregate):
+    """Subquery correlacionada com um agregado dos anexos de cada relatório."""
+    return Subquery(
+        model.objects.filter(report=OuterRef("pk"))
+        .order_by()
+        .values("report")
+        .annotate(value=aggregate)
+        .values("value")
+    )
+
+
+def annotate_media(qs):
+    """
+    Contagens e caminhos dos anexos na mesma query dos relatórios (subqueries
+    correlacionadas, sem JOIN que multiplicaria as linhas).
+    """
+    return qs.annotate(
+        image_count=Coalesce(_per_report(ImageAttachment, Count("id")), Value(0), output_field=IntegerField()),
+        video_count=Coalesce(_per_report(VideoAttachment, Count("id")), Value(0), output_field=IntegerField()),
+        image_files=_per_report(ImageAttachment, GroupConcat("file")),
+        video_files=_per_report(VideoAttachment, GroupConcat("file")),
+    )
+
+
+def apply_ordering(qs, order_by):
+    """Ordenação da busca com `id` como desempate (ordem estável no arquivo)."""
+    if order_by == "relevance":
+        return qs.order_by("-search_rank", "-created_at", "id")
+    return qs.order_by(order_by, "id")
+
+
+def iter_rows(qs, include_media=False, build_url=None):
+    """Gera um dict por relatório. `build_url` transforma a URL relativa da mídia (ex.: em absoluta)."""
+    if include_media:
+        qs = annotate_media(qs)
+
+    for report in qs.iterator(chunk_size=CHUNK_SIZE):
+        row = {f: getattr(report, f) for f in FIELDS}
+        row["created_at"] = report.created_at.isoformat()
+        row["updated_at"] = report.updated_at.isoformat()
+        if include_media:
+            row["image_count"] = report.image_count
+            row["video_count"] = report.video_count
+            row["image_urls"] = _urls(report.image_files, build_url)
+            row["video_urls"] = _urls(report.video_files, build_url)
+        yield row
+
+
+def _urls(names, build_url):
+    if not names:
+        return []
+    urls = [default_storage.url(n) for n in names.split(FILE_SEP)]
+    return [build_url(u) for u in urls] if build_url else urls
+
+
+class _Echo:
+    """Pseudo-buffer: o csv.writer devolve a linha em vez de gravar."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows, include_media=False):
+    writer = csv.writer(_Echo())
+    header = FIELDS + (MEDIA_FIELDS if include_media else [])
+    yield writer.writerow(header)
+    for row in rows:
+        if include_media:
+            row["image_urls"] = " ".join(row["image_urls"])
+            row["video_urls"] = " ".join(row["video_urls"])
+        yield writer.writerow([row[f] for f in header])
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def export_lines(qs, fmt, include_media=False, build_url=None):
+    rows = iter_rows(qs, include_media=include_media, build_url=build_url)
+    if fmt == "csv":
+        return csv_lines(rows, include_media=include_media)
+    return jsonl_lines(rows)
+
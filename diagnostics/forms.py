@@ -1,6 +1,10 @@
 # diagnostics/forms.py
+from datetime import datetime, time, timedelta
+
 from django import forms
 from django.core.exceptions import ValidationError
+from django.utils.timezone import localdate, make_aware
+from . import search, units
 from .models import DiagnosticReport
 from .widgets import MultiFileInput
 
@@ -26,7 +30,11 @@ class DiagnosticReportForm(forms.ModelForm):
 
 
 class DiagnosticFilterForm(forms.Form):
-    q = forms.CharField(label="Título contém", required=False)
+    q = forms.CharField(label="Buscar", required=False)
+    su = forms.CharField(
+        label="SU", required=False, max_length=121,
+        help_text="Identificador exato, ou prefixo terminado em * (ex.: SU-AC*).",
+    )
     category = forms.ChoiceField(
         label="Categoria",
         required=False,
@@ -46,10 +54,66 @@ class DiagnosticFilterForm(forms.Form):
             ("created_at", "Mais antigos"),
             ("title", "Título A→Z"),
             ("-title", "Título Z→A"),
+            ("relevance", "Relevância (busca)"),
         ],
         initial="-created_at",
     )
 
+    def filter_queryset(self, qs):
+        """
+        Aplica os filtros já validados (`is_valid()`) a `qs`. Retorna o
+        queryset filtrado e a ordenação escolhida (ainda não aplicada).
+        """
+        q = self.cleaned_data.get("q")
+        su = self.cleaned_data.get("su")
+        category = self.cleaned_data.get("category")
+        start_date = self.cleaned_data.get("start_date")
+        end_date = self.cleaned_data.get("end_date")
+        order_by = self.cleaned_data.get("order_by") or ("relevance" if q else "-created_at")
+
+        if q:
+            qs = search.search_reports(qs, q)
+        if su:
+            qs = units.filter_su(qs, su)
+        if category:
+            qs = qs.filter(category=category)
+        if start_date:
+            start_dt = make_aware(datetime.combine(start_date, time.min))
+            qs = qs.filter(created_at__gte=start_dt)
+        if end_date:
+            end_dt = make_aware(datetime.combine(end_date, time.max))
+            qs = qs.filter(created_at__lte=end_dt)
+
+        if order_by == "relevance" and not q:
+            order_by = "-created_at"
+        return qs, order_by
+
+
+class DashboardForm(forms.Form):
+    """Período (padrão: últimos DEFAULT_DAYS dias) e SU do painel de contagens."""
+    DEFAULT_DAYS = 30
+    MAX_DAYS = 366
+
+    start_date = forms.DateField(
+        label="De (data)", required=False, widget=forms.DateInput(attrs={"type": "date"})
+    )
+    end_date = forms.DateField(
+        label="Até (data)", required=False, widget=forms.DateInput(attrs={"type": "date"})
+    )
+    su = forms.CharField(label="SU", required=False, max_length=120)
+
+    def clean(self):
+        cleaned = super().clean()
+        end = cleaned.get("end_date") or localdate()
+        start = cleaned.get("start_date") or end - timedelta(days=self.DEFAULT_DAYS - 1)
+        if start > end:
+            raise ValidationError("A data inicial deve ser anterior à final.")
+        if (end - start).days >= self.MAX_DAYS:
+            raise ValidationError(f"Período máximo de {self.MAX_DAYS} dias.")
+        cleaned["start_date"], cleaned["end_date"] = start, end
+        cleaned["su"] = (cleaned.get("su") or "").strip()
+        return cleaned
+
 
 class ImageUploadForm(forms.Form):
     images = forms.ImageField(
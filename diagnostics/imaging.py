@@ -0,0 +1,131 @@
+"""
+Pipeline de ingestão de imagens: decodifica direto do upload (memória ou
+arquivo temporário), reduz e codifica as variantes (AVIF, WEBP e JPEG de
+fallback) sem gravar o original em disco.
+
+* qualidade por formato (`QUALITY`): o AVIF chega no mesmo resultado visual
+  com um `quality` bem menor que o WEBP e o JPEG;
+* esforço do encoder (`EFFORTS`): "fast" codifica rápido e gera arquivos
+  maiores, "max" o contrário. É o que decide a latência da ingestão;
+* sem suporte a AVIF no Pillow (`features.check("avif")`), a variante é
+  simplesmente pulada.
+
+Este módulo só depende de Pillow/stdlib para poder rodar dentro dos
+processos do pool (spawn) sem carregar o Django: as opções chegam por
+parâmetro (ver `image_options()` em models.py).
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from io import BytesIO
+
+from PIL import Image, features
+
+MAX_W, MAX_H = 1920, 1080
+
+# Ordem de preferência na negociação (Accept): do menor arquivo ao mais compatível
+FORMATS = ("avif", "webp", "jpeg")
+PIL_FORMATS = {"avif": "AVIF", "webp": "WEBP", "jpeg": "JPEG"}
+CONTENT_TYPES = {"avif": "image/avif", "webp": "image/webp", "jpeg": "image/jpeg"}
+EXTENSIONS = {"avif": ".avif", "webp": ".webp", "jpeg": ".jpg"}
+_FEATURES = {"avif": "avif", "webp": "webp", "jpeg": "jpg"}
+
+QUALITY = {"avif": 55, "webp": 80, "jpeg": 82}
+EFFORTS = {
+    "fast": {"avif": {"speed": 10}, "webp": {"method": 1}, "jpeg": {}},
+    "balanced": {"avif": {"speed": 8}, "webp": {"method": 4}, "jpeg": {"optimize": True, "progressive": True}},
+    "max": {"avif": {"speed": 6}, "webp": {"method": 6}, "jpeg": {"optimize": True, "progressive": True}},
+}
+DEFAULT_EFFORT = "balanced"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def supported_formats(formats=FORMATS):
+    """Os de `formats` que este Pillow sabe codificar."""
+    return tuple(fmt for fmt in formats if features.check(_FEATURES[fmt]))
+
+
+def save(img, fp, fmt, quality=None, effort=DEFAULT_EFFORT):
+    """Codifica `img` (RGB) em `fp` no formato `fmt` com a qualidade e o esforço pedidos."""
+    encoder = EFFORTS.get(effort, EFFORTS[DEFAULT_EFFORT])[fmt]
+    img.save(fp, format=PIL_FORMATS[fmt], quality=quality or QUALITY[fmt], **encoder)
+
+
+def _open_reduced(source, max_size):
+    """
+    Abre `source` (bytes ou caminho) já reduzido a `max_size`. Para JPEG,
+    `draft()` faz o decoder entregar a imagem em escala reduzida (1/2, 1/4,
+    1/8), evitando decodificar a resolução cheia da câmera.
+    """
+    fp = BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+    with Image.open(fp) as img:
+        img.draft("RGB", max_size)
+        img = img.convert("RGB")
+    img.thumbnail(max_size)
+    return img
+
+
+def encode_variants(source, formats=("webp",), effort=DEFAULT_EFFORT, quality=None, max_size=(MAX_W, MAX_H)):
+    """
+    Decodifica `source` uma vez e devolve {formato: bytes} de cada variante
+    de `formats` que o Pillow suporta. `quality` sobrescreve QUALITY por formato.
+    """
+    img = _open_reduced(source, max_size)
+    variants = {}
+    for fmt in supported_formats(formats):
+        buf = BytesIO()
+        save(img, buf, fmt, (quality or {}).get(fmt), effort)
+        variants[fmt] = buf.getvalue()
+    return variants
+
+
+def encode_webp(source, max_size=(MAX_W, MAX_H), effort=DEFAULT_EFFORT):
+    """Bytes de um WEBP reduzido a `max_size` (capas e prévias dos vídeos)."""
+    return encode_variants(source, ("webp",), effort, max_size=max_size)["webp"]
+
+
+def upload_source(upload):
+    """
+    O que mandar para o worker: o caminho do arquivo temporário (uploads
+    grandes) ou os bytes do upload em memória.
+    """
+    if hasattr(upload, "temporary_file_path"):
+        return upload.temporary_file_path()
+    upload.seek(0)
+    return upload.read()
+
+
+def get_pool(max_workers=None):
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=max_workers or os.cpu_count() or 1,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _pool
+
+
+def encode_batch(sources, max_workers=None, **options):
+    """
+    Codifica várias imagens em paralelo (`options` vão para
+    `encode_variants`). Retorna, na mesma ordem, o {formato: bytes} ou a
+    exceção levantada para aquela imagem.
+    """
+    encode = partial(_safe_encode, **options)
+    if len(sources) <= 1 or max_workers == 1:
+        return [encode(s) for s in sources]
+
+    pool = get_pool(max_workers)
+    return list(pool.map(encode, sources))
+
+
+def _safe_encode(source, **options):
+    try:
+        return encode_variants(source, **options)
+    except Exception as exc:
+        return exc
@@ -0,0 +1,123 @@
+"""
+Ingestão em lote de relatórios (API das SUs e `manage.py load_reports`).
+
+Cada item é validado com as mesmas regras do DiagnosticReportForm; os válidos
+são inseridos com um único `bulk_create` dentro de uma transação e cada item
+recebe seu resultado (criado + id, ou erros de validação).
+"""
+import gzip
+import io
+import json
+import zlib
+
+from django.db import transaction
+
+from . import caching, rollups, units
+from .forms import DiagnosticReportForm
+from .models import DiagnosticReport
+
+BULK_BATCH_SIZE = 500
+
+
+class PayloadError(Exception):
+    """Corpo do lote ilegível (gzip/JSON inválido...)."""
+    status = 400
+
+
+class PayloadTooLarge(PayloadError):
+    """Corpo (ou o que ele vira descompactado) acima de DIAGNOSTICS_INGEST_MAX_BYTES."""
+    status = 413
+
+
+def read_body(request, max_bytes):
+    """
+    Lê o corpo do request até `max_bytes`. Não usa `request.body`, que
+    recusa qualquer coisa acima de DATA_UPLOAD_MAX_MEMORY_SIZE com um 400
+    genérico antes de o limite da ingestão valer.
+    """
+    try:
+        declared = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError:
+        declared = 0
+    if declared > max_bytes:
+        raise PayloadTooLarge(f"lote excede {max_bytes} bytes")
+    body = request.read(max_bytes + 1)
+    if len(body) > max_bytes:
+        raise PayloadTooLarge(f"lote excede {max_bytes} bytes")
+    return body
+
+
+def decode_body(body, content_encoding="", max_bytes=None):
+    """Descompacta (gzip) e decodifica o JSON do lote, limitando o tamanho descompactado."""
+    if content_encoding.strip().lower() == "gzip":
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = inflater.decompress(body, max_bytes + 1 if max_bytes else 0)
+        except zlib.error as exc:
+            raise PayloadError(f"gzip inválido: {exc}")
+        if max_bytes and (len(body) > max_bytes or inflater.unconsumed_tail):
+            raise PayloadTooLarge(f"lote descompactado excede {max_bytes} bytes")
+
+    try:
+        payload = json.loads(body)
+    except (UnicodeDecodeError, ValueError) as exc:
+        raise PayloadError(f"JSON inválido: {exc}")
+
+    items = payload.get("reports") if isinstance(payload, dict) else payload
+    if not isinstance(items, list):
+        raise PayloadError('esperado uma lista de relatórios ou {"reports": [...]}')
+    return items
+
+
+def ingest_batch(items, all_or_nothing=False):
+    """
+    Valida e insere `items` (dicts com os campos do formulário). Retorna
+    uma lista de resultados na mesma ordem dos itens. Com `all_or_nothing`,
+    um item inválido impede a gravação do lote inteiro (os válidos voltam
+    com status "skipped").
+    """
+    results = []
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            results.append({"index": index, "status": "error", "errors": {"__all__": ["item deve ser um objeto"]}})
+            continue
+        form = DiagnosticReportForm(data=item)
+        if form.is_valid():
+            result = {"index": index, "status": "created"}
+            valid.append((result, form.save(commit=False)))
+        else:
+            result = {"index": index, "status": "error", "errors": form.errors.get_json_data(escape_html=True)}
+        results.append(result)
+
+    if all_or_nothing and len(valid) < len(results):
+        for result, _report in valid:
+            result["status"] = "skipped"
+        return results
+
+    if valid:
+        with transaction.atomic():
+            created = DiagnosticReport.objects.bulk_create([r for _res, r in valid], batch_size=BULK_BATCH_SIZE)
+            rollups.add_reports(created)
+        for (result, _report), report in zip(valid, created):
+            result["id"] = report.pk
+        # bulk_create não dispara post_save: invalida as listagens aqui
+        caching.bump_list_generation()
+        units.invalidate_summary()
+
+    return results
+
+
+def iter_jsonl(fp):
+    """Lê relatórios de um arquivo JSONL (um objeto JSON por linha, .gz aceito)."""
+    head = fp.peek(2)[:2] if hasattr(fp, "peek") else b""
+    if head == b"\x1f\x8b":
+        fp = gzip.GzipFile(fileobj=fp)
+    for lineno, line in enumerate(io.TextIOWrapper(fp, encoding="utf-8"), start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield lineno, json.loads(line)
+        except ValueError as exc:
+            yield lineno, PayloadError(f"linha {lineno}: JSON inválido: {exc}")
@@ -0,0 +1,111 @@
+import logging
+import subprocess
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import ProcessingJob
+
+logger = logging.getLogger("diagnostics.jobs")
+
+# kind -> (handler, on_failure). Carregados sob demanda para não importar
+# ffmpeg/Pillow helpers em todo request.
+HANDLERS = {
+    ProcessingJob.Kind.VIDEO_TRANSCODE: (
+        "diagnostics.video.process_video_blob",
+        "diagnostics.video.mark_blob_failed",
+    ),
+}
+
+RETRY_BACKOFF_SECONDS = 30
+
+
+def claim_next(worker_id):
+    """
+    Reserva o próximo job pendente. O UPDATE condicional garante que dois
+    workers nunca peguem o mesmo job (funciona em SQLite e Postgres).
+    """
+    now = timezone.now()
+    candidates = (
+        ProcessingJob.objects
+        .filter(status=ProcessingJob.Status.PENDING, run_after__lte=now)
+        .order_by("run_after", "id")
+        .values_list("id", flat=True)[:10]
+    )
+    for job_id in candidates:
+        claimed = ProcessingJob.objects.filter(pk=job_id, status=ProcessingJob.Status.PENDING).update(
+            status=ProcessingJob.Status.PROCESSING,
+            locked_by=worker_id,
+            started_at=now,
+            attempts=F("attempts") + 1,
+        )
+        if claimed:
+            return ProcessingJob.objects.get(pk=job_id)
+    return None
+
+
+def run_job(job):
+    """Executa o handler do job e registra duração, erro e próxima tentativa."""
+    handler_path, on_failure_path = HANDLERS[job.kind]
+    started = time.monotonic()
+    try:
+        import_string(handler_path)(job.object_id)
+    except Exception as exc:
+        job.duration_ms = int((time.monotonic() - started) * 1000)
+        job.last_error = _describe_error(exc)
+        job.finished_at = timezone.now()
+        if job.attempts < job.max_attempts:
+            job.status = ProcessingJob.Status.PENDING
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (job.attempts - 1))
+            logger.warning("job %s (%s #%s) falhou, nova tentativa em %s: %s",
+                           job.pk, job.kind, job.object_id, job.run_after, job.last_error.splitlines()[0])
+        else:
+            job.status = ProcessingJob.Status.FAILED
+            import_string(on_failure_path)(job.object_id)
+            logger.error("job %s (%s #%s) falhou definitivamente após %s tentativa(s)",
+                         job.pk, job.kind, job.object_id, job.attempts)
+    else:
+        job.duration_ms = int((time.monotonic() - started) * 1000)
+        job.status = ProcessingJob.Status.DONE
+        job.finished_at = timezone.now()
+        job.last_error = ""
+        logger.info("job %s (%s #%s) concluído em %d ms", job.pk, job.kind, job.object_id, job.duration_ms)
+
+    job.locked_by = ""
+    job.save(update_fields=["status", "run_after", "locked_by", "finished_at", "duration_ms", "last_error"])
+    return job
+
+
+def run_claimed(job):
+    """Wrapper para threads do worker: cada thread usa (e fecha) sua conexão."""
+    close_old_connections()
+    try:
+        return run_job(job)
+    finally:
+        close_old_connections()
+
+
+def requeue_stale(timeout=None):
+    """
+    Devolve para a fila jobs presos em `processing` (worker morto no meio).
+    """
+    timeout = timeout or getattr(settings, "DIAGNOSTICS_TRANSCODE_TIMEOUT", 300)
+    cutoff = timezone.now() - timedelta(seconds=timeout * 2)
+    return ProcessingJob.objects.filter(
+        status=ProcessingJob.Status.PROCESSING, started_at__lt=cutoff,
+    ).update(status=ProcessingJob.Status.PENDING, locked_by="", run_after=timezone.now())
+
+
+def _describe_error(exc):
+    if isinstance(exc, subprocess.TimeoutExpired):
+        return f"timeout após {exc.timeout}s: {' '.join(exc.cmd[:3])}..."
+    if isinstance(exc, subprocess.CalledProcessError):
+        stderr = (exc.stderr or b"").decode("utf-8", "replace")[-2000:]
+        return f"{exc.cmd[0]} saiu com código {exc.returncode}\n{stderr}"
+    return "".join(traceback.format_exception_only(type(exc), exc)).strip()
@@ -0,0 +1,194 @@
+"""
+Gerador de carga simples (threads + http.client) para comparar modos de
+deploy: N requests com C conexões simultâneas, latência por request.
+`run` repete GETs; `run_mix` sorteia entre ações com pesos (tráfego misto).
+Sem dependências além da stdlib.
+"""
+import contextlib
+import http.client
+import itertools
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextlib.contextmanager
+def gunicorn(args, cwd, ready_path="/", env=None, timeout=30):
+    """
+    Sobe `gunicorn <args>` numa porta livre (com `env` somado ao ambiente
+    atual), espera responder em `ready_path` e devolve a URL base. Encerra o
+    servidor na saída do bloco.
+    """
+    port = free_port()
+    cmd = [sys.executable, "-m", "gunicorn", *args, "--bind", f"127.0.0.1:{port}", "--log-level", "warning"]
+    proc = subprocess.Popen(cmd, cwd=cwd, env={**os.environ, **(env or {})})
+    base = f"http://127.0.0.1:{port}"
+    try:
+        _wait_ready(base + ready_path, proc, timeout)
+        yield base
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+
+
+def _wait_ready(url, proc, timeout):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"o servidor saiu com código {proc.returncode}")
+        try:
+            fetch(url, timeout=2)
+            return
+        except OSError:
+            time.sleep(0.3)
+    raise RuntimeError("o servidor não respondeu a tempo")
+
+
+def request(method, url, body=None, headers=None, timeout=30):
+    """Um request em conexão nova (como um navegador diferente). Retorna (status, headers, segundos)."""
+    parts = urlsplit(url)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    start = time.perf_counter()
+    conn = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        response.read()
+        return response.status, response.headers, time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def fetch(url, timeout=30, headers=None):
+    """GET em `url`. Retorna (status, segundos)."""
+    status, _headers, elapsed = request("GET", url, headers=headers, timeout=timeout)
+    return status, elapsed
+
+
+def encode_multipart(fields, files=()):
+    """
+    Corpo multipart/form-data. `fields`: {nome: valor}; `files`: lista de
+    (campo, nome do arquivo, content-type, bytes). Retorna (corpo, Content-Type).
+    """
+    boundary = f"----loadtest{random.getrandbits(64):016x}"
+    parts = []
+    for name, value in fields.items():
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, filename, content_type, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def run(urls, total, concurrency, timeout=30):
+    """
+    Faz `total` GETs alternando entre `urls`, com `concurrency` em paralelo.
+    Retorna dict com latências (s) dos 2xx/3xx, nº de erros e tempo total.
+    """
+    counter = itertools.count()
+    cycle = itertools.cycle(urls)
+    lock = threading.Lock()
+    latencies, errors = [], []
+
+    def worker():
+        while next(counter) < total:
+            with lock:
+                url = next(cycle)
+            try:
+                status, elapsed = fetch(url, timeout=timeout)
+            except OSError as exc:
+                errors.append(repr(exc))
+                continue
+            if status >= 400:
+                errors.append(f"HTTP {status} {url}")
+            else:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    return {"latencies": latencies, "errors": errors, "elapsed": time.perf_counter() - start}
+
+
+def run_mix(actions, total, concurrency, seed=0):
+    """
+    Faz `total` ações sorteadas (com `seed`, sempre a mesma sequência) de
+    `actions` = {nome: (peso, função)}, com `concurrency` em paralelo. Cada
+    função recebe um dict de estado da sua thread (cookies, tokens) e retorna
+    (status, segundos) do request medido. Retorna {nome: resultado de `run`},
+    com a chave "total" somando todas.
+    """
+    names = list(actions)
+    schedule = random.Random(seed).choices(names, weights=[actions[n][0] for n in names], k=total)
+    counter = itertools.count()
+    results = {name: {"latencies": [], "errors": []} for name in names}
+
+    def worker():
+        state = {}
+        while (i := next(counter)) < total:
+            name = schedule[i]
+            try:
+                status, elapsed = actions[name][1](state)
+            except (OSError, http.client.HTTPException) as exc:
+                results[name]["errors"].append(repr(exc))
+                continue
+            if status >= 400:
+                results[name]["errors"].append(f"HTTP {status} {name}")
+            else:
+                results[name]["latencies"].append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(worker)
+    elapsed = time.perf_counter() - start
+    for result in results.values():
+        result["elapsed"] = elapsed
+    results["total"] = {
+        "latencies": [x for name in names for x in results[name]["latencies"]],
+        "errors": [x for name in names for x in results[name]["errors"]],
+        "elapsed": elapsed,
+    }
+    return results
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = (len(ordered) - 1) * pct / 100
+    lo, hi = int(k), min(int(k) + 1, len(ordered) - 1)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (k - lo)
+
+
+def summarize(result):
+    lat = result["latencies"]
+    return {
+        "requests": len(lat),
+        "errors": len(result["errors"]),
+        "rps": len(lat) / result["elapsed"] if result["elapsed"] else 0.0,
+        "mean_ms": statistics.fmean(lat) * 1000 if lat else 0.0,
+        "p50_ms": percentile(lat, 50) * 1000,
+        "p95_ms": percentile(lat, 95) * 1000,
+        "p99_ms": percentile(lat, 99) * 1000,
+        "max_ms": max(lat) * 1000 if lat else 0.0,
+    }
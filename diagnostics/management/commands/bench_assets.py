@@ -0,0 +1,115 @@
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import urljoin, urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from diagnostics import loadtest
+from diagnostics.models import DiagnosticReport
+
+ACCEPT_ENCODING = "br, gzip"
+
+
+class BlockingResources(HTMLParser):
+    """CSS e scripts que seguram o primeiro paint (sem async/defer/module)."""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == "link" and "stylesheet" in (attrs.get("rel") or "").split() and attrs.get("href"):
+            self.urls.append(attrs["href"])
+        elif tag == "script" and attrs.get("src"):
+            if not ({"async", "defer"} & attrs.keys() or attrs.get("type") == "module"):
+                self.urls.append(attrs["src"])
+
+
+def fetch(url, timeout=10):
+    """GET como um navegador (br/gzip). Retorna (bytes na rede, segundos, headers) ou None se falhar."""
+    request = urllib.request.Request(url, headers={"Accept-Encoding": ACCEPT_ENCODING, "User-Agent": "bench_assets"})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            body = response.read()  # urllib não descomprime: é o que trafega
+            return len(body), time.perf_counter() - start, response.headers
+    except (OSError, urllib.error.URLError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede o que a listagem e o detalhe baixam antes do primeiro paint: HTML + "
+        "CSS/JS bloqueantes, bytes na rede (br/gzip), cache e tempo estimado."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--base-url", default="",
+            help="Servidor já rodando (ex.: https://app.onrender.com). Padrão: sobe o gunicorn local "
+                 "com DJANGO_DEBUG=false (rode collectstatic antes).",
+        )
+        parser.add_argument("--paths", default="", help="Caminhos separados por vírgula (padrão: listagem + detalhe).")
+        parser.add_argument("--runs", type=int, default=5, help="Repetições por página (tempo = mediana).")
+
+    def handle(self, *args, **opts):
+        paths = [p for p in opts["paths"].split(",") if p]
+        if not paths:
+            latest = DiagnosticReport.objects.order_by("-id").values_list("id", flat=True).first()
+            paths = ["/diagnostics/"] + ([f"/diagnostics/{latest}/"] if latest else [])
+
+        if opts["base_url"]:
+            self.report(opts["base_url"].rstrip("/"), paths, opts["runs"])
+            return
+        try:
+            with loadtest.gunicorn(
+                ["app.wsgi:application", "--workers", "2"], cwd=settings.BASE_DIR,
+                ready_path=paths[0], env={"DJANGO_DEBUG": "false"},
+            ) as base:
+                self.report(base, paths, opts["runs"])
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
+
+    def report(self, base, paths, runs):
+        for path in paths:
+            page = fetch(base + path)
+            if page is None:
+                raise CommandError(f"{path}: sem resposta")
+            with urllib.request.urlopen(base + path, timeout=10) as response:
+                parser = BlockingResources()
+                parser.feed(response.read().decode("utf-8", "replace"))
+            resources = [urljoin(base + path, u) for u in parser.urls]
+
+            self.stdout.write(f"\n{path}  (HTML: {page[0] / 1024:.1f} KiB, {page[2].get('Content-Encoding') or 'sem compressão'})")
+            total = page[0]
+            for url in resources:
+                result = fetch(url)
+                origin = "3º" if urlsplit(url).netloc != urlsplit(base).netloc else "app"
+                if result is None:
+                    self.stdout.write(f"  [{origin}] {url}: indisponível daqui (não somado)")
+                    continue
+                size, _elapsed, headers = result
+                total += size
+                self.stdout.write(
+                    f"  [{origin}] {url}: {size / 1024:.1f} KiB "
+                    f"({headers.get('Content-Encoding') or 'sem compressão'}; "
+                    f"Cache-Control: {headers.get('Cache-Control') or '-'})"
+                )
+
+            # Primeiro paint (estimado): HTML + o mais lento dos bloqueantes, baixados em paralelo
+            timings = []
+            for _run in range(runs):
+                html = fetch(base + path)
+                with ThreadPoolExecutor(max_workers=max(1, len(resources))) as pool:
+                    blocking = [r for r in pool.map(fetch, resources) if r is not None]
+                timings.append((html[1] if html else 0) + max((r[1] for r in blocking), default=0))
+            timings.sort()
+            self.stdout.write(
+                f"  total antes do paint: {total / 1024:.1f} KiB em {1 + len(resources)} request(s); "
+                f"tempo estimado (mediana de {runs}): {timings[len(timings) // 2] * 1000:.0f} ms"
+            )
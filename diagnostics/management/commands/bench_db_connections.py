@@ -0,0 +1,80 @@
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from diagnostics import loadtest
+from diagnostics.models import DiagnosticReport
+
+# Variáveis de ambiente de cada modo (lidas por DATABASES em settings.py)
+MODES = {
+    "none": {"DB_CONN_MAX_AGE": "0", "DB_POOL": "false"},
+    "persistent": {"DB_CONN_MAX_AGE": "60", "DB_POOL": "false"},
+    "pool": {"DB_CONN_MAX_AGE": "0", "DB_POOL": "true"},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compara, com o gunicorn em gthread, uma conexão nova por request "
+        "(DB_CONN_MAX_AGE=0), conexões persistentes e o pool do psycopg 3 "
+        "(só Postgres) em endpoints que consultam o banco."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default="none,persistent,pool")
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--threads", type=int, default=4)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument(
+            "--paths", default="",
+            help="Caminhos separados por vírgula (padrão: /healthz + listagem e detalhe sem cache).",
+        )
+
+    def handle(self, *args, **opts):
+        paths = [p for p in opts["paths"].split(",") if p]
+        if not paths:
+            latest = DiagnosticReport.objects.order_by("-id").values_list("id", flat=True).first()
+            if latest is None:
+                raise CommandError("Sem relatórios no banco: rode load_reports/seed antes.")
+            paths = ["/healthz", "/diagnostics/", f"/diagnostics/{latest}/"]
+
+        modes = opts["modes"].split(",")
+        for mode in modes:
+            if mode not in MODES:
+                raise CommandError(f"modo desconhecido: {mode}")
+        if "pool" in modes and connection.vendor != "postgresql":
+            self.stderr.write("pool: só existe no backend Postgres; ignorado.")
+            modes.remove("pool")
+
+        self.stdout.write(
+            f"{connection.vendor}: {opts['requests']} requests, {opts['concurrency']} simultâneos, "
+            f"{opts['workers']}x{opts['threads']} threads | {', '.join(paths)}"
+        )
+        rows = [(mode, self.bench(mode, paths, opts)) for mode in modes]
+
+        self.stdout.write(f"{'modo':<11} {'req/s':>8} {'média':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'erros':>6}")
+        for mode, s in rows:
+            self.stdout.write(
+                f"{mode:<11} {s['rps']:>8.1f} {s['mean_ms']:>7.1f}ms {s['p50_ms']:>7.1f}ms "
+                f"{s['p95_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {s['errors']:>6}"
+            )
+
+    def bench(self, mode, paths, opts):
+        args = [
+            "app.wsgi:application", "--workers", str(opts["workers"]),
+            "--threads", str(opts["threads"]),
+        ]
+        try:
+            with loadtest.gunicorn(args, cwd=settings.BASE_DIR, ready_path="/healthz", env=MODES[mode]) as base:
+                # Querystring única: as páginas não saem do cache e cada request vai ao banco
+                urls = [
+                    f"{base}{p}{'&' if '?' in p else '?'}_={uuid.uuid4().hex}"
+                    for p in paths * opts["requests"]
+                ]
+                loadtest.run(urls, total=min(20, opts["requests"]), concurrency=4)  # aquecimento
+                return loadtest.summarize(loadtest.run(urls, opts["requests"], opts["concurrency"]))
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
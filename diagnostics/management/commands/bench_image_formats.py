@@ -0,0 +1,113 @@
+import json
+import random
+import statistics
+import time
+from io import BytesIO
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw, ImageFilter
+
+from diagnostics import imaging
+
+
+def fixed_corpus(width=1920, height=1080):
+    """
+    Imagens sintéticas fixas (mesmos pixels em toda execução), cobrindo o que
+    chega nos relatórios: foto de equipamento (textura + gradiente), print de
+    tela (cores chapadas e texto) e foto desfocada/pouco detalhada.
+    """
+    rnd = random.Random(2024)
+    photo = Image.blend(
+        Image.effect_noise((width // 3, height // 3), 40).convert("RGB").resize((width, height)),
+        Image.linear_gradient("L").resize((width, height)).convert("RGB"),
+        0.55,
+    )
+    screen = Image.new("RGB", (width, height), (245, 247, 250))
+    draw = ImageDraw.Draw(screen)
+    for row in range(40):
+        y = 20 + row * 26
+        draw.rectangle([20, y, rnd.randint(300, width - 20), y + 14], fill=(rnd.randint(0, 90),) * 3)
+        draw.text((width - 260, y), f"SU-{rnd.randint(100, 999)} {rnd.random():.4f}", fill=(30, 60, 160))
+    blurry = photo.filter(ImageFilter.GaussianBlur(6))
+    return [("foto", photo), ("tela", screen), ("desfocada", blurry)]
+
+
+def load_corpus(directory):
+    corpus = []
+    for path in sorted(Path(directory).iterdir()):
+        try:
+            with Image.open(path) as img:
+                img.draft("RGB", (imaging.MAX_W, imaging.MAX_H))
+                img = img.convert("RGB")
+        except OSError:
+            continue
+        img.thumbnail((imaging.MAX_W, imaging.MAX_H))
+        corpus.append((path.name, img))
+    return corpus
+
+
+class Command(BaseCommand):
+    help = (
+        "Tempo de codificação e bytes de cada formato (AVIF, WEBP, JPEG) em cada "
+        "esforço do encoder, sobre um corpus fixo de imagens (ou --corpus DIR)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--corpus", default="", help="Diretório com imagens reais (padrão: corpus sintético fixo).")
+        parser.add_argument("--efforts", default=",".join(imaging.EFFORTS), help="Separados por vírgula.")
+        parser.add_argument("--formats", default=",".join(imaging.FORMATS))
+        parser.add_argument("--repeat", type=int, default=3, help="Codificações por imagem (vale a mediana).")
+        parser.add_argument("--output", default="", help="Grava o resultado em JSON neste arquivo.")
+
+    def handle(self, *args, **opts):
+        efforts = [e for e in opts["efforts"].split(",") if e]
+        unknown = set(efforts) - set(imaging.EFFORTS)
+        if unknown:
+            raise CommandError(f"esforço desconhecido: {', '.join(sorted(unknown))}")
+        requested = tuple(f for f in opts["formats"].split(",") if f)
+        formats = imaging.supported_formats(requested)
+        for fmt in set(requested) - set(formats):
+            self.stderr.write(f"{fmt}: sem suporte neste Pillow, ignorado")
+
+        corpus = load_corpus(opts["corpus"]) if opts["corpus"] else fixed_corpus()
+        if not corpus:
+            raise CommandError("corpus vazio")
+        self.stdout.write(
+            f"{len(corpus)} imagem(ns): " + ", ".join(f"{name} {img.width}x{img.height}" for name, img in corpus)
+        )
+
+        results = []
+        for effort in efforts:
+            for fmt in formats:
+                timings, sizes = [], []
+                for _name, img in corpus:
+                    runs = []
+                    for _run in range(opts["repeat"]):
+                        buf = BytesIO()
+                        start = time.perf_counter()
+                        imaging.save(img, buf, fmt, effort=effort)
+                        runs.append(time.perf_counter() - start)
+                    timings.append(statistics.median(runs) * 1000)
+                    sizes.append(buf.tell())
+                results.append({
+                    "effort": effort, "format": fmt,
+                    "ms_per_image": round(statistics.mean(timings), 1),
+                    "bytes": sum(sizes),
+                    "per_image": dict(zip((name for name, _img in corpus), sizes)),
+                })
+
+        # Tamanho relativo ao JPEG do mesmo esforço (o fallback que todo navegador recebe)
+        baseline = {r["effort"]: r["bytes"] for r in results if r["format"] == "jpeg"}
+        self.stdout.write(f"\n{'esforço':<10} {'formato':<8} {'ms/imagem':>10} {'KiB total':>10} {'× JPEG':>7}")
+        for r in results:
+            ratio = f"{r['bytes'] / baseline[r['effort']]:.2f}" if r["effort"] in baseline else "—"
+            self.stdout.write(
+                f"{r['effort']:<10} {r['format']:<8} {r['ms_per_image']:>10.1f} {r['bytes'] / 1024:>10.1f} {ratio:>7}"
+            )
+
+        if opts["output"]:
+            with open(opts["output"], "w", encoding="utf-8") as fp:
+                json.dump({"corpus": [name for name, _img in corpus], "results": results}, fp, indent=2)
+                fp.write("\n")
+            self.stdout.write(f"\nresultado gravado em {opts['output']}")
@@ -0,0 +1,88 @@
+import os
+import random
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from diagnostics import imaging
+
+
+def make_jpeg(width, height, seed):
+    """JPEG sintético com ruído + gradiente (não comprime trivialmente)."""
+    rnd = random.Random(seed)
+    img = Image.effect_noise((width // 4, height // 4), 64).convert("RGB")
+    img = img.resize((width, height))
+    overlay = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    img = Image.blend(img, overlay, rnd.uniform(0.3, 0.7))
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=90)
+    return buf.getvalue()
+
+
+def legacy_ingest(storage, uploads):
+    """
+    Caminho antigo do ImageAttachment.save(): grava o original, reabre,
+    decodifica em resolução cheia, codifica WEBP e grava o segundo arquivo.
+    """
+    for name, data in uploads:
+        saved = storage.save(f"legacy/{name}", ContentFile(data))
+        with storage.open(saved) as fp:
+            img = Image.open(fp).convert("RGB")
+            img.thumbnail((imaging.MAX_W, imaging.MAX_H))
+            buf = BytesIO()
+            img.save(buf, format="WEBP", quality=80, method=6)
+        base, _ext = os.path.splitext(os.path.basename(saved))
+        storage.save(f"legacy/{base}.webp", ContentFile(buf.getvalue()))
+
+
+def pipeline_ingest(storage, uploads, workers):
+    """Caminho novo: draft + pool de processos + uma única gravação."""
+    results = imaging.encode_batch([data for _name, data in uploads], max_workers=workers, formats=("webp",))
+    for (name, _data), variants in zip(uploads, results):
+        base, _ext = os.path.splitext(name)
+        storage.save(f"pipeline/{base}.webp", ContentFile(variants["webp"]))
+
+
+class Command(BaseCommand):
+    help = "Compara a vazão da ingestão de imagens (caminho antigo x pipeline) para 1, 10 e 50 imagens."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1,10,50", help="Tamanhos de lote separados por vírgula.")
+        parser.add_argument("--width", type=int, default=4000)
+        parser.add_argument("--height", type=int, default=3000)
+        parser.add_argument("--workers", type=int, default=None, help="Processos do pool (padrão: nº de CPUs).")
+
+    def handle(self, *args, **opts):
+        sizes = [int(s) for s in opts["sizes"].split(",") if s.strip()]
+        self.stdout.write(f"Gerando {max(sizes)} JPEG(s) {opts['width']}x{opts['height']}...")
+        corpus = [(f"img{i:03d}.jpg", make_jpeg(opts["width"], opts["height"], i)) for i in range(max(sizes))]
+
+        # Aquece o pool para não medir o spawn dos processos
+        imaging.encode_batch([corpus[0][1], corpus[0][1]], max_workers=opts["workers"])
+
+        self.stdout.write(f"{'imagens':>8} {'antigo (s)':>11} {'img/s':>8} {'pipeline (s)':>13} {'img/s':>8} {'ganho':>7}")
+        for n in sizes:
+            uploads = corpus[:n]
+            tmp = tempfile.mkdtemp(prefix="bench-images-")
+            try:
+                storage = FileSystemStorage(location=tmp)
+
+                t0 = time.perf_counter()
+                legacy_ingest(storage, uploads)
+                legacy = time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                pipeline_ingest(storage, uploads, opts["workers"])
+                pipeline = time.perf_counter() - t0
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+
+            self.stdout.write(
+                f"{n:>8} {legacy:>11.2f} {n / legacy:>8.1f} {pipeline:>13.2f} {n / pipeline:>8.1f} {legacy / pipeline:>6.1f}x"
+            )
@@ -0,0 +1,77 @@
+import gzip
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from diagnostics import ingest
+from diagnostics.forms import DiagnosticReportForm
+
+SYMPTOMS = [
+    "leitura intermitente do sensor térmico",
+    "umidade fora da faixa após chuva",
+    "gateway sem sinal LoRa",
+    "bateria abaixo de 20%",
+    "falha de calibração do CO2",
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+def make_items(n, seed=42):
+    rnd = random.Random(seed)
+    return [
+        {
+            "title": f"SU-{rnd.randint(1, 80):03d}: {rnd.choice(SYMPTOMS)}",
+            "su_identifier": f"SU-{rnd.randint(1, 80):03d}",
+            "user_name": rnd.choice(["Ana", "Bruno", "Carla", "Diego"]),
+            "user_email": "monitoramento@smartlab.example",
+            "message": " ".join(rnd.choice(SYMPTOMS) for _ in range(rnd.randint(3, 12))),
+            "category": rnd.choice(["normal", "critica"]),
+        }
+        for _ in range(n)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Mede linhas/s da ingestão: formulário um a um x lote (bulk_create) x lote gzip+JSON (caminho da API)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=5000)
+        parser.add_argument("--keep", action="store_true", help="Não desfaz as inserções (padrão: rollback).")
+
+    def timed(self, label, fn, rows, keep):
+        start = time.perf_counter()
+        try:
+            with transaction.atomic():
+                fn()
+                if not keep:
+                    raise Rollback
+        except Rollback:
+            pass
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<28} {elapsed:>8.2f}s {rows / elapsed:>12,.0f} linhas/s")
+
+    def handle(self, *args, **opts):
+        rows = opts["rows"]
+        items = make_items(rows)
+        body = gzip.compress(json.dumps({"reports": items}).encode())
+        self.stdout.write(f"{rows} relatórios sintéticos (lote gzip: {len(body) / 1024:.0f} KiB)")
+
+        def one_by_one():
+            for item in items:
+                DiagnosticReportForm(data=item).save()
+
+        def batch():
+            ingest.ingest_batch(items)
+
+        def api_path():
+            ingest.ingest_batch(ingest.decode_body(body, "gzip"))
+
+        self.timed("formulário, um a um", one_by_one, rows, opts["keep"])
+        self.timed("lote (bulk_create)", batch, rows, opts["keep"])
+        self.timed("lote gzip+JSON (API)", api_path, rows, opts["keep"])
@@ -0,0 +1,156 @@
+import io
+import os
+import random
+import re
+import tempfile
+import uuid
+from http.cookies import SimpleCookie
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from diagnostics import bulk, loadtest
+from diagnostics.models import DiagnosticReport
+
+# Argumentos do gunicorn de cada perfil (--bind/--log-level vêm de loadtest.gunicorn)
+PROFILES = {
+    # Como era o entrypoint: padrões do gunicorn (1 worker sync, sem threads/preload)
+    "default": ["app.wsgi:application"],
+    "tuned": ["app.wsgi:application", "-c", "python:app.gunicorn_conf"],
+    "tuned-asgi": ["app.asgi:application", "-c", "python:app.gunicorn_conf", "-k", "uvicorn_worker.UvicornWorker"],
+}
+
+LIST_QUERIES = ["", "?category=critica", "?order_by=title", "?q=sensor", "?category=normal&order_by=created_at"]
+DETAIL_RE = re.compile(r"/diagnostics/(\d+)/$")
+
+
+def sample_jpeg(width=1600, height=1200):
+    """Foto sintética (ruído sobre gradiente): o Pillow tem trabalho de verdade para decodificar e comprimir."""
+    noise = Image.effect_noise((width, height), 48).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    buf = io.BytesIO()
+    Image.blend(noise, gradient, 0.5).save(buf, "JPEG", quality=88)
+    return buf.getvalue()
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe o app com cada perfil do gunicorn e repete um tráfego misto "
+        "(listagem, detalhe e criação com upload de imagem), medindo p50/p95/p99 "
+        "e vazão por tipo de request. Os relatórios criados são apagados no fim."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profiles", default="default,tuned", help=f"Separados por vírgula: {', '.join(PROFILES)}.")
+        parser.add_argument("--requests", type=int, default=600)
+        parser.add_argument("--concurrency", type=int, default=16)
+        parser.add_argument(
+            "--mix", default="list=60,detail=30,create=10",
+            help="Pesos de cada tipo de request (list, detail, create).",
+        )
+        parser.add_argument("--cold", action="store_true", help="Querystring única nas listagens: ignora o cache de páginas.")
+        parser.add_argument("--keep", action="store_true", help="Não apaga os relatórios criados pelo teste.")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **opts):
+        profiles = opts["profiles"].split(",")
+        for profile in profiles:
+            if profile not in PROFILES:
+                raise CommandError(f"perfil desconhecido: {profile}")
+        try:
+            mix = {name: int(weight) for name, weight in (item.split("=") for item in opts["mix"].split(","))}
+        except ValueError:
+            raise CommandError("--mix inválido (ex.: list=60,detail=30,create=10)")
+        if not mix.keys() <= {"list", "detail", "create"}:
+            raise CommandError("--mix aceita list, detail e create")
+
+        detail_ids = list(DiagnosticReport.objects.order_by("-id").values_list("id", flat=True)[:200])
+        if mix.get("detail") and not detail_ids:
+            raise CommandError("Sem relatórios no banco: rode load_reports/seed antes.")
+
+        self.image = sample_jpeg()
+        self.created = []
+        self.stdout.write(
+            f"{opts['requests']} requests, {opts['concurrency']} simultâneos | mix {opts['mix']} | "
+            f"upload de {len(self.image) // 1024} KiB por criação"
+        )
+        try:
+            for profile in profiles:
+                self.report(profile, self.bench(profile, mix, detail_ids, opts))
+        finally:
+            if self.created and not opts["keep"]:
+                removed = bulk.delete_reports(DiagnosticReport.objects.filter(pk__in=self.created))
+                self.stdout.write(f"\n{removed} relatório(s) criado(s) pelo teste apagado(s).")
+
+    def bench(self, profile, mix, detail_ids, opts):
+        # Cache em arquivo, compartilhado entre os workers (como no container)
+        with tempfile.TemporaryDirectory() as cache_dir:
+            try:
+                with loadtest.gunicorn(
+                    PROFILES[profile], cwd=settings.BASE_DIR, ready_path="/healthz",
+                    env={"DJANGO_CACHE_DIR": cache_dir},
+                ) as base:
+                    actions = self.actions(base, mix, detail_ids, opts["cold"])
+                    warmup = {name: (1, action) for name, (_w, action) in actions.items() if name != "create"}
+                    loadtest.run_mix(warmup, total=20, concurrency=4)
+                    return loadtest.run_mix(actions, opts["requests"], opts["concurrency"], seed=opts["seed"])
+            except RuntimeError as exc:
+                raise CommandError(f"{profile}: {exc}")
+
+    def actions(self, base, mix, detail_ids, cold):
+        def list_page(state):
+            query = random.choice(LIST_QUERIES)
+            if cold:
+                query += f"{'&' if query else '?'}_={uuid.uuid4().hex}"
+            return loadtest.fetch(f"{base}/diagnostics/{query}")
+
+        def detail(state):
+            return loadtest.fetch(f"{base}/diagnostics/{random.choice(detail_ids)}/")
+
+        def create(state):
+            if "csrftoken" not in state:
+                # Como o navegador: abre o formulário uma vez e guarda o cookie CSRF
+                _status, headers, _elapsed = loadtest.request("GET", f"{base}/diagnostics/new/")
+                cookie = SimpleCookie()
+                for value in headers.get_all("Set-Cookie") or []:
+                    cookie.load(value)
+                state["csrftoken"] = cookie["csrftoken"].value if "csrftoken" in cookie else ""
+            token = state["csrftoken"]
+            body, content_type = loadtest.encode_multipart(
+                {
+                    "title": "Teste de carga", "su_identifier": "SU-LOAD", "user_name": "bench_load",
+                    "user_email": "bench@example.com", "message": "Relatório gerado pelo bench_load.",
+                    "category": "normal",
+                },
+                # Bytes extras depois do fim do JPEG: conteúdo (SHA-256) inédito a cada
+                # upload, para a deduplicação não pular a compressão
+                [("images", "foto.jpg", "image/jpeg", self.image + os.urandom(16))],
+            )
+            status, headers, elapsed = loadtest.request("POST", f"{base}/diagnostics/new/", body, {
+                "Content-Type": content_type, "Cookie": f"csrftoken={token}", "X-CSRFToken": token,
+            })
+            match = DETAIL_RE.search(headers.get("Location") or "")
+            if status == 302 and match:
+                self.created.append(int(match.group(1)))
+            elif status < 400:
+                status = 422  # formulário voltou com erro
+            return status, elapsed
+
+        available = {"list": list_page, "detail": detail, "create": create}
+        return {name: (weight, available[name]) for name, weight in mix.items() if weight > 0}
+
+    def report(self, profile, results):
+        self.stdout.write(f"\n{profile}")
+        self.stdout.write(
+            f"  {'tipo':<8} {'req':>5} {'req/s':>8} {'média':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'erros':>6}"
+        )
+        for name, result in results.items():
+            s = loadtest.summarize(result)
+            self.stdout.write(
+                f"  {name:<8} {s['requests']:>5} {s['rps']:>8.1f} {s['mean_ms']:>7.1f}ms {s['p50_ms']:>7.1f}ms "
+                f"{s['p95_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {s['max_ms']:>7.1f}ms {s['errors']:>6}"
+            )
+        errors = results["total"]["errors"]
+        if errors:
+            self.stdout.write(f"  primeiro erro: {errors[0]}")
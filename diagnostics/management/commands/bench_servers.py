@@ -0,0 +1,69 @@
+import uuid
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from diagnostics import loadtest
+from diagnostics.models import DiagnosticReport
+
+SERVERS = {
+    "wsgi": ["app.wsgi:application"],
+    "asgi": ["app.asgi:application", "-k", "uvicorn_worker.UvicornWorker"],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Sobe o app com gunicorn em modo WSGI (sync) e ASGI (uvicorn) e compara "
+        "latência/vazão da listagem e do detalhe sob requests simultâneos."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--modes", default="wsgi,asgi")
+        parser.add_argument("--workers", type=int, default=2, help="Processos do gunicorn.")
+        parser.add_argument("--threads", type=int, default=1, help="Threads por worker no modo WSGI (gthread se > 1).")
+        parser.add_argument("--concurrency", type=int, default=32)
+        parser.add_argument("--requests", type=int, default=1000)
+        parser.add_argument("--paths", default="", help="Caminhos separados por vírgula (padrão: listagem + detalhe mais recente).")
+        parser.add_argument("--cold", action="store_true", help="Querystring única por request: ignora o cache de páginas.")
+
+    def handle(self, *args, **opts):
+        paths = [p for p in opts["paths"].split(",") if p]
+        if not paths:
+            latest = DiagnosticReport.objects.order_by("-id").values_list("id", flat=True).first()
+            if latest is None:
+                raise CommandError("Sem relatórios no banco: rode load_reports/seed antes.")
+            paths = ["/diagnostics/", f"/diagnostics/{latest}/"]
+
+        self.stdout.write(
+            f"{opts['requests']} requests, {opts['concurrency']} simultâneos, "
+            f"{opts['workers']} worker(s) | {', '.join(paths)}"
+        )
+        header = f"{'modo':<6} {'req/s':>8} {'média':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'máx':>8} {'erros':>6}"
+        rows = []
+        for mode in opts["modes"].split(","):
+            if mode not in SERVERS:
+                raise CommandError(f"modo desconhecido: {mode}")
+            rows.append((mode, self.bench(mode, paths, opts)))
+
+        self.stdout.write(header)
+        for mode, s in rows:
+            self.stdout.write(
+                f"{mode:<6} {s['rps']:>8.1f} {s['mean_ms']:>7.1f}ms {s['p50_ms']:>7.1f}ms "
+                f"{s['p95_ms']:>7.1f}ms {s['p99_ms']:>7.1f}ms {s['max_ms']:>7.1f}ms {s['errors']:>6}"
+            )
+
+    def bench(self, mode, paths, opts):
+        args = [*SERVERS[mode], "--workers", str(opts["workers"])]
+        if mode == "wsgi" and opts["threads"] > 1:
+            args += ["--threads", str(opts["threads"])]
+        try:
+            with loadtest.gunicorn(args, cwd=settings.BASE_DIR, ready_path=paths[0]) as base:
+                urls = [base + p for p in paths]
+                if opts["cold"]:
+                    # Cada URL diferente: nenhuma página sai do cache
+                    urls = [f"{u}{'&' if '?' in u else '?'}_={uuid.uuid4().hex}" for u in urls * opts["requests"]]
+                loadtest.run(urls, total=min(20, opts["requests"]), concurrency=4)  # aquecimento
+                return loadtest.summarize(loadtest.run(urls, opts["requests"], opts["concurrency"]))
+        except RuntimeError as exc:
+            raise CommandError(str(exc))
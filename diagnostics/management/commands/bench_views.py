@@ -0,0 +1,77 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diagnostics import benchmarks
+
+
+class Command(BaseCommand):
+    help = (
+        "Mede queries e tempo (mediana, cache vazio) de cada view e combinação de "
+        "filtro/ordenação da listagem e compara com diagnostics/perf_budgets.json. "
+        "Sai com erro se algum caso estourar o orçamento. Rode sobre uma base "
+        "populada (seed_reports); limpa o cache configurado a cada medição."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Execuções por caso (vale a mediana).")
+        parser.add_argument("--only", default="", help="Só os casos cujo nome contém este texto.")
+        parser.add_argument("--budgets", default=str(benchmarks.BUDGETS_PATH))
+        parser.add_argument("--output", default="", help="Grava o resultado em JSON neste arquivo.")
+        parser.add_argument("--compare", default="", help="JSON de uma execução anterior para comparar.")
+        parser.add_argument(
+            "--write-budgets", action="store_true",
+            help="Regrava --budgets a partir desta execução (queries exatas, 3× a mediana + 50 ms).",
+        )
+
+    def handle(self, *args, **opts):
+        try:
+            budgets = {} if opts["write_budgets"] else benchmarks.load_budgets(opts["budgets"])
+            previous = self.load(opts["compare"]) if opts["compare"] else None
+        except (OSError, ValueError) as exc:
+            raise CommandError(str(exc))
+
+        suite = benchmarks.run_suite(runs=opts["runs"], budgets=budgets, only=opts["only"] or None)
+        if not suite["cases"]:
+            raise CommandError("Nenhum caso: a base está vazia? Rode seed_reports antes.")
+
+        meta = suite["meta"]
+        self.stdout.write(f"{meta['reports']:,} relatórios ({meta['vendor']}), {meta['runs']} execução(ões) por caso\n")
+        self.stdout.write(f"{'caso':<34} {'queries':>7} {'mediana':>10} {'máx':>10}  orçamento")
+        failed = 0
+        for name, r in suite["cases"].items():
+            budget = r["budget"]
+            budget_text = f"{budget['max_queries']} q / {budget['max_ms']} ms" if budget else "—"
+            line = f"{name:<34} {r['queries']:>7} {r['median_ms']:>8.1f}ms {r['max_ms']:>8.1f}ms  {budget_text}"
+            if r["problems"]:
+                failed += 1
+                self.stdout.write(self.style.ERROR(f"{line}  ✗ {'; '.join(r['problems'])}"))
+            else:
+                self.stdout.write(line)
+
+        if previous is not None:
+            self.stdout.write(f"\ncomparação com {opts['compare']}")
+            for name, before, now, delta, q_before, q_now in benchmarks.compare(suite, previous):
+                style = self.style.ERROR if delta > 20 or q_now > q_before else (lambda s: s)
+                queries = f"{q_before} → {q_now}" if q_now != q_before else f"{q_now}"
+                self.stdout.write(style(f"{name:<34} {before:>8.1f}ms → {now:>8.1f}ms ({delta:+6.1f}%)  queries {queries}"))
+
+        if opts["output"]:
+            self.dump(opts["output"], suite)
+            self.stdout.write(f"\nresultado gravado em {opts['output']}")
+        if opts["write_budgets"]:
+            self.dump(opts["budgets"], benchmarks.budgets_from(suite))
+            self.stdout.write(self.style.SUCCESS(f"orçamentos gravados em {opts['budgets']}"))
+            return
+        if failed:
+            raise CommandError(f"{failed} caso(s) acima do orçamento")
+        self.stdout.write(self.style.SUCCESS(f"\n{len(suite['cases'])} caso(s) dentro do orçamento"))
+
+    def load(self, path):
+        with open(path, encoding="utf-8") as fp:
+            return json.load(fp)
+
+    def dump(self, path, data):
+        with open(path, "w", encoding="utf-8") as fp:
+            json.dump(data, fp, ensure_ascii=False, indent=2, sort_keys=True)
+            fp.write("\n")
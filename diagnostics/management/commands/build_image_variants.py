@@ -0,0 +1,56 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from diagnostics import imaging, usage
+from diagnostics.models import MediaBlob, blob_path, image_options
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera as variantes AVIF/JPEG (DIAGNOSTICS_IMAGE_FORMATS) das imagens que ainda "
+        "não têm, a partir do WEBP guardado (o original não existe mais)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true",
+            help="Regera também as que já têm (ex.: depois de mudar qualidade ou esforço).",
+        )
+
+    def handle(self, *args, **opts):
+        options = image_options()
+        formats = [fmt for fmt in imaging.supported_formats(options["formats"]) if fmt != "webp"]
+        if not formats:
+            self.stdout.write("Nenhuma variante além do WEBP configurada.")
+            return
+
+        blobs = MediaBlob.objects.filter(kind=MediaBlob.Kind.IMAGE, file__endswith=".webp")
+        if not opts["force"]:
+            missing = Q()
+            for fmt in formats:
+                missing |= Q(**{fmt: ""})
+            blobs = blobs.filter(missing)
+
+        done = failed = 0
+        for blob in blobs.iterator():
+            try:
+                variants = imaging.encode_variants(blob.file.path, **{**options, "formats": tuple(formats)})
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f"blob {blob.pk}: {exc}")
+                continue
+            fields = {}
+            for fmt, data in variants.items():
+                name = blob_path("image", blob.sha256, imaging.EXTENSIONS[fmt])
+                default_storage.delete(name)
+                fields[fmt] = default_storage.save(name, ContentFile(data))
+            derived_size = sum(
+                len(variants[fmt]) if fmt in variants else (getattr(blob, fmt).size if getattr(blob, fmt) else 0)
+                for fmt in ("avif", "jpeg")
+            )
+            MediaBlob.objects.filter(pk=blob.pk).update(derived_size=derived_size, **fields)
+            usage.blob_resized(blob.pk, derived_size - blob.derived_size)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"{done} imagem(ns) atualizada(s), {failed} com erro."))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from diagnostics import caching, usage, video
+from diagnostics.models import MediaBlob
+
+
+class Command(BaseCommand):
+    help = "Gera a capa (e as prévias, se DIAGNOSTICS_VIDEO_SPRITES) dos vídeos já processados que ainda não têm."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regera também os que já têm capa.")
+
+    def handle(self, *args, **opts):
+        blobs = MediaBlob.objects.filter(kind=MediaBlob.Kind.VIDEO, status=MediaBlob.Status.DONE)
+        if not opts["force"]:
+            blobs = blobs.filter(poster="")
+
+        done = 0
+        for blob in blobs.iterator():
+            fields = video.build_previews(blob.file.path, blob.file.name)
+            if not fields:
+                self.stderr.write(f"blob {blob.pk}: capa não gerada")
+                continue
+            MediaBlob.objects.filter(pk=blob.pk).update(**fields)
+            usage.blob_resized(blob.pk, fields["derived_size"] - blob.derived_size)
+            for report_id in set(blob.videos.values_list("report_id", flat=True)):
+                caching.touch_report(report_id)
+            done += 1
+        self.stdout.write(self.style.SUCCESS(f"{done} vídeo(s) atualizados."))
@@ -0,0 +1,52 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diagnostics import export
+from diagnostics.forms import DiagnosticFilterForm
+from diagnostics.models import DiagnosticReport
+
+
+class Command(BaseCommand):
+    help = "Exporta relatórios filtrados (mesmos filtros da busca) em CSV ou JSONL, em streaming."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--format", choices=export.FORMATS, default="csv")
+        parser.add_argument("--output", "-o", help="Arquivo de saída (padrão: stdout).")
+        parser.add_argument("--q", default="", help="Busca textual.")
+        parser.add_argument("--su", default="", help="SU exata, ou prefixo terminado em * (ex.: 'SU-AC*').")
+        parser.add_argument("--category", default="")
+        parser.add_argument("--start-date", default="", help="AAAA-MM-DD")
+        parser.add_argument("--end-date", default="", help="AAAA-MM-DD")
+        parser.add_argument("--order-by", default="-created_at")
+        parser.add_argument("--media", action="store_true", help="Inclui contagens e URLs dos anexos.")
+        parser.add_argument("--base-url", default="", help="Prefixo para tornar as URLs de mídia absolutas.")
+
+    def handle(self, *args, **opts):
+        form = DiagnosticFilterForm({
+            "q": opts["q"],
+            "su": opts["su"],
+            "category": opts["category"],
+            "start_date": opts["start_date"],
+            "end_date": opts["end_date"],
+            "order_by": opts["order_by"],
+        })
+        if not form.is_valid():
+            raise CommandError(f"Filtros inválidos: {form.errors.as_text()}")
+        qs, order_by = form.filter_queryset(DiagnosticReport.objects.all())
+        qs = export.apply_ordering(qs, order_by)
+
+        base_url = opts["base_url"].rstrip("/")
+        lines = export.export_lines(
+            qs, opts["format"],
+            include_media=opts["media"],
+            build_url=(lambda u: base_url + u) if base_url else None,
+        )
+
+        out = open(opts["output"], "w", encoding="utf-8", newline="") if opts["output"] else sys.stdout
+        try:
+            for line in lines:
+                out.write(line)
+        finally:
+            if out is not sys.stdout:
+                out.close()
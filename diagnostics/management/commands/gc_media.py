@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from diagnostics import mediagc
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os arquivos de MEDIA_ROOT/diagnostics que nenhum blob ou anexo "
+        "referencia (mídia de relatórios antigos, compressões interrompidas, "
+        "uploads que não chegaram ao commit) e os diretórios vazios."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Só lista o que seria apagado.")
+        parser.add_argument(
+            "--min-age", type=int, default=mediagc.DEFAULT_MIN_AGE // 60,
+            help="Ignora arquivos modificados há menos de N minutos (uploads/compressões em andamento).",
+        )
+        parser.add_argument("--check-missing", action="store_true", help="Lista também os registros cujo arquivo sumiu.")
+
+    def handle(self, *args, **opts):
+        verbose = opts["verbosity"] > 1 or opts["dry_run"]
+
+        def on_orphan(name, size):
+            if verbose:
+                self.stdout.write(f"{size:>12,}  {name}")
+
+        stats = mediagc.collect(min_age=opts["min_age"] * 60, dry_run=opts["dry_run"], on_orphan=on_orphan)
+        action = "seriam apagados" if opts["dry_run"] else "apagados"
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['files']} arquivo(s) órfão(s) {action} ({stats['bytes'] / 1024 / 1024:.1f} MiB), "
+            f"{stats['dirs']} diretório(s) vazio(s) removido(s)."
+        ))
+
+        if opts["check_missing"]:
+            missing = 0
+            for model, pk, name in mediagc.missing_files():
+                missing += 1
+                self.stdout.write(self.style.WARNING(f"sem arquivo: {model.__name__} #{pk} → {name}"))
+            self.stdout.write(f"{missing} registro(s) sem arquivo.")
@@ -0,0 +1,60 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from diagnostics import ingest
+
+
+class Command(BaseCommand):
+    help = "Carrega relatórios de um arquivo JSONL (um objeto por linha; .gz aceito) em lotes com bulk_create."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="Arquivo JSONL, ou '-' para stdin.")
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument(
+            "--stop-on-error", action="store_true",
+            help="Interrompe no primeiro lote com item inválido, sem gravar esse lote (os anteriores já foram gravados).",
+        )
+
+    def handle(self, *args, **opts):
+        fp = sys.stdin.buffer if opts["path"] == "-" else open(opts["path"], "rb")
+        created = failed = 0
+        start = time.perf_counter()
+
+        def flush(batch):
+            nonlocal created, failed
+            results = ingest.ingest_batch([item for _l, item in batch], all_or_nothing=opts["stop_on_error"])
+            for (lineno, _item), result in zip(batch, results):
+                if result["status"] == "created":
+                    created += 1
+                elif result["status"] == "error":
+                    failed += 1
+                    self.stderr.write(f"linha {lineno}: {result['errors']}")
+            if opts["stop_on_error"] and failed:
+                raise CommandError(f"item inválido; carga interrompida ({created} criado(s) em lotes anteriores)")
+
+        try:
+            batch = []
+            for lineno, item in ingest.iter_jsonl(fp):
+                if isinstance(item, ingest.PayloadError):
+                    failed += 1
+                    self.stderr.write(str(item))
+                    if opts["stop_on_error"]:
+                        raise CommandError(f"linha inválida; carga interrompida ({created} criado(s) em lotes anteriores)")
+                    continue
+                batch.append((lineno, item))
+                if len(batch) >= opts["batch_size"]:
+                    flush(batch)
+                    batch = []
+            if batch:
+                flush(batch)
+        finally:
+            if fp is not sys.stdin.buffer:
+                fp.close()
+
+        elapsed = time.perf_counter() - start
+        rate = created / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"{created} criado(s), {failed} com erro em {elapsed:.2f}s ({rate:,.0f} linhas/s)."
+        ))
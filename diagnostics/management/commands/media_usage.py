@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from diagnostics import usage
+
+
+def _mib(size):
+    return f"{size / 1024 / 1024:,.1f} MiB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Mostra o uso de disco da mídia (total e relatórios que mais ocupam) a "
+        "partir da tabela ReportMediaUsage, sem varrer o MEDIA_ROOT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top", type=int, default=10, help="Quantos relatórios listar.")
+        parser.add_argument(
+            "--rebuild", action="store_true",
+            help="Recalcula a tabela a partir dos anexos (backfill ou depois de bulk_create).",
+        )
+
+    def handle(self, *args, **opts):
+        if opts["rebuild"]:
+            rows = usage.rebuild()
+            self.stdout.write(self.style.SUCCESS(f"Uso de disco reconstruído: {rows} relatório(s) com mídia."))
+
+        t = usage.totals()
+        self.stdout.write(
+            f"{t['reports']:,} relatório(s) com mídia: {t['images']:,} imagem(ns), {t['videos']:,} vídeo(s), "
+            f"{_mib(t['referenced_bytes'])} referenciados"
+        )
+        self.stdout.write(f"{t['blobs']:,} arquivo(s) de mídia em disco (sem repetição): {_mib(t['stored_bytes'])}")
+        if opts["top"]:
+            self.stdout.write("")
+            for row in usage.top_reports(opts["top"]):
+                self.stdout.write(
+                    f"{_mib(row.bytes):>14}  #{row.report_id} {row.report.title[:60]} "
+                    f"({row.images} img, {row.videos} vídeo)"
+                )
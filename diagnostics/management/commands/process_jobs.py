@@ -0,0 +1,89 @@
+import logging
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from diagnostics import jobs, resumable
+
+logger = logging.getLogger("diagnostics.jobs")
+
+# Intervalo (s) da manutenção periódica: jobs presos em `processing` por um
+# worker que morreu voltam para a fila e uploads retomáveis expirados são apagados
+MAINTENANCE_INTERVAL = 600
+
+
+class Command(BaseCommand):
+    help = "Worker da fila de processamento de mídia (compressão de vídeos etc.)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency", type=int,
+            default=getattr(settings, "DIAGNOSTICS_JOB_CONCURRENCY", 1),
+            help="Quantidade máxima de jobs executando ao mesmo tempo.",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=2.0,
+            help="Segundos entre consultas quando a fila está vazia.",
+        )
+        parser.add_argument(
+            "--once", action="store_true",
+            help="Esvazia a fila e termina (útil em cron/testes).",
+        )
+
+    def handle(self, *args, **opts):
+        concurrency = max(1, opts["concurrency"])
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.stdout.write(f"Worker {worker_id} iniciado (concorrência={concurrency}).")
+
+        running = {}
+        next_maintenance = 0.0
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            try:
+                while True:
+                    if time.monotonic() >= next_maintenance:
+                        self.maintenance()
+                        next_maintenance = time.monotonic() + MAINTENANCE_INTERVAL
+
+                    while len(running) < concurrency:
+                        job = jobs.claim_next(worker_id)
+                        if job is None:
+                            break
+                        running[pool.submit(jobs.run_claimed, job)] = job
+
+                    if running:
+                        done, _pending = wait(running, timeout=opts["poll_interval"], return_when=FIRST_COMPLETED)
+                        for fut in done:
+                            self.report(running.pop(fut), fut)
+                    elif opts["once"]:
+                        break
+                    else:
+                        time.sleep(opts["poll_interval"])
+            except KeyboardInterrupt:
+                self.stdout.write("Encerrando: aguardando jobs em execução...")
+                wait(running)
+
+    def maintenance(self):
+        requeued = jobs.requeue_stale()
+        if requeued:
+            self.stdout.write(f"{requeued} job(s) travado(s) devolvido(s) à fila.")
+        purged = resumable.purge_expired()
+        if purged:
+            self.stdout.write(f"{purged} upload(s) expirado(s) removido(s).")
+
+    def report(self, job, fut):
+        try:
+            job = fut.result()
+        except Exception:
+            # Falhou fora do handler (on_failure, job.save, banco fora do ar): o
+            # job fica em `processing` e o requeue_stale o devolve à fila depois
+            logger.exception("job %s (%s #%s): erro ao registrar o resultado", job.pk, job.kind, job.object_id)
+            self.stderr.write(f"[erro] {job.kind} #{job.object_id}: resultado não registrado (ver log)")
+            return
+        self.stdout.write(
+            f"[{job.get_status_display()}] {job.kind} #{job.object_id} "
+            f"tentativa {job.attempts}/{job.max_attempts} em {job.duration_ms} ms"
+        )
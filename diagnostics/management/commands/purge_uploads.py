@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from diagnostics import resumable
+
+
+class Command(BaseCommand):
+    help = (
+        "Apaga os uploads retomáveis abandonados (sem pedaço novo há mais de "
+        "DIAGNOSTICS_UPLOAD_EXPIRE_HOURS) e os arquivos parciais. O worker "
+        "(process_jobs) já faz isso a cada hora."
+    )
+
+    def handle(self, *args, **opts):
+        purged = resumable.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"{purged} upload(s) expirado(s) removido(s)."))
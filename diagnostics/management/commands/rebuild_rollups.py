@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from diagnostics import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Recalcula as contagens por dia/SU/categoria (ReportDailyRollup) a partir "
+        "dos relatórios: backfill inicial ou depois de QuerySet.update() em massa."
+    )
+
+    def handle(self, *args, **opts):
+        rows = rollups.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Rollup reconstruída: {rows} linha(s)."))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from diagnostics import search
+
+
+class Command(BaseCommand):
+    help = "Cria o índice de busca textual (FTS5/GIN) se faltar e reconstrói o FTS5 a partir dos relatórios."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+
+    def handle(self, *args, **opts):
+        search.install(using=opts["database"])
+        search.rebuild(using=opts["database"])
+        self.stdout.write(self.style.SUCCESS("Índice de busca atualizado."))
@@ -0,0 +1,61 @@
+import time
+from datetime import datetime, time as dtime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from diagnostics import bulk, seed
+from diagnostics.models import DiagnosticReport
+
+
+class Command(BaseCommand):
+    help = (
+        "Gera relatórios sintéticos (SUs, categorias, mensagens e anexos de imagem/vídeo) "
+        "com bulk_create em lotes. Mesma --seed e --until, mesmos dados."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--days", type=int, default=365, help="Espalha os relatórios pelos últimos N dias.")
+        parser.add_argument(
+            "--until", default="",
+            help="Data final AAAA-MM-DD (padrão: fim de hoje). Fixe para gerar exatamente os mesmos dados.",
+        )
+        parser.add_argument("--images", type=float, default=0.3, help="Fração de relatórios com imagens (1–4).")
+        parser.add_argument("--videos", type=float, default=0.05, help="Fração de relatórios com vídeo.")
+        parser.add_argument("--batch-size", type=int, default=seed.BATCH_SIZE)
+        parser.add_argument("--clear", action="store_true", help="Apaga todos os relatórios (e anexos) antes.")
+
+    def handle(self, *args, **opts):
+        if opts["until"]:
+            try:
+                until = datetime.strptime(opts["until"], "%Y-%m-%d").date()
+            except ValueError:
+                raise CommandError("--until deve estar no formato AAAA-MM-DD")
+        else:
+            until = timezone.localdate()
+        until = timezone.make_aware(datetime.combine(until, dtime.max.replace(microsecond=0)))
+
+        if opts["clear"]:
+            removed = bulk.delete_reports(DiagnosticReport.objects.all())
+            self.stdout.write(f"{removed} relatório(s) apagado(s).")
+
+        start = time.perf_counter()
+
+        def progress(done):
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"\r{done:>9,} / {opts['rows']:,} ({done / elapsed:,.0f} linhas/s)", ending="")
+            self.stdout.flush()
+
+        totals = seed.seed_reports(
+            opts["rows"], seed=opts["seed"], days=opts["days"], until=until,
+            image_ratio=opts["images"], video_ratio=opts["videos"],
+            batch_size=opts["batch_size"], progress=progress,
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write("")
+        self.stdout.write(self.style.SUCCESS(
+            f"{totals['reports']:,} relatórios, {totals['images']:,} imagens e {totals['videos']:,} vídeos "
+            f"em {elapsed:.1f}s."
+        ))
@@ -0,0 +1,239 @@
+"""
+Entrega dos arquivos de MEDIA_ROOT (anexos e derivados) em produção.
+
+* `Range`/`If-Range` (uma faixa por request) e ETag forte: o `<video>` busca
+  só os pedaços que precisa para o seek e os metadados.
+* Cópia zero: o arquivo vai no `FileResponse`, que o gunicorn entrega com
+  `wsgi.file_wrapper` -> `socket.sendfile()` (`os.sendfile`) a partir da
+  posição atual do descritor e até o Content-Length — ou seja, só a faixa.
+* Em modo ASGI não há sendfile: a faixa vai em blocos lidos numa thread
+  (streaming.file_blocks), sem carregá-la inteira na memória.
+* Com um proxy na frente, DIAGNOSTICS_MEDIA_SERVE = "x-accel-redirect"
+  (nginx) ou "x-sendfile" (Apache/lighttpd) devolve só os cabeçalhos e o
+  proxy lê o arquivo (e trata o Range) sozinho.
+* Os caminhos com uuid gerados por `report_image_upload_to` /
+  `report_video_upload_to` e os dos blobs (hash do conteúdo) nunca mudam de
+  conteúdo: cache de 1 ano, `immutable`.
+* Imagens com variantes (AVIF/WEBP/JPEG): `negotiate_image` escolhe pelo
+  `Accept`, e a view responde com `Vary: Accept`.
+"""
+import mimetypes
+import os
+import re
+import stat
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from . import imaging, streaming
+
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+# diagnostics/<report_id>/(images|videos)/<uuid>[-cmp].<ext> e
+# diagnostics/blobs/(images|videos)/<aa>/<sha256>[-cmp|-poster|-sprite].<ext> (ver MediaBlob)
+IMMUTABLE_PATH = re.compile(
+    r"^diagnostics/(\d+/(images|videos)/[0-9a-f]{32}|blobs/(images|videos)/[0-9a-f]{2}/[0-9a-f]{64})"
+    r"(-cmp|-poster|-sprite)?\.[a-z0-9]+$"
+)
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+# Python < 3.11 não conhece a extensão
+mimetypes.add_type("image/avif", ".avif")
+
+
+class RangeFile:
+    """
+    Arquivo limitado a [start, start + length): o streaming do Django para
+    no fim da faixa, e o sendfile do gunicorn usa `fileno()` + a posição atual.
+    """
+
+    def __init__(self, fp, start, length):
+        self._fp = fp
+        self._remaining = length
+        fp.seek(start)
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b""
+        if size is None or size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._fp.read(size)
+        self._remaining -= len(data)
+        return data
+
+    def fileno(self):
+        return self._fp.fileno()
+
+    def seek(self, *args):
+        return self._fp.seek(*args)
+
+    def tell(self):
+        return self._fp.tell()
+
+    def close(self):
+        self._fp.close()
+
+
+def accepted_types(header):
+    """{tipo/subtipo: q} dos tipos listados explicitamente no Accept (curingas ficam de fora)."""
+    accepted = {}
+    for item in (header or "").split(","):
+        media_type, *params = [part.strip() for part in item.split(";")]
+        if not media_type or "*" in media_type:
+            continue
+        q = 1.0
+        for param in params:
+            name, _sep, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[media_type.lower()] = q
+    return accepted
+
+
+def negotiate_image(request, available):
+    """
+    Formato (avif/webp/jpeg) a servir dentre `available`: o de maior q entre
+    os que o Accept lista explicitamente (empate: o menor arquivo, na ordem
+    de imaging.FORMATS). Quem não lista nenhum (`*/*`, clientes antigos)
+    recebe o JPEG, que todos abrem, ou o primeiro disponível.
+    """
+    accepted = accepted_types(request.META.get("HTTP_ACCEPT"))
+    ranked = [
+        (-accepted[imaging.CONTENT_TYPES[fmt]], imaging.FORMATS.index(fmt), fmt)
+        for fmt in available
+        if accepted.get(imaging.CONTENT_TYPES[fmt], 0) > 0
+    ]
+    if ranked:
+        return min(ranked)[2]
+    if "jpeg" in available:
+        return "jpeg"
+    return next(iter(available), None)
+
+
+def serve_mode():
+    return getattr(settings, "DIAGNOSTICS_MEDIA_SERVE", "sendfile")
+
+
+def file_etag(st):
+    # Tamanho + mtime em ns: muda a cada regravação, estável entre workers
+    return quote_etag(f"{st.st_size:x}-{st.st_mtime_ns:x}")
+
+
+def cache_control(path):
+    if IMMUTABLE_PATH.match(path):
+        return f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    return f"public, max-age={getattr(settings, 'DIAGNOSTICS_MEDIA_MAX_AGE', 3600)}"
+
+
+def parse_range(header, size):
+    """
+    (início, fim) inclusivos da faixa pedida; None para ignorar o Range
+    (ausente, inválido ou com várias faixas -> resposta completa);
+    ValueError se a faixa não cabe no arquivo (416).
+    """
+    match = RANGE_RE.match(header.replace(" ", "")) if header else None
+    if not match or match.group(1) == match.group(2) == "":
+        return None
+    first, last = match.groups()
+    if first == "":
+        # Sufixo: os últimos N bytes
+        suffix = int(last)
+        if suffix == 0:
+            raise ValueError("faixa vazia")
+        return max(size - suffix, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or (last and int(last) < start):
+        raise ValueError("faixa fora do arquivo")
+    return start, end
+
+
+def if_range_matches(request, etag, mtime):
+    """Sem If-Range, ou com o validador atual: o Range vale. Senão, manda o arquivo inteiro."""
+    value = request.META.get("HTTP_IF_RANGE")
+    if not value:
+        return True
+    if value.startswith('"') or value.startswith("W/"):
+        # Comparação forte: ETag fraco nunca casa
+        return value == etag
+    return parse_http_date_safe(value) == int(mtime)
+
+
+@require_safe
+def serve(request, path):
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404("Arquivo não encontrado.")
+    try:
+        st = os.stat(fullpath)
+    except OSError:
+        raise Http404("Arquivo não encontrado.")
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404("Arquivo não encontrado.")
+
+    etag = file_etag(st)
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if not_modified is not None:
+        not_modified["Cache-Control"] = cache_control(path)
+        return not_modified
+
+    content_type, _encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+    mode = serve_mode()
+
+    if mode in ("x-accel-redirect", "x-sendfile"):
+        response = HttpResponse(content_type=content_type)
+        if mode == "x-accel-redirect":
+            prefix = getattr(settings, "DIAGNOSTICS_MEDIA_ACCEL_PREFIX", "/protected-media/")
+            response["X-Accel-Redirect"] = prefix.rstrip("/") + "/" + path
+        else:
+            response["X-Sendfile"] = fullpath
+    else:
+        response = _file_response(request, fullpath, st, etag, content_type)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(st.st_mtime)
+    response["Cache-Control"] = cache_control(path)
+    return response
+
+
+def _file_response(request, fullpath, st, etag, content_type):
+    size = st.st_size
+    byte_range = None
+    if "HTTP_RANGE" in request.META and if_range_matches(request, etag, st.st_mtime):
+        try:
+            byte_range = parse_range(request.META["HTTP_RANGE"], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            response["Accept-Ranges"] = "bytes"
+            return response
+
+    start, end = byte_range if byte_range else (0, size - 1)
+    length = end - start + 1 if size else 0
+
+    if request.method == "HEAD":
+        response = HttpResponse(content_type=content_type)
+    elif streaming.is_asgi(request):
+        # Sem sendfile no ASGI, e o FileResponse leria a faixa inteira antes
+        # do primeiro byte: blocos lidos numa thread, um de cada vez
+        fp = RangeFile(open(fullpath, "rb"), start, length)
+        response = StreamingHttpResponse(streaming.file_blocks(fp), content_type=content_type)
+    else:
+        response = FileResponse(RangeFile(open(fullpath, "rb"), start, length), content_type=content_type)
+    response["Content-Length"] = str(length)
+    response["Accept-Ranges"] = "bytes"
+    if byte_range:
+        response.status_code = 206
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return response
@@ -0,0 +1,142 @@
+"""
+Coleta de arquivos órfãos em MEDIA_ROOT/diagnostics (`manage.py gc_media`).
+
+Percorre o diretório em streaming (os.scandir, sem montar a lista inteira)
+e confere os arquivos em lotes contra os nomes que o banco referencia:
+arquivo, variantes, capa e prévias dos blobs e arquivo dos anexos. O que
+ninguém usa é órfão: mídia de relatórios apagados antes dos blobs,
+originais deixados por versões antigas, saídas `-cmp.mp4` de um ffmpeg
+interrompido, gravações de um request que morreu antes do commit.
+
+Arquivos mais novos que `min_age` ficam de fora: podem ser de um upload ou
+compressão em andamento cujo registro ainda não foi gravado.
+"""
+import os
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .models import ImageAttachment, MediaBlob, VideoAttachment
+
+PREFIX = "diagnostics"
+BATCH_SIZE = 500
+DEFAULT_MIN_AGE = 3600
+
+
+def walk(root):
+    """(caminho, os.stat_result) de cada arquivo sob `root`, sem listar a árvore inteira antes."""
+    stack = [root]
+    while stack:
+        try:
+            it = os.scandir(stack.pop())
+        except FileNotFoundError:
+            continue
+        with it:
+            for entry in it:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+
+
+def referenced(names):
+    """Quais de `names` (nomes no storage) algum blob ou anexo usa."""
+    pending = set(names)
+    found = set()
+    lookups = [(MediaBlob, field) for field in ("file", "avif", "jpeg", "poster", "sprite")]
+    lookups += [(ImageAttachment, "file"), (VideoAttachment, "file")]
+    # Quase tudo é arquivo de blob: as tabelas de anexos (sem índice em `file`)
+    # só são consultadas para o que sobrar
+    for model, field in lookups:
+        if not pending:
+            break
+        hits = set(model.objects.filter(**{f"{field}__in": pending}).values_list(field, flat=True))
+        found |= hits
+        pending -= hits
+    return found
+
+
+def _batches(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def find_orphans(min_age=DEFAULT_MIN_AGE, root=None):
+    """Gera (nome, bytes) dos arquivos órfãos com mais de `min_age` segundos."""
+    media_root = Path(settings.MEDIA_ROOT)
+    root = Path(root) if root else media_root / PREFIX
+    cutoff = time.time() - min_age
+    candidates = (
+        (Path(path).relative_to(media_root).as_posix(), st.st_size)
+        for path, st in walk(root)
+        if st.st_mtime < cutoff
+    )
+    for batch in _batches(candidates, BATCH_SIZE):
+        used = referenced(name for name, _size in batch)
+        for name, size in batch:
+            if name not in used:
+                yield name, size
+
+
+def collect(min_age=DEFAULT_MIN_AGE, dry_run=False, on_orphan=None):
+    """
+    Apaga os órfãos (só lista, com `dry_run`) e depois os diretórios vazios
+    antigos. `on_orphan(nome, bytes)` é chamado para cada um. Retorna
+    {"files", "bytes", "dirs"}.
+    """
+    stats = {"files": 0, "bytes": 0, "dirs": 0}
+    emptied = set()
+    for name, size in find_orphans(min_age):
+        if on_orphan:
+            on_orphan(name, size)
+        if not dry_run:
+            default_storage.delete(name)
+            emptied.add(os.path.dirname(default_storage.path(name)))
+        stats["files"] += 1
+        stats["bytes"] += size
+    if not dry_run:
+        stats["dirs"] = remove_empty_dirs(Path(settings.MEDIA_ROOT) / PREFIX, min_age, emptied)
+    return stats
+
+
+def remove_empty_dirs(root, min_age=DEFAULT_MIN_AGE, emptied=()):
+    """
+    Remove os diretórios vazios sob `root` (não o próprio) sem mudança há
+    `min_age` s: um recém-criado pode estar prestes a receber um arquivo.
+    Os de `emptied` (de onde o próprio GC acabou de apagar) não esperam.
+    """
+    cutoff = time.time() - min_age
+    emptied = set(emptied)
+    removed = 0
+    for dirpath, _dirnames, filenames in os.walk(root, topdown=False):
+        if dirpath == str(root) or filenames:
+            continue
+        try:
+            if (dirpath in emptied or os.stat(dirpath).st_mtime < cutoff) and not os.listdir(dirpath):
+                os.rmdir(dirpath)
+                removed += 1
+                emptied.add(os.path.dirname(dirpath))
+        except OSError:
+            pass
+    return removed
+
+
+def missing_files():
+    """Gera (modelo, pk, nome) dos arquivos que o banco referencia e não existem no storage."""
+    blobs = MediaBlob.objects.only("file", "avif", "jpeg", "poster", "sprite").iterator()
+    for blob in blobs:
+        for name in blob.file_names():
+            if not default_storage.exists(name):
+                yield MediaBlob, blob.pk, name
+    for model in (ImageAttachment, VideoAttachment):
+        for pk, name in model.objects.filter(blob=None).values_list("pk", "file").iterator():
+            if name and not default_storage.exists(name):
+                yield model, pk, name
@@ -0,0 +1,32 @@
+"""
+Remoção de arquivos de mídia amarrada à transação do banco.
+
+Um arquivo só sai do storage depois do commit que apagou as linhas que o
+usavam: se a transação for desfeita, os anexos voltam a existir e os
+arquivos continuam lá. O que escapar disso (processo morto no meio de uma
+gravação, ffmpeg interrompido, anexos antigos) é recolhido por
+`manage.py gc_media` (ver mediagc.py).
+"""
+import logging
+from functools import partial
+
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def delete_files(names):
+    """Apaga os arquivos `names` do storage agora. Falhas ficam no log (o GC tenta de novo depois)."""
+    for name in names:
+        try:
+            default_storage.delete(name)
+        except OSError:
+            logger.warning("não foi possível apagar %s", name, exc_info=True)
+
+
+def delete_on_commit(names, using=None):
+    """Agenda a remoção de `names` para depois do commit da transação atual (ou já, fora de uma)."""
+    names = [name for name in names if name]
+    if names:
+        transaction.on_commit(partial(delete_files, names), using=using)
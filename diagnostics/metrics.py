@@ -0,0 +1,295 @@
+"""
+Instrumentação de desempenho: histogramas em memória (por processo) no
+formato texto do Prometheus, alimentados pelo RequestMetricsMiddleware e
+pelos trechos marcados com `timed("<etapa>")` (Pillow, ffmpeg...).
+
+Com vários workers do gunicorn cada processo tem seus próprios números;
+o Prometheus soma as séries de cada scrape/instância normalmente.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger("diagnostics.slow_requests")
+budget_logger = logging.getLogger("diagnostics.query_budget")
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+BYTE_BUCKETS = tuple(2 ** p for p in range(10, 28, 2))  # 1 KiB .. 64 MiB
+
+# Quantas queries guardar por request para o log de requests lentos
+MAX_CAPTURED_QUERIES = 200
+
+# Máximo de queries SQL por GET/HEAD em cada view, independente do volume de
+# dados: passar daqui é N+1 ou projeção perdida (ver queries.py). Conferido
+# conforme DIAGNOSTICS_QUERY_BUDGET ("raise" em dev e nos testes).
+QUERY_BUDGETS = {
+    "diagnostics:list": 2,
+    "diagnostics:detail": 3,
+    "diagnostics:su_timeline": 2,
+    "diagnostics:su_summary": 1,
+    "diagnostics:dashboard": 3,
+    "diagnostics:api_dashboard": 3,
+    "diagnostics:image_thumbnail": 1,
+    "diagnostics:new": 0,
+    "pages:index": 0,
+    "healthz": 1,
+}
+
+REGISTRY = []
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=TIME_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            counts = series[0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = sorted((k, (list(v[0]), v[1], v[2])) for k, v in self._series.items())
+        for key, (counts, total, count) in items:
+            base = list(zip(self.labelnames, key))
+            for bound, c in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_labels(base + [('le', _fmt(bound))])} {c}")
+            lines.append(f"{self.name}_bucket{_labels(base + [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{_labels(base)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(base)} {count}")
+        return "\n".join(lines)
+
+
+REQUEST_SECONDS = Histogram(
+    "diagnostics_request_duration_seconds", "Tempo total do request por view.",
+    ["view", "method", "status"],
+)
+SQL_QUERIES = Histogram(
+    "diagnostics_request_sql_queries", "Queries SQL executadas por request.",
+    ["view"], buckets=COUNT_BUCKETS,
+)
+SQL_SECONDS = Histogram(
+    "diagnostics_request_sql_duration_seconds", "Tempo gasto em SQL por request.",
+    ["view"],
+)
+UPLOAD_BYTES = Histogram(
+    "diagnostics_request_upload_bytes", "Bytes recebidos no corpo do request.",
+    ["view"], buckets=BYTE_BUCKETS,
+)
+STAGE_SECONDS = Histogram(
+    "diagnostics_stage_duration_seconds", "Tempo gasto em etapas de mídia (image_encode, video_transcode...).",
+    ["view", "stage"],
+)
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class RequestStats:
+    """Acumuladores do request atual (guardados num ContextVar)."""
+
+    def __init__(self, capture_sql=False):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.stages = {}
+        self.capture_sql = capture_sql
+        self.captured = []
+
+    def sql_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.sql_seconds += elapsed
+            if self.capture_sql and len(self.captured) < MAX_CAPTURED_QUERIES:
+                self.captured.append((elapsed, sql))
+
+
+_current = ContextVar("diagnostics_request_stats", default=None)
+
+
+@contextmanager
+def timed(stage):
+    """Mede um trecho (ex.: `with timed("image_encode"):`) e soma ao request atual, se houver."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        stats = _current.get()
+        if stats is not None:
+            stats.stages[stage] = stats.stages.get(stage, 0.0) + elapsed
+        else:
+            STAGE_SECONDS.observe(elapsed, view="-", stage=stage)
+
+
+def view_label(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved"
+    if match.namespace == "admin" or match.view_name.startswith("admin:"):
+        return "admin"
+    return match.view_name
+
+
+class RequestMetricsMiddleware:
+    """
+    Registra, por view: tempo total, nº e tempo de queries SQL, bytes de
+    upload e tempo nas etapas marcadas com `timed()`. Requests acima de
+    DIAGNOSTICS_SLOW_REQUEST_SECONDS são logados com o SQL executado.
+    Funciona em WSGI e ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        stats = _new_stats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        try:
+            with connection.execute_wrapper(stats.sql_wrapper):
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        _record(request, response, stats, time.perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        stats = _new_stats()
+        token = _current.set(stats)
+        start = time.perf_counter()
+        # O ORM assíncrono executa as queries na thread do request
+        # (sync_to_async): o wrapper vai na conexão daquela thread
+        await sync_to_async(lambda: connection.execute_wrappers.append(stats.sql_wrapper))()
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(lambda: connection.execute_wrappers.remove(stats.sql_wrapper))()
+            _current.reset(token)
+        _record(request, response, stats, time.perf_counter() - start)
+        return response
+
+
+def _new_stats():
+    return RequestStats(capture_sql=bool(getattr(settings, "DIAGNOSTICS_SLOW_REQUEST_SECONDS", 0)))
+
+
+def _record(request, response, stats, elapsed):
+    view = view_label(request)
+    REQUEST_SECONDS.observe(elapsed, view=view, method=request.method, status=response.status_code)
+    SQL_QUERIES.observe(stats.queries, view=view)
+    SQL_SECONDS.observe(stats.sql_seconds, view=view)
+    if request.method in ("POST", "PUT", "PATCH"):
+        UPLOAD_BYTES.observe(int(request.META.get("CONTENT_LENGTH") or 0), view=view)
+    for stage, seconds in stats.stages.items():
+        STAGE_SECONDS.observe(seconds, view=view, stage=stage)
+
+    slow_after = getattr(settings, "DIAGNOSTICS_SLOW_REQUEST_SECONDS", 0)
+    if slow_after and elapsed >= slow_after:
+        _log_slow(request, view, elapsed, stats)
+    if request.method in ("GET", "HEAD"):
+        check_query_budget(request, view, stats.queries)
+
+
+def check_query_budget(request, view, queries):
+    """
+    Confere `queries` com QUERY_BUDGETS[view]. Com DIAGNOSTICS_QUERY_BUDGET
+    = "raise" o estouro vira QueryBudgetExceeded (o teste que fez o GET
+    falha); "warn" só loga; "off" (padrão fora do DEBUG) não confere.
+    """
+    mode = getattr(settings, "DIAGNOSTICS_QUERY_BUDGET", "off")
+    budget = QUERY_BUDGETS.get(view)
+    if mode == "off" or budget is None or queries <= budget:
+        return
+    message = f"{request.method} {request.get_full_path()} ({view}): {queries} queries, orçamento {budget}"
+    if mode == "raise":
+        raise QueryBudgetExceeded(message)
+    budget_logger.warning("orçamento de queries estourado: %s", message)
+
+
+def _log_slow(request, view, elapsed, stats):
+    stages = ", ".join(f"{k}={v:.3f}s" for k, v in stats.stages.items()) or "-"
+    sql = "\n".join(f"  [{t * 1000:.1f} ms] {q}" for t, q in stats.captured)
+    logger.warning(
+        "request lento: %s %s (%s) %.3fs | sql: %d queries em %.3fs | etapas: %s\n%s",
+        request.method, request.get_full_path(), view, elapsed,
+        stats.queries, stats.sql_seconds, stages, sql,
+    )
+
+
+def render_latest():
+    """Todas as métricas em formato texto do Prometheus (exposition format 0.0.4)."""
+    parts = [h.render() for h in REGISTRY]
+    parts.append(_render_job_metrics())
+    return "\n".join(parts) + "\n"
+
+
+def _render_job_metrics():
+    """
+    Os jobs (ffmpeg) rodam no processo do worker; a duração de cada um fica
+    gravada no ProcessingJob, então é exportada a partir do banco.
+    """
+    from django.db.models import Count, Sum
+
+    from .models import ProcessingJob
+
+    rows = (
+        ProcessingJob.objects.exclude(duration_ms=None)
+        .values("kind", "status")
+        .annotate(n=Count("id"), total_ms=Sum("duration_ms"))
+        .order_by("kind", "status")
+    )
+    name = "diagnostics_job_duration_seconds"
+    lines = [f"# HELP {name} Duração dos jobs da fila de mídia (última execução de cada job).", f"# TYPE {name} summary"]
+    for row in rows:
+        labels = _labels([("kind", row["kind"]), ("status", row["status"])])
+        lines.append(f"{name}_sum{labels} {row['total_ms'] / 1000:.3f}")
+        lines.append(f"{name}_count{labels} {row['n']}")
+    return "\n".join(lines)
+
+
+def _labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in pairs) + "}"
+
+
+def _fmt(bound):
+    return repr(float(bound)) if not float(bound).is_integer() else f"{float(bound):.1f}"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
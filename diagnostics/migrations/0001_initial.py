@@ -0,0 +1,58 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+import diagnostics.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DiagnosticReport',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=200, verbose_name='Título')),
+                ('su_identifier', models.CharField(blank=True, max_length=120, verbose_name='Identificador da SU')),
+                ('user_name', models.CharField(max_length=120, verbose_name='Nome')),
+                ('user_email', models.EmailField(max_length=254, verbose_name='Email')),
+                ('message', models.TextField(verbose_name='Mensagem de diagnóstico')),
+                ('category', models.CharField(choices=[('normal', 'Normal'), ('critica', 'Crítica')], default='normal', max_length=20, verbose_name='Categoria')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('updated_at', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['category'], name='diagnostics_categor_0243e3_idx'), models.Index(fields=['-created_at'], name='diagnostics_created_3688c9_idx'), models.Index(fields=['title'], name='diagnostics_title_485110_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ImageAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.ImageField(upload_to=diagnostics.models.report_image_upload_to, verbose_name='Imagem')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='images', to='diagnostics.diagnosticreport')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='VideoAttachment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file', models.FileField(upload_to=diagnostics.models.report_video_upload_to, validators=[diagnostics.models.validate_video_size], verbose_name='Vídeo')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('report', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='videos', to='diagnostics.diagnosticreport')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
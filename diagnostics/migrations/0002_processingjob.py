@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='videoattachment',
+            name='processed_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Processado em'),
+        ),
+        migrations.AddField(
+            model_name='videoattachment',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Na fila'), ('processing', 'Processando'), ('done', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=20, verbose_name='Status'),
+        ),
+        migrations.CreateModel(
+            name='ProcessingJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('video_transcode', 'Compressão de vídeo')], max_length=40, verbose_name='Tipo')),
+                ('object_id', models.PositiveBigIntegerField(verbose_name='Objeto')),
+                ('status', models.CharField(choices=[('pending', 'Na fila'), ('processing', 'Processando'), ('done', 'Concluído'), ('failed', 'Falhou')], default='pending', max_length=20, verbose_name='Status')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Tentativas')),
+                ('max_attempts', models.PositiveSmallIntegerField(default=3, verbose_name='Máx. tentativas')),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Executar após')),
+                ('locked_by', models.CharField(blank=True, max_length=120, verbose_name='Worker')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Iniciado em')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Finalizado em')),
+                ('duration_ms', models.PositiveIntegerField(blank=True, null=True, verbose_name='Duração (ms)')),
+                ('last_error', models.TextField(blank=True, verbose_name='Último erro')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'run_after'], name='diagnostics_status_bb3f23_idx'), models.Index(fields=['kind', 'object_id'], name='diagnostics_kind_57f765_idx')],
+            },
+        ),
+    ]
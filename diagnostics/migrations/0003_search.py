@@ -0,0 +1,26 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0002_processingjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportSearchIndex',
+            fields=[
+                ('report', models.OneToOneField(db_column='rowid', db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_index', serialize=False, to='diagnostics.diagnosticreport')),
+                ('document', models.TextField(db_column='diagnostics_report_fts')),
+                ('rank', models.FloatField(db_column='rank')),
+            ],
+            options={
+                'db_table': 'diagnostics_report_fts',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0003_search'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='diagnosticreport',
+            name='diagnostics_categor_0243e3_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='diagnosticreport',
+            name='diagnostics_created_3688c9_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='diagnosticreport',
+            name='diagnostics_title_485110_idx',
+        ),
+        migrations.AddIndex(
+            model_name='diagnosticreport',
+            index=models.Index(fields=['-created_at', '-id'], name='diagnostics_created_8d7b22_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diagnosticreport',
+            index=models.Index(fields=['title', 'id'], name='diagnostics_title_a05ec0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diagnosticreport',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='diagnostics_categor_46925d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='diagnosticreport',
+            index=models.Index(fields=['category', 'title', 'id'], name='diagnostics_categor_6f6475_idx'),
+        ),
+    ]
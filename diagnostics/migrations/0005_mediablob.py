@@ -0,0 +1,40 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0004_cursor_pagination'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('image', 'Imagem'), ('video', 'Vídeo')], max_length=10, verbose_name='Tipo')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256 do upload')),
+                ('file', models.FileField(max_length=255, upload_to='', verbose_name='Arquivo')),
+                ('size', models.PositiveBigIntegerField(default=0, verbose_name='Tamanho (bytes)')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Referências')),
+                ('status', models.CharField(choices=[('pending', 'Na fila'), ('processing', 'Processando'), ('done', 'Concluído'), ('failed', 'Falhou')], default='done', max_length=20, verbose_name='Status')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'sha256'), name='diagnostics_blob_kind_sha256')],
+            },
+        ),
+        migrations.AddField(
+            model_name='imageattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='images', to='diagnostics.mediablob'),
+        ),
+        migrations.AddField(
+            model_name='videoattachment',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='videos', to='diagnostics.mediablob'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0005_mediablob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='bytes_saved',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Bytes economizados'),
+        ),
+        migrations.AddField(
+            model_name='mediablob',
+            name='decision',
+            field=models.CharField(blank=True, choices=[('keep', 'Mantido como enviado'), ('remux', 'Remux (faststart)'), ('transcode', 'Comprimido')], max_length=20, verbose_name='Processamento'),
+        ),
+        migrations.AddField(
+            model_name='videoattachment',
+            name='bytes_saved',
+            field=models.BigIntegerField(blank=True, null=True, verbose_name='Bytes economizados'),
+        ),
+        migrations.AddField(
+            model_name='videoattachment',
+            name='decision',
+            field=models.CharField(blank=True, choices=[('keep', 'Mantido como enviado'), ('remux', 'Remux (faststart)'), ('transcode', 'Comprimido')], max_length=20, verbose_name='Processamento'),
+        ),
+    ]
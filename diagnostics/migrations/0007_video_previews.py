@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0006_video_decision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='poster',
+            field=models.FileField(blank=True, max_length=255, upload_to='', verbose_name='Capa'),
+        ),
+        migrations.AddField(
+            model_name='mediablob',
+            name='sprite',
+            field=models.FileField(blank=True, max_length=255, upload_to='', verbose_name='Prévias'),
+        ),
+        migrations.AddField(
+            model_name='mediablob',
+            name='sprite_frames',
+            field=models.PositiveSmallIntegerField(default=0, verbose_name='Quadros das prévias'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0007_video_previews'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Arquivo')),
+                ('content_type', models.CharField(blank=True, max_length=100, verbose_name='Tipo')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Tamanho (bytes)')),
+                ('offset', models.PositiveBigIntegerField(default=0, verbose_name='Recebido (bytes)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('expires_at', models.DateTimeField(verbose_name='Expira em')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='diagnostics_expires_c5ba4b_idx')],
+            },
+        ),
+    ]
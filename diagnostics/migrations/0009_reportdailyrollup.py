@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0008_uploadsession'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='Dia')),
+                ('su_identifier', models.CharField(blank=True, max_length=120, verbose_name='Identificador da SU')),
+                ('category', models.CharField(choices=[('normal', 'Normal'), ('critica', 'Crítica')], max_length=20, verbose_name='Categoria')),
+                ('count', models.IntegerField(default=0, verbose_name='Relatórios')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['su_identifier', 'day'], name='diagnostics_su_iden_caeb49_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'su_identifier', 'category'), name='diagnostics_rollup_key')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0009_reportdailyrollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='diagnosticreport',
+            index=models.Index(fields=['su_identifier', '-created_at', '-id'], name='diagnostics_su_iden_708386_idx'),
+        ),
+    ]
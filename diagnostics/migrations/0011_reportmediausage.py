@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0010_su_filter'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='derived_size',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Capa/prévias (bytes)'),
+        ),
+        migrations.CreateModel(
+            name='ReportMediaUsage',
+            fields=[
+                ('report', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='media_usage', serialize=False, to='diagnostics.diagnosticreport')),
+                ('images', models.PositiveIntegerField(default=0, verbose_name='Imagens')),
+                ('videos', models.PositiveIntegerField(default=0, verbose_name='Vídeos')),
+                ('bytes', models.PositiveBigIntegerField(default=0, verbose_name='Bytes')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-bytes'], name='diagnostics_bytes_80b841_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 16:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('diagnostics', '0011_reportmediausage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediablob',
+            name='avif',
+            field=models.FileField(blank=True, max_length=255, upload_to='', verbose_name='AVIF'),
+        ),
+        migrations.AddField(
+            model_name='mediablob',
+            name='jpeg',
+            field=models.FileField(blank=True, max_length=255, upload_to='', verbose_name='JPEG'),
+        ),
+        migrations.AlterField(
+            model_name='mediablob',
+            name='derived_size',
+            field=models.PositiveBigIntegerField(default=0, verbose_name='Variantes/capa/prévias (bytes)'),
+        ),
+    ]
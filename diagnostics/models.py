@@ -1,12 +1,16 @@
-from django.db import models
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
 from django.core.exceptions import ValidationError
 from django.core.files.base import ContentFile
-from io import BytesIO
-from PIL import Image
+from django.core.files.storage import default_storage
+from django.db.models.functions import Greatest
+from django.utils import timezone
 import os
-import subprocess
 import uuid
 
+from . import caching, imaging, mediastore, metrics
+from .uploads import file_sha256
+
 
 # -------------------------
 # Modelo principal
@@ -28,21 +32,86 @@ class DiagnosticReport(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        # Compostos com id como desempate: atendem a paginação por cursor em
+        # cada ordenação do DiagnosticFilterForm, com e sem filtro de categoria
+        # (ordens inversas usam o mesmo índice percorrido ao contrário).
         indexes = [
-            models.Index(fields=["category"]),
-            models.Index(fields=["-created_at"]),
-            models.Index(fields=["title"]),
+            models.Index(fields=["-created_at", "-id"]),
+            models.Index(fields=["title", "id"]),
+            models.Index(fields=["category", "-created_at", "-id"]),
+            models.Index(fields=["category", "title", "id"]),
+            # Filtro por SU (exato e prefixo) e linha do tempo de cada SU
+            models.Index(fields=["su_identifier", "-created_at", "-id"]),
         ]
 
     def __str__(self):
         return f"{self.title} ({self.get_category_display()})"
 
 
+# -------------------------
+# Contagens por dia/SU/categoria (ver rollups.py)
+# -------------------------
+class ReportDailyRollup(models.Model):
+    """
+    Quantos relatórios existem por (dia local de criação, SU, categoria).
+    Mantida incrementalmente pelos signals de DiagnosticReport e pela
+    ingestão em lote; o painel lê só daqui. Backfill: manage.py rebuild_rollups.
+    """
+    day = models.DateField("Dia")
+    su_identifier = models.CharField("Identificador da SU", max_length=120, blank=True)
+    category = models.CharField("Categoria", max_length=20, choices=DiagnosticReport.Category.choices)
+    count = models.IntegerField("Relatórios", default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["day", "su_identifier", "category"], name="diagnostics_rollup_key"),
+        ]
+        indexes = [models.Index(fields=["su_identifier", "day"])]
+
+    def __str__(self):
+        return f"{self.day} {self.su_identifier or '—'} {self.category}: {self.count}"
+
+
+# -------------------------
+# Índice de busca (FTS5 no SQLite — ver search.py)
+# -------------------------
+class ReportSearchIndex(models.Model):
+    """
+    Tabela virtual FTS5 mantida por triggers. Não é gerenciada pelo Django:
+    serve só para o ORM fazer o JOIN por `rowid` e filtrar com `MATCH`.
+    """
+    report = models.OneToOneField(
+        DiagnosticReport, on_delete=models.DO_NOTHING, primary_key=True,
+        db_column="rowid", db_constraint=False, related_name="search_index",
+    )
+    # A coluna oculta com o nome da própria tabela aceita MATCH em todas as colunas
+    document = models.TextField(db_column="diagnostics_report_fts")
+    rank = models.FloatField(db_column="rank")
+
+    class Meta:
+        managed = False
+        db_table = "diagnostics_report_fts"
+
+
+@ReportSearchIndex._meta.get_field("document").register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", [*lhs_params, *rhs_params]
+
+
 # -------------------------
 # Helpers de upload
 # -------------------------
 MAX_VIDEO_MB = 20
 
+def max_video_upload_mb():
+    # Teto de um vídeo enviado pelo upload retomável (o POST único continua em MAX_VIDEO_MB)
+    return getattr(settings, "DIAGNOSTICS_VIDEO_UPLOAD_MAX_MB", 200)
+
 def report_image_upload_to(instance, filename):
     # media/diagnostics/<report_id>/images/<uuid>.<ext>
     ext = os.path.splitext(filename)[1].lower() or ".jpg"
@@ -54,9 +123,184 @@ def report_video_upload_to(instance, filename):
     return f"diagnostics/{instance.report_id}/videos/{uuid.uuid4().hex}{ext}"
 
 def validate_video_size(file_obj):
+    # Vídeo enviado no POST do formulário/admin; o upload retomável tem o
+    # próprio teto (max_video_upload_mb), conferido em resumable.py
     size_mb = file_obj.size / (1024 * 1024)
-    if size_mb > MAX_VIDEO_MB:
-        raise ValidationError(f"O vídeo excede {MAX_VIDEO_MB}MB (tamanho atual: {size_mb:.1f}MB).")
+    limit = MAX_VIDEO_MB
+    if size_mb > limit:
+        raise ValidationError(f"O vídeo excede {limit}MB (tamanho atual: {size_mb:.1f}MB).")
+
+
+# -------------------------
+# Conteúdo deduplicado dos anexos
+# -------------------------
+def blob_path(kind, sha256, ext):
+    # media/diagnostics/blobs/<kind>s/<aa>/<sha256><ext>
+    return f"diagnostics/blobs/{kind}s/{sha256[:2]}/{sha256}{ext}"
+
+
+class MediaBlob(models.Model):
+    """
+    Arquivo final (já comprimido) de um conteúdo enviado, identificado pelo
+    SHA-256 do upload original. Anexos com o mesmo conteúdo apontam para o
+    mesmo blob: o reenvio não recodifica/transcodifica nem ocupa disco de novo.
+    `ref_count` conta os anexos; no último, o blob e o arquivo são apagados.
+    """
+    class Kind(models.TextChoices):
+        IMAGE = "image", "Imagem"
+        VIDEO = "video", "Vídeo"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Na fila"
+        PROCESSING = "processing", "Processando"
+        DONE = "done", "Concluído"
+        FAILED = "failed", "Falhou"
+
+    class Decision(models.TextChoices):
+        KEEP = "keep", "Mantido como enviado"
+        REMUX = "remux", "Remux (faststart)"
+        TRANSCODE = "transcode", "Comprimido"
+
+    kind = models.CharField("Tipo", max_length=10, choices=Kind.choices)
+    sha256 = models.CharField("SHA-256 do upload", max_length=64)
+    file = models.FileField("Arquivo", max_length=255)
+    size = models.PositiveBigIntegerField("Tamanho (bytes)", default=0)
+    ref_count = models.PositiveIntegerField("Referências", default=0)
+    status = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.DONE)
+    # Vídeos: o que o worker fez (ver video.plan) e quanto o arquivo diminuiu
+    decision = models.CharField("Processamento", max_length=20, choices=Decision.choices, blank=True)
+    bytes_saved = models.BigIntegerField("Bytes economizados", null=True, blank=True)
+    # Vídeos: quadro de capa (`<video poster>`) e, opcionalmente, tira de prévias
+    poster = models.FileField("Capa", max_length=255, blank=True)
+    sprite = models.FileField("Prévias", max_length=255, blank=True)
+    sprite_frames = models.PositiveSmallIntegerField("Quadros das prévias", default=0)
+    # Imagens: variantes servidas conforme o Accept (`file` é o WEBP; ver imaging.py)
+    avif = models.FileField("AVIF", max_length=255, blank=True)
+    jpeg = models.FileField("JPEG", max_length=255, blank=True)
+    # Bytes das variantes/capa/prévias (o total em disco do blob é size + derived_size)
+    derived_size = models.PositiveBigIntegerField("Variantes/capa/prévias (bytes)", default=0)
+    created_at = models.DateTimeField("Criado em", auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "sha256"], name="diagnostics_blob_kind_sha256"),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} {self.sha256[:12]} ({self.ref_count} ref.)"
+
+    @classmethod
+    def acquire(cls, kind, sha256, write, **defaults):
+        """
+        Blob do conteúdo `sha256` com uma referência a mais. Se ainda não
+        existe, `write()` grava o arquivo e devolve o nome no storage, ou
+        (nome, campos extras do blob) (só então acontece o processamento
+        caro). Retorna (blob, criado).
+        """
+        for _attempt in range(3):
+            blob = cls.objects.filter(kind=kind, sha256=sha256).first()
+            created = False
+            if blob is None:
+                written = write()
+                name, extra = written if isinstance(written, tuple) else (written, {})
+                try:
+                    with transaction.atomic():
+                        blob = cls.objects.create(
+                            kind=kind, sha256=sha256, file=name,
+                            size=default_storage.size(name), **defaults, **extra,
+                        )
+                    created = True
+                except IntegrityError:
+                    # Outro request gravou o mesmo conteúdo ao mesmo tempo
+                    cls(file=name, **extra).delete_files_now()
+                    continue
+            # Se o blob foi liberado entre o SELECT e aqui, tenta de novo
+            if cls.objects.filter(pk=blob.pk).update(ref_count=models.F("ref_count") + 1):
+                blob.ref_count += 1
+                return blob, created
+        raise IntegrityError(f"não foi possível referenciar o blob {kind}/{sha256}")
+
+    @classmethod
+    def release(cls, pk):
+        """Tira uma referência; sem nenhuma, apaga o blob e (após o commit) os arquivos."""
+        cls.objects.filter(pk=pk, ref_count__gt=0).update(ref_count=models.F("ref_count") - 1)
+        blob = cls.objects.filter(pk=pk, ref_count=0).first()
+        if blob is not None and cls.objects.filter(pk=pk, ref_count=0).delete()[0]:
+            mediastore.delete_on_commit(blob.file_names())
+
+    @classmethod
+    def release_many(cls, refs):
+        """
+        `release()` em lote: `refs` = {blob_id: referências a tirar}. Uma
+        UPDATE por quantidade distinta e uma DELETE para os que zeraram.
+        Chamar dentro de `transaction.atomic()`.
+        """
+        by_amount = {}
+        for pk, amount in refs.items():
+            by_amount.setdefault(amount, []).append(pk)
+        for amount, pks in by_amount.items():
+            cls.objects.filter(pk__in=pks).update(ref_count=Greatest(models.F("ref_count") - amount, 0))
+        # O lock segura um acquire() concorrente até o commit; depois ele não acha o blob e recria
+        orphans = list(cls.objects.select_for_update().filter(pk__in=list(refs), ref_count=0))
+        if orphans:
+            cls.objects.filter(pk__in=[b.pk for b in orphans]).delete()
+            mediastore.delete_on_commit([name for b in orphans for name in b.file_names()])
+        return len(orphans)
+
+    def file_names(self):
+        """Nomes no storage do arquivo e dos derivados (variantes, capa, prévias) do blob."""
+        return [f.name for f in (self.file, self.avif, self.jpeg, self.poster, self.sprite) if f]
+
+    def delete_files_now(self):
+        mediastore.delete_files(self.file_names())
+
+    def variant(self, fmt):
+        """Nome no storage da variante `fmt` (avif/webp/jpeg), ou "" se ela não foi gerada."""
+        if fmt == "webp":
+            # Conteúdo que o Pillow não abriu fica com o original (.png, .heic...) em `file`
+            return self.file.name if self.file.name.endswith(".webp") else ""
+        field = {"avif": self.avif, "jpeg": self.jpeg}.get(fmt)
+        return field.name if field else ""
+
+
+def image_options():
+    """Opções de `imaging.encode_variants` vindas do settings (o WEBP, arquivo principal do blob, sempre entra)."""
+    formats = getattr(settings, "DIAGNOSTICS_IMAGE_FORMATS", imaging.FORMATS)
+    return {
+        "formats": tuple(fmt for fmt in imaging.FORMATS if fmt in formats or fmt == "webp"),
+        "effort": getattr(settings, "DIAGNOSTICS_IMAGE_EFFORT", imaging.DEFAULT_EFFORT),
+        "quality": getattr(settings, "DIAGNOSTICS_IMAGE_QUALITY", None) or None,
+    }
+
+
+def _image_writer(sha256, upload, encoded=None):
+    """
+    Grava as variantes de `upload` (usa `encoded`, se já codificadas no
+    pool): o WEBP como arquivo do blob, AVIF e JPEG nos campos de mesmo
+    nome. Se não for uma imagem que o Pillow abra, guarda o original.
+    """
+    def write():
+        variants = encoded
+        if variants is None:
+            try:
+                with metrics.timed("image_encode"):
+                    variants = imaging.encode_variants(imaging.upload_source(upload), **image_options())
+            except Exception:
+                variants = None
+        if isinstance(variants, dict) and "webp" in variants:
+            name = default_storage.save(blob_path("image", sha256, ".webp"), ContentFile(variants["webp"]))
+            extra = {"derived_size": 0}
+            for fmt in ("avif", "jpeg"):
+                if fmt in variants:
+                    extra[fmt] = default_storage.save(
+                        blob_path("image", sha256, imaging.EXTENSIONS[fmt]), ContentFile(variants[fmt]),
+                    )
+                    extra["derived_size"] += len(variants[fmt])
+            return name, extra
+        ext = os.path.splitext(upload.name or "")[1].lower() or ".jpg"
+        upload.seek(0)
+        return default_storage.save(blob_path("image", sha256, ext), upload)
+    return write
 
 
 # -------------------------
@@ -65,6 +309,7 @@ def validate_video_size(file_obj):
 class ImageAttachment(models.Model):
     report = models.ForeignKey(DiagnosticReport, on_delete=models.CASCADE, related_name="images")
     file = models.ImageField("Imagem", upload_to=report_image_upload_to)
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="images")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -75,53 +320,78 @@ class ImageAttachment(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Comprime a imagem para WEBP, limita dimensões para economizar disco.
+        Upload novo: usa o blob do mesmo conteúdo ou, se for inédito, reduz e
+        codifica as variantes (WEBP, AVIF, JPEG) e grava só os arquivos finais.
         """
-        # Salva primeiro se for novo, para ter caminho (quando necessário)
-        new = self.pk is None
-        super_save = super().save
-        if new:
-            super_save(*args, **kwargs)
-
-        # Se não tem arquivo válido, finalize
-        if not self.file:
-            return
-
-        # Abre imagem
-        try:
-            self.file.seek(0)
-            img = Image.open(self.file)
-            img = img.convert("RGB")
-        except Exception:
-            # Não é imagem válida, não mexe
-            if new:
-                return
-            return super_save(*args, **kwargs)
-
-        # Redimensiona
-        MAX_W, MAX_H = 1920, 1080
-        img.thumbnail((MAX_W, MAX_H))
-
-        # Salva em memória como WEBP
-        buf = BytesIO()
-        img.save(buf, format="WEBP", quality=80, method=6)
-        buf.seek(0)
+        if self.file and not self.file._committed:
+            upload = self.file.file
+            self.attach_blob(upload, file_sha256(upload))
+        super().save(*args, **kwargs)
 
-        base, _ext = os.path.splitext(os.path.basename(self.file.name))
-        new_name = f"{base}.webp"
-        self.file.save(new_name, ContentFile(buf.read()), save=False)
+    def attach_blob(self, upload, sha256, encoded=None):
+        blob, _created = MediaBlob.acquire(
+            MediaBlob.Kind.IMAGE, sha256, _image_writer(sha256, upload, encoded),
+        )
+        self.blob = blob
+        self.file = blob.file.name
 
-        # Se não era novo, agora persistimos a troca do arquivo
-        return super_save(update_fields=["file"] if not new else None)
+    @classmethod
+    def create_batch(cls, report, uploads):
+        """
+        Cria os anexos de vários uploads de uma vez. Só as imagens inéditas
+        (sem blob e sem repetição no próprio lote) são codificadas, em
+        paralelo no pool de processos (DIAGNOSTICS_IMAGE_WORKERS).
+        """
+        uploads = list(uploads)
+        digests = [file_sha256(f) for f in uploads]
+        known = set(
+            MediaBlob.objects.filter(kind=MediaBlob.Kind.IMAGE, sha256__in=digests)
+            .values_list("sha256", flat=True)
+        )
+        todo = {}
+        for upload, digest in zip(uploads, digests):
+            if digest not in known and digest not in todo:
+                todo[digest] = upload
+
+        encoded = {}
+        if todo:
+            with metrics.timed("image_encode"):
+                results = imaging.encode_batch(
+                    [imaging.upload_source(f) for f in todo.values()],
+                    max_workers=getattr(settings, "DIAGNOSTICS_IMAGE_WORKERS", None),
+                    **image_options(),
+                )
+            encoded = dict(zip(todo, results))
+
+        created = []
+        # Um toque no relatório para o lote, não um por anexo (signals.attachment_changed)
+        with caching.deferred_touches():
+            for upload, digest in zip(uploads, digests):
+                att = cls(report=report)
+                att.attach_blob(upload, digest, encoded.get(digest))
+                att.save()
+                created.append(att)
+        return created
 
 
 # -------------------------
 # Anexos de Vídeo
 # -------------------------
 class VideoAttachment(models.Model):
+    class Status(models.TextChoices):
+        PENDING = "pending", "Na fila"
+        PROCESSING = "processing", "Processando"
+        DONE = "done", "Concluído"
+        FAILED = "failed", "Falhou"
+
     report = models.ForeignKey(DiagnosticReport, on_delete=models.CASCADE, related_name="videos")
     file = models.FileField("Vídeo", upload_to=report_video_upload_to, validators=[validate_video_size])
+    blob = models.ForeignKey(MediaBlob, on_delete=models.PROTECT, null=True, blank=True, related_name="videos")
+    status = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.PENDING)
+    decision = models.CharField("Processamento", max_length=20, choices=MediaBlob.Decision.choices, blank=True)
+    bytes_saved = models.BigIntegerField("Bytes economizados", null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField("Processado em", null=True, blank=True)
 
     class Meta:
         ordering = ["-created_at"]
@@ -131,40 +401,142 @@ class VideoAttachment(models.Model):
 
     def save(self, *args, **kwargs):
         """
-        Valida tamanho e tenta comprimir com ffmpeg (H.264 + AAC).
+        Upload novo: se o conteúdo já existe, reaproveita o blob (e o vídeo já
+        comprimido, ou a compressão em andamento). Se é inédito, grava o
+        original e enfileira a compressão (ffmpeg) para o worker; o original
+        é servido até o comprimido ficar pronto.
         """
-        # Salva o upload primeiro
-        new = self.pk is None
+        blob = None
+        created = False
+        if self.file and not self.file._committed:
+            upload = self.file.file
+            sha256 = file_sha256(upload)
+            ext = os.path.splitext(upload.name or "")[1].lower() or ".mp4"
+            blob, created = MediaBlob.acquire(
+                MediaBlob.Kind.VIDEO, sha256,
+                lambda: default_storage.save(blob_path("video", sha256, ext), upload),
+                status=MediaBlob.Status.PENDING,
+            )
+            self.blob = blob
+            self.file = blob.file.name
+            self.status = blob.status
+            if blob.status == MediaBlob.Status.DONE:
+                self.decision = blob.decision
+                self.bytes_saved = blob.bytes_saved
+                self.processed_at = timezone.now()
+
         super().save(*args, **kwargs)
 
-        # Tenta comprimir
-        try:
-            in_path = self.file.path
-            base, _ext = os.path.splitext(os.path.basename(in_path))
-            out_dir = os.path.dirname(in_path)
-            out_path = os.path.join(out_dir, f"{base}-cmp.mp4")
-
-            cmd = [
-                "ffmpeg", "-y",
-                "-i", in_path,
-                "-vcodec", "libx264", "-crf", "28", "-preset", "veryfast",
-                "-acodec", "aac", "-b:a", "96k",
-                out_path
-            ]
-            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-
-            # Substitui por comprimido
-            with open(out_path, "rb") as f:
-                self.file.save(os.path.basename(out_path), ContentFile(f.read()), save=False)
-
-            super().save(update_fields=["file"])
-            # Limpa original
-            try:
-                if os.path.exists(in_path):
-                    os.remove(in_path)
-            except Exception:
-                pass
+        if created:
+            ProcessingJob.enqueue(ProcessingJob.Kind.VIDEO_TRANSCODE, blob.pk)
+        elif blob is not None and blob.status != MediaBlob.Status.DONE:
+            # O job do blob pode ter terminado entre a leitura e o INSERT acima
+            current = (
+                MediaBlob.objects.filter(pk=blob.pk)
+                .values("status", "file", "decision", "bytes_saved").first()
+            )
+            if current and current["status"] != self.status:
+                done = current["status"] == MediaBlob.Status.DONE
+                VideoAttachment.objects.filter(pk=self.pk).update(
+                    **current, processed_at=timezone.now() if done else None,
+                )
+
+
+# -------------------------
+# Uso de disco por relatório (ver usage.py)
+# -------------------------
+class ReportMediaUsage(models.Model):
+    """
+    Anexos e bytes de mídia de cada relatório (arquivos dos blobs que eles
+    usam, com capa/prévias). Mantida incrementalmente pelos signals dos
+    anexos e pela compressão de vídeos; sem linha = sem anexos. Backfill:
+    manage.py media_usage --rebuild.
+    """
+    report = models.OneToOneField(
+        DiagnosticReport, on_delete=models.CASCADE, primary_key=True, related_name="media_usage",
+    )
+    images = models.PositiveIntegerField("Imagens", default=0)
+    videos = models.PositiveIntegerField("Vídeos", default=0)
+    bytes = models.PositiveBigIntegerField("Bytes", default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["-bytes"])]
+
+    def __str__(self):
+        return f"Report {self.report_id}: {self.bytes} bytes"
+
+
+# -------------------------
+# Upload retomável de vídeos (ver resumable.py)
+# -------------------------
+class UploadSession(models.Model):
+    """
+    Vídeo sendo recebido em pedaços. `offset` é quanto já está gravado no
+    arquivo parcial (fora do MEDIA_ROOT); o cliente retoma dali depois de
+    uma queda. Sessões paradas além de `expires_at` são apagadas junto com o
+    arquivo (manage.py purge_uploads).
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    filename = models.CharField("Arquivo", max_length=255)
+    content_type = models.CharField("Tipo", max_length=100, blank=True)
+    size = models.PositiveBigIntegerField("Tamanho (bytes)")
+    offset = models.PositiveBigIntegerField("Recebido (bytes)", default=0)
+    created_at = models.DateTimeField("Criado em", auto_now_add=True)
+    expires_at = models.DateTimeField("Expira em")
+
+    class Meta:
+        indexes = [models.Index(fields=["expires_at"])]
+
+    def __str__(self):
+        return f"Upload {self.filename} ({self.offset}/{self.size})"
+
+    @property
+    def path(self):
+        return os.path.join(settings.DIAGNOSTICS_UPLOAD_PARTIAL_DIR, f"{self.pk.hex}.part")
+
+    @property
+    def is_complete(self):
+        return self.offset == self.size
+
+
+# -------------------------
+# Fila de processamento (worker: manage.py process_jobs)
+# -------------------------
+class ProcessingJob(models.Model):
+    class Kind(models.TextChoices):
+        VIDEO_TRANSCODE = "video_transcode", "Compressão de vídeo"
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Na fila"
+        PROCESSING = "processing", "Processando"
+        DONE = "done", "Concluído"
+        FAILED = "failed", "Falhou"
+
+    kind = models.CharField("Tipo", max_length=40, choices=Kind.choices)
+    object_id = models.PositiveBigIntegerField("Objeto")
+    status = models.CharField("Status", max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField("Tentativas", default=0)
+    max_attempts = models.PositiveSmallIntegerField("Máx. tentativas", default=3)
+    run_after = models.DateTimeField("Executar após", default=timezone.now)
+    locked_by = models.CharField("Worker", max_length=120, blank=True)
+    started_at = models.DateTimeField("Iniciado em", null=True, blank=True)
+    finished_at = models.DateTimeField("Finalizado em", null=True, blank=True)
+    duration_ms = models.PositiveIntegerField("Duração (ms)", null=True, blank=True)
+    last_error = models.TextField("Último erro", blank=True)
+
+    created_at = models.DateTimeField("Criado em", auto_now_add=True)
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["status", "run_after"]),
+            models.Index(fields=["kind", "object_id"]),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} #{self.object_id} ({self.get_status_display()})"
 
-        except Exception:
-            # ffmpeg indisponível/falhou -> mantém original
-            pass
+    @classmethod
+    def enqueue(cls, kind, object_id, **kwargs):
+        kwargs.setdefault("max_attempts", getattr(settings, "DIAGNOSTICS_JOB_MAX_ATTEMPTS", 3))
+        return cls.objects.create(kind=kind, object_id=object_id, **kwargs)
@@ -0,0 +1,181 @@
+"""
+Paginação por cursor (keyset) da listagem de diagnósticos.
+
+Em vez de OFFSET + COUNT(*), cada página continua a partir da chave
+(campo de ordenação, id) do último item visto, usando os índices compostos
+de `DiagnosticReport.Meta.indexes`. Os tokens de cursor são assinados
+(`django.core.signing`) e opacos para o cliente.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import caching
+
+CURSOR_SALT = "diagnostics.cursor"
+
+# order_by do DiagnosticFilterForm -> (campo, descendente)
+KEYSET_ORDERINGS = {
+    "-created_at": ("created_at", True),
+    "created_at": ("created_at", False),
+    "title": ("title", False),
+    "-title": ("title", True),
+}
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+@dataclass
+class CursorPage:
+    object_list: list
+    has_next: bool = False
+    has_previous: bool = False
+    next_cursor: str = ""
+    previous_cursor: str = ""
+
+
+def encode_cursor(order_by, value, pk, direction):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    return signing.dumps([order_by, value, pk, direction], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, order_by):
+    try:
+        cur_order, value, pk, direction = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, ValueError, TypeError) as exc:
+        raise InvalidCursor(str(exc))
+    if cur_order != order_by or direction not in ("next", "prev"):
+        # Ordenação mudou: o cursor não vale mais
+        raise InvalidCursor("cursor de outra ordenação")
+    field_name, _desc = KEYSET_ORDERINGS[order_by]
+    if field_name == "created_at":
+        value = datetime.fromisoformat(value)
+    return value, pk, direction
+
+
+def paginate(qs, order_by, cursor=None, per_page=10):
+    """
+    Retorna uma CursorPage de `qs` ordenado por `order_by` (+ id como
+    desempate). `cursor` inválido ou de outra ordenação volta à primeira página.
+    """
+    window, state = _keyset_window(qs, order_by, cursor, per_page)
+    return _build_page(list(window), per_page, *state)
+
+
+async def apaginate(qs, order_by, cursor=None, per_page=10):
+    """paginate() com o ORM assíncrono (views async)."""
+    window, state = _keyset_window(qs, order_by, cursor, per_page)
+    return _build_page([row async for row in window], per_page, *state)
+
+
+def _keyset_window(qs, order_by, cursor, per_page):
+    """Queryset da página (+1 linha para saber se há próxima) e o estado para montar a CursorPage."""
+    field_name, desc = KEYSET_ORDERINGS[order_by]
+    value = pk = None
+    direction = "next"
+    if cursor:
+        try:
+            value, pk, direction = decode_cursor(cursor, order_by)
+        except InvalidCursor:
+            cursor = None
+
+    # Voltando uma página = andar no sentido contrário e inverter o resultado
+    forward_desc = desc if direction == "next" else not desc
+    ordering = [f"-{field_name}", "-id"] if forward_desc else [field_name, "id"]
+    qs = qs.order_by(*ordering)
+
+    if cursor:
+        op = "lt" if forward_desc else "gt"
+        qs = qs.filter(Q(**{f"{field_name}__{op}": value}) | Q(**{field_name: value, f"id__{op}": pk}))
+
+    return qs[:per_page + 1], (order_by, field_name, direction, cursor is not None)
+
+
+def _build_page(rows, per_page, order_by, field_name, direction, has_cursor):
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+
+    if direction == "prev":
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, has_cursor
+
+    page = CursorPage(rows, has_next=has_next, has_previous=has_previous)
+    if rows:
+        first, last = rows[0], rows[-1]
+        if has_next:
+            page.next_cursor = encode_cursor(order_by, getattr(last, field_name), last.pk, "next")
+        if has_previous:
+            page.previous_cursor = encode_cursor(order_by, getattr(first, field_name), first.pk, "prev")
+    return page
+
+
+def filtered_count(qs, params):
+    """
+    Total de resultados para o resumo dos filtros, conforme
+    DIAGNOSTICS_LIST_COUNT: "exact" (COUNT(*) a cada request), "cached"
+    (COUNT(*) guardado no cache por DIAGNOSTICS_LIST_COUNT_TTL segundos,
+    por combinação de filtros e geração da listagem) ou "none" (não conta). Retorna None se
+    a contagem estiver desligada.
+    """
+    mode = _count_mode()
+    if mode == "none":
+        return None
+    if mode == "exact":
+        return qs.count()
+    return cache.get_or_set(_count_key(params, caching.list_generation()), qs.count, _count_ttl())
+
+
+async def afiltered_count(qs, params):
+    """filtered_count() com o ORM/cache assíncronos (views async)."""
+    mode = _count_mode()
+    if mode == "none":
+        return None
+    if mode == "exact":
+        return await qs.acount()
+    key = _count_key(params, await caching.alist_generation())
+    count = await cache.aget(key)
+    if count is None:
+        count = await qs.acount()
+        await cache.aset(key, count, _count_ttl())
+    return count
+
+
+def _count_mode():
+    return getattr(settings, "DIAGNOSTICS_LIST_COUNT", "cached")
+
+
+def _count_ttl():
+    return getattr(settings, "DIAGNOSTICS_LIST_COUNT_TTL", 60)
+
+
+def _count_key(params, generation):
+    key_src = "&".join(f"{k}={v}" for k, v in sorted(params.items()) if v not in (None, ""))
+    return f"diagnostics:list-count:{generation}:" + hashlib.sha1(key_src.encode()).hexdigest()
+
+
+class CachedCountPaginator(Paginator):
+    """
+    Paginator do admin com o total guardado no cache como em `filtered_count`
+    (chave: SQL do queryset + geração da listagem; DIAGNOSTICS_LIST_COUNT_TTL).
+    Com DIAGNOSTICS_LIST_COUNT="exact", conta a cada request.
+    """
+
+    @cached_property
+    def count(self):
+        if _count_mode() == "exact":
+            return super().count
+        sql, params = self.object_list.query.sql_with_params()
+        key = _count_key({"sql": sql, "params": repr(params)}, caching.list_generation())
+        return cache.get_or_set(key, self.object_list.count, _count_ttl())
@@ -0,0 +1,73 @@
+"""
+Querysets das páginas de diagnósticos, montados para o que cada template
+mostra (o orçamento de queries de cada view fica em metrics.QUERY_BUDGETS).
+
+* listagem e linha do tempo (`report_rows`): só as colunas do cartão; da
+  mensagem, que pode ser longa, vem apenas o começo (`excerpt`), cortado no
+  banco. As contagens de anexos dos selos vêm de ReportMediaUsage num LEFT
+  JOIN pela chave primária: nada de COUNT por linha nem query por relatório;
+* detalhe (`ReportMedia`): imagens e vídeos (com o blob) por prefetch, em
+  ordem estável, com as colunas que a galeria usa.
+"""
+from django.db.models import Prefetch, prefetch_related_objects
+from django.db.models.functions import Coalesce, Substr
+from django.utils.functional import cached_property
+
+from .models import ImageAttachment, VideoAttachment
+
+ROW_FIELDS = ("id", "title", "su_identifier", "user_name", "user_email", "category", "created_at")
+# O cartão mostra até 4 linhas da mensagem (line-clamp): folga para isso
+EXCERPT_CHARS = 400
+
+ATTACHMENT_ORDERING = ("-created_at", "-id")
+VIDEO_FIELDS = (
+    "id", "report_id", "file", "status", "created_at",
+    "blob__id", "blob__poster", "blob__sprite", "blob__sprite_frames",
+)
+
+
+def report_rows(qs):
+    """`qs` de DiagnosticReport com a projeção dos cartões + `excerpt`, `image_count` e `video_count`."""
+    return qs.only(*ROW_FIELDS).annotate(
+        excerpt=Substr("message", 1, EXCERPT_CHARS),
+        image_count=Coalesce("media_usage__images", 0),
+        video_count=Coalesce("media_usage__videos", 0),
+    )
+
+
+def media_prefetches():
+    return [
+        Prefetch(
+            "images",
+            queryset=ImageAttachment.objects.only("id", "report_id", "created_at").order_by(*ATTACHMENT_ORDERING),
+        ),
+        Prefetch(
+            "videos",
+            queryset=VideoAttachment.objects.select_related("blob").only(*VIDEO_FIELDS).order_by(*ATTACHMENT_ORDERING),
+        ),
+    ]
+
+
+class ReportMedia:
+    """
+    Anexos de um relatório para o detalhe. O prefetch (uma query por tipo)
+    só roda no primeiro acesso: com o fragmento {% cache %} da galeria
+    válido, nenhuma query de anexos é feita.
+    """
+
+    def __init__(self, report):
+        self.report = report
+
+    def _prefetch(self):
+        # Não refaz o que já está em report._prefetched_objects_cache
+        prefetch_related_objects([self.report], *media_prefetches())
+
+    @cached_property
+    def images(self):
+        self._prefetch()
+        return list(self.report.images.all())
+
+    @cached_property
+    def videos(self):
+        self._prefetch()
+        return list(self.report.videos.all())
@@ -0,0 +1,201 @@
+"""
+Upload retomável de vídeos, em pedaços (protocolo no estilo do tus):
+
+1. `POST /diagnostics/uploads/` com `{"filename", "size", "content_type"}`:
+   cria a sessão, recusando de saída o que não for vídeo ou passar de
+   DIAGNOSTICS_VIDEO_UPLOAD_MAX_MB (sem receber um byte do arquivo).
+2. `PATCH /diagnostics/uploads/<id>/` com `Upload-Offset: <n>` e os bytes
+   seguintes no corpo (até DIAGNOSTICS_UPLOAD_CHUNK_MB). O primeiro pedaço
+   tem a assinatura conferida (MP4/MOV/WebM/AVI...). Cada pedaço é gravado
+   direto na sua posição do arquivo parcial; se a conexão cai no meio, o
+   que chegou fica valendo.
+3. `HEAD /diagnostics/uploads/<id>/`: quanto já foi recebido, para retomar.
+4. Completo, o id vai no POST do relatório (`video_uploads`) e `finish`
+   move o arquivo montado para o anexo (sem cópia no mesmo disco).
+
+O corpo dos PATCH é lido do stream do request em blocos, sem passar por
+`request.body` nem pelos upload handlers (nada em memória ou em /tmp).
+"""
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db.models import F
+from django.utils import timezone
+
+from .models import UploadSession, VideoAttachment, max_video_upload_mb
+
+READ_BLOCK = 64 * 1024
+
+# Assinaturas dos containers de vídeo aceitos: (posição, bytes)
+VIDEO_SIGNATURES = [
+    (4, b"ftyp"),                # MP4, MOV, M4V, 3GP
+    (0, b"\x1a\x45\xdf\xa3"),    # WebM, MKV
+    (8, b"AVI "),                # AVI (RIFF....AVI )
+    (0, b"\x00\x00\x01\xba"),    # MPEG-PS
+]
+
+
+class UploadError(Exception):
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def max_bytes():
+    return max_video_upload_mb() * 1024 * 1024
+
+
+def chunk_max_bytes():
+    return getattr(settings, "DIAGNOSTICS_UPLOAD_CHUNK_MB", 8) * 1024 * 1024
+
+
+def expires_at():
+    return timezone.now() + timedelta(hours=getattr(settings, "DIAGNOSTICS_UPLOAD_EXPIRE_HOURS", 24))
+
+
+def looks_like_video(head):
+    return any(head[pos:pos + len(sig)] == sig for pos, sig in VIDEO_SIGNATURES)
+
+
+def active_sessions():
+    return UploadSession.objects.filter(expires_at__gt=timezone.now())
+
+
+def create_session(filename, size, content_type=""):
+    """Valida os metadados declarados e cria a sessão com o arquivo parcial vazio."""
+    filename = os.path.basename(str(filename or "")).strip()[:255]
+    if not filename:
+        raise UploadError("filename é obrigatório")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise UploadError("size inválido")
+    if size <= 0:
+        raise UploadError("size inválido")
+    if size > max_bytes():
+        raise UploadError(f"O arquivo '{filename}' excede {max_video_upload_mb()} MB.", status=413)
+    content_type = str(content_type or "").lower()
+    if content_type and not content_type.startswith("video/"):
+        raise UploadError(f"O arquivo '{filename}' não parece ser um vídeo válido.", status=415)
+
+    session = UploadSession(filename=filename, content_type=content_type, size=size, expires_at=expires_at())
+    os.makedirs(settings.DIAGNOSTICS_UPLOAD_PARTIAL_DIR, exist_ok=True)
+    open(session.path, "wb").close()
+    session.save()
+    return session
+
+
+def append_chunk(session, offset, stream, length):
+    """
+    Grava `length` bytes de `stream` a partir de `offset` e avança a sessão.
+    Retorna o novo offset. Um offset diferente do atual (pedaço repetido,
+    ou outro request mais rápido) dá 409 com o offset certo para retomar.
+    """
+    if offset != session.offset:
+        raise UploadError("Upload-Offset diferente do recebido", status=409, offset=session.offset)
+    if length > chunk_max_bytes():
+        raise UploadError(f"pedaço maior que {chunk_max_bytes()} bytes", status=413)
+    if offset + length > session.size:
+        raise UploadError("pedaço passa do tamanho declarado", status=400)
+
+    received = 0
+    interrupted = None
+    with open(session.path, "r+b") as fp:
+        fp.seek(offset)
+        while received < length:
+            try:
+                block = stream.read(min(READ_BLOCK, length - received))
+            except OSError as exc:  # UnreadablePostError: cliente caiu no meio
+                interrupted = exc
+                break
+            if not block:
+                break
+            if offset + received == 0 and not looks_like_video(block):
+                session.delete()
+                raise UploadError(f"O arquivo '{session.filename}' não parece ser um vídeo válido.", status=415)
+            fp.write(block)
+            received += len(block)
+
+    # UPDATE condicional: de dois requests com o mesmo offset, só um avança
+    new_offset = offset + received
+    advanced = UploadSession.objects.filter(pk=session.pk, offset=offset).update(
+        offset=new_offset, expires_at=expires_at(),
+    )
+    if not advanced:
+        session.refresh_from_db(fields=["offset"])
+        raise UploadError("Upload-Offset diferente do recebido", status=409, offset=session.offset)
+    session.offset = new_offset
+    if interrupted is not None or received < length:
+        raise UploadError("conexão interrompida; retome do Upload-Offset", status=400, offset=new_offset)
+    return new_offset
+
+
+class AssembledUpload(File):
+    """
+    Arquivo parcial completo. `temporary_file_path()` faz o FileSystemStorage
+    mover o arquivo (rename) em vez de copiá-lo para o MEDIA_ROOT.
+    """
+
+    def __init__(self, session):
+        super().__init__(open(session.path, "rb"), name=session.filename)
+        self.content_type = session.content_type
+        self._path = session.path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+def finish(report, upload_ids):
+    """
+    Cria os anexos de vídeo das sessões completas em `upload_ids` (ids
+    desconhecidos, expirados ou incompletos são ignorados) e encerra as sessões.
+    Cada sessão vira anexo uma vez só, mesmo com o formulário enviado duas vezes.
+    """
+    sessions = active_sessions().filter(pk__in=_valid_ids(upload_ids), offset=F("size"))
+    created = []
+    for session in sessions:
+        # UPDATE condicional, como no append_chunk: vencer a sessão agora a
+        # reserva; outro request com o mesmo id não a vê mais como ativa
+        now = timezone.now()
+        if not UploadSession.objects.filter(pk=session.pk, expires_at__gt=now).update(expires_at=now):
+            continue
+        upload = AssembledUpload(session)
+        try:
+            va = VideoAttachment(report=report, file=upload)
+            # O tamanho já foi limitado por max_bytes() na sessão e nos pedaços;
+            # validate_video_size vale só para o POST único (MAX_VIDEO_MB)
+            va.full_clean(exclude=["file"])
+            va.save()
+            created.append(va)
+        except Exception:
+            # Devolve a sessão para o cliente tentar de novo
+            UploadSession.objects.filter(pk=session.pk).update(expires_at=expires_at())
+            raise
+        finally:
+            upload.close()
+        session.delete()
+    return created
+
+
+def _valid_ids(values):
+    ids = []
+    for value in values:
+        try:
+            ids.append(uuid.UUID(str(value)))
+        except ValueError:
+            continue
+    return ids
+
+
+def purge_expired():
+    """Apaga as sessões vencidas (o sinal post_delete remove os arquivos parciais). Retorna quantas."""
+    expired = UploadSession.objects.filter(expires_at__lte=timezone.now())
+    count = 0
+    for session in expired.iterator():
+        session.delete()
+        count += 1
+    return count
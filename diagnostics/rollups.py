@@ -0,0 +1,176 @@
+"""
+Contagens de relatórios por (dia, SU, categoria) em ReportDailyRollup,
+atualizadas a cada escrita em vez de recalculadas na leitura: o painel e a
+API leem algumas linhas por dia, não importa o tamanho de DiagnosticReport.
+
+* save/delete de um relatório: signals (`diagnostics/signals.py`), com a
+  chave antiga guardada no `post_init` para mover a contagem quando a SU ou
+  a categoria mudam;
+* `bulk_create` da ingestão: `add_reports`;
+* ações em massa do admin (`bulk.py`): `counts` + `apply`;
+* `QuerySet.update()` não passa por aqui: rode `rebuild_rollups` depois.
+"""
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import DiagnosticReport, ReportDailyRollup
+
+CATEGORIES = [value for value, _label in DiagnosticReport.Category.choices]
+REBUILD_BATCH_SIZE = 1000
+
+
+KEY_FIELDS = {"created_at", "su_identifier", "category"}
+
+
+def rollup_key(report):
+    """(dia local, SU, categoria) do relatório; None se ainda não foi salvo."""
+    if report.created_at is None:
+        return None
+    return (timezone.localdate(report.created_at), report.su_identifier or "", report.category)
+
+
+def remember_key(report):
+    """
+    Guarda a chave com que o relatório foi carregado (post_init). Com os
+    campos adiados (only/defer), não guarda: ler aqui faria uma query por
+    instância; `ensure_key` busca só se o relatório for salvo/apagado.
+    """
+    if KEY_FIELDS <= report.__dict__.keys():
+        report._rollup_key = rollup_key(report)
+
+
+def ensure_key(report):
+    """Antes de salvar/apagar um relatório existente sem a chave guardada: lê a do banco."""
+    if report._state.adding or hasattr(report, "_rollup_key"):
+        return
+    old = DiagnosticReport.objects.filter(pk=report.pk).only(*KEY_FIELDS).first()
+    report._rollup_key = rollup_key(old) if old is not None else None
+
+
+def apply(deltas):
+    """Soma `deltas` ({chave: +n/-n}) nas linhas da rollup, criando as que faltam."""
+    for (day, su, category), delta in deltas.items():
+        if not delta:
+            continue
+        key = {"day": day, "su_identifier": su, "category": category}
+        if ReportDailyRollup.objects.filter(**key).update(count=F("count") + delta):
+            if delta < 0:
+                ReportDailyRollup.objects.filter(**key, count__lte=0).delete()
+            continue
+        if delta < 0:
+            continue
+        try:
+            with transaction.atomic():
+                ReportDailyRollup.objects.create(**key, count=delta)
+        except IntegrityError:
+            # Outro request criou a linha ao mesmo tempo
+            ReportDailyRollup.objects.filter(**key).update(count=F("count") + delta)
+
+
+def record_saved(report, created):
+    new_key = rollup_key(report)
+    old_key = None if created else getattr(report, "_rollup_key", None)
+    if new_key != old_key:
+        deltas = Counter()
+        if old_key is not None:
+            deltas[old_key] -= 1
+        if new_key is not None:
+            deltas[new_key] += 1
+        apply(deltas)
+    report._rollup_key = new_key
+
+
+def record_deleted(report):
+    key = getattr(report, "_rollup_key", None)
+    if key is not None:
+        apply({key: -1})
+
+
+def add_reports(reports):
+    """Conta relatórios criados em lote (bulk_create não dispara post_save)."""
+    deltas = Counter(rollup_key(r) for r in reports)
+    deltas.pop(None, None)
+    apply(deltas)
+    for report in reports:
+        report._rollup_key = rollup_key(report)
+
+
+def counts(qs):
+    """Quantos relatórios de `qs` há em cada chave da rollup (uma query agrupada)."""
+    rows = (
+        qs.order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "su_identifier", "category")
+        .annotate(n=Count("id"))
+    )
+    return Counter({(r["day"], r["su_identifier"] or "", r["category"]): r["n"] for r in rows})
+
+
+@transaction.atomic
+def rebuild():
+    """Recalcula toda a rollup a partir de DiagnosticReport (backfill/correção). Retorna nº de linhas."""
+    ReportDailyRollup.objects.all().delete()
+    rows = (
+        DiagnosticReport.objects.order_by()
+        .annotate(day=TruncDate("created_at"))
+        .values("day", "su_identifier", "category")
+        .annotate(n=Count("id"))
+    )
+    objs = [
+        ReportDailyRollup(day=r["day"], su_identifier=r["su_identifier"], category=r["category"], count=r["n"])
+        for r in rows.iterator()
+    ]
+    ReportDailyRollup.objects.bulk_create(objs, batch_size=REBUILD_BATCH_SIZE)
+    return len(objs)
+
+
+# -------------------------
+# Leitura (painel e API)
+# -------------------------
+def _rows(start, end, su=None):
+    qs = ReportDailyRollup.objects.filter(day__gte=start, day__lte=end)
+    if su:
+        qs = qs.filter(su_identifier=su)
+    return qs
+
+
+def daily(start, end, su=None):
+    """Uma entrada por dia de [start, end] (dias sem relatórios com zero), com total e por categoria."""
+    counts = defaultdict(Counter)
+    rows = _rows(start, end, su).values("day", "category").annotate(n=Sum("count"))
+    for row in rows:
+        counts[row["day"]][row["category"]] = row["n"]
+    days = []
+    day = start
+    while day <= end:
+        entry = {"day": day, **{c: counts[day][c] for c in CATEGORIES}}
+        entry["total"] = sum(counts[day].values())
+        days.append(entry)
+        day += timedelta(days=1)
+    return days
+
+
+def by_su(start, end, limit=20):
+    """SUs com mais relatórios críticos (e depois total) no período."""
+    rows = (
+        _rows(start, end).values("su_identifier")
+        .annotate(
+            total=Sum("count"),
+            **{c: Sum("count", filter=Q(category=c), default=0) for c in CATEGORIES},
+        )
+        .order_by(f"-{DiagnosticReport.Category.CRITICA}", "-total", "su_identifier")
+    )
+    return list(rows[:limit])
+
+
+def totals(start, end, su=None):
+    rows = _rows(start, end, su).values("category").annotate(n=Sum("count"))
+    result = {c: 0 for c in CATEGORIES}
+    result.update({r["category"]: r["n"] for r in rows})
+    result["total"] = sum(result[c] for c in CATEGORIES)
+    return result
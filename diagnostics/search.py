@@ -0,0 +1,132 @@
+"""
+Busca textual dos relatórios.
+
+* SQLite: tabela virtual FTS5 (`diagnostics_report_fts`, external content)
+  mantida por triggers de INSERT/UPDATE/DELETE.
+* Postgres: índice GIN sobre a expressão `tsvector` dos campos buscáveis.
+
+Em ambos os casos o índice é criado/atualizado pelo banco, então inserts em
+lote (`bulk_create`) e deletes em cascata também ficam sincronizados. A
+estrutura é instalada no `post_migrate` (ver `apps.py`), de forma idempotente.
+"""
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, F, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import DiagnosticReport
+
+FTS_TABLE = "diagnostics_report_fts"
+REPORT_TABLE = DiagnosticReport._meta.db_table
+SEARCH_COLUMNS = ["title", "su_identifier", "user_name", "user_email", "message"]
+
+# Pesos BM25 (SQLite) na ordem de SEARCH_COLUMNS
+FTS_WEIGHTS = (10.0, 8.0, 3.0, 3.0, 1.0)
+
+PG_CONFIG = "portuguese"
+PG_DOCUMENT = (
+    f"setweight(to_tsvector('{PG_CONFIG}', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(su_identifier, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(user_name, '') || ' ' || coalesce(user_email, '')), 'B') || "
+    f"setweight(to_tsvector('{PG_CONFIG}', coalesce(message, '')), 'C')"
+)
+PG_INDEX = "diagnostics_report_search_gin"
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(query):
+    return TOKEN_RE.findall(query or "")
+
+
+def search_reports(qs, query):
+    """
+    Filtra `qs` pelos termos de `query` (todos os termos, prefixo no último
+    caractere de cada um) e anota `search_rank` — maior é mais relevante.
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return qs
+
+    if connection.vendor == "sqlite":
+        match = " ".join('"{}"*'.format(t.replace('"', '""')) for t in tokens)
+        # rank do FTS5 é BM25 negativo (menor = melhor); invertido para ficar
+        # na mesma convenção do ts_rank do Postgres
+        return qs.filter(search_index__document__match=match).annotate(
+            search_rank=-F("search_index__rank"),
+        )
+
+    if connection.vendor == "postgresql":
+        tsquery = " & ".join(f"{t}:*" for t in tokens)
+        return qs.filter(
+            RawSQL(f"({PG_DOCUMENT}) @@ to_tsquery('{PG_CONFIG}', %s)", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f"ts_rank({PG_DOCUMENT}, to_tsquery('{PG_CONFIG}', %s))", [tsquery], output_field=FloatField())
+        )
+
+    # Outros bancos: varredura simples
+    cond = Q()
+    for t in tokens:
+        cond &= Q(title__icontains=t) | Q(su_identifier__icontains=t) | Q(message__icontains=t)
+    return qs.filter(cond)
+
+
+def install(using=None, **kwargs):
+    """Cria (se necessário) o índice de busca do banco atual."""
+    from django.db import connections
+
+    conn = connections[using or "default"]
+    if conn.vendor == "sqlite":
+        _install_sqlite(conn)
+    elif conn.vendor == "postgresql":
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON {REPORT_TABLE} USING GIN (({PG_DOCUMENT}))"
+            )
+
+
+def rebuild(using=None):
+    """Reconstrói o índice FTS5 a partir da tabela de relatórios (SQLite)."""
+    from django.db import connections
+
+    conn = connections[using or "default"]
+    if conn.vendor == "sqlite":
+        with conn.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
+
+
+def _install_sqlite(conn):
+    cols = ", ".join(SEARCH_COLUMNS)
+    new_cols = ", ".join(f"new.{c}" for c in SEARCH_COLUMNS)
+    old_cols = ", ".join(f"old.{c}" for c in SEARCH_COLUMNS)
+    delete_old = (
+        f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});"
+    )
+    insert_new = f"INSERT INTO {FTS_TABLE}(rowid, {cols}) VALUES (new.id, {new_cols});"
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+        exists = cursor.fetchone() is not None
+
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{cols}, content='{REPORT_TABLE}', content_rowid='id', "
+            "tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON {REPORT_TABLE} "
+            f"BEGIN {insert_new} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON {REPORT_TABLE} "
+            f"BEGIN {delete_old} END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {cols} ON {REPORT_TABLE} "
+            f"BEGIN {delete_old} {insert_new} END"
+        )
+        if not exists:
+            weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank) VALUES ('rank', 'bm25({weights})')")
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES('rebuild')")
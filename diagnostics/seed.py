@@ -0,0 +1,206 @@
+"""
+Dados sintéticos para desenvolvimento e benchmarks (`manage.py seed_reports`).
+
+Com a mesma semente, gera sempre os mesmos relatórios (SUs, categorias,
+mensagens, datas relativas a `until`) e a mesma distribuição de anexos.
+Tudo entra por `bulk_create` em lotes, sem formulários nem signals; o que
+os signals fariam (rollup do painel, uso de disco, invalidação de caches,
+contagem de referências dos blobs) é feito uma vez, no fim.
+
+Os anexos apontam para um conjunto pequeno de blobs (imagens WEBP geradas
+com o Pillow e "vídeos" MP4 mínimos, já com capa), como acontece com a
+deduplicação: centenas de milhares de anexos sem gravar milhares de arquivos.
+"""
+import hashlib
+import io
+import random
+import struct
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from PIL import Image, ImageDraw
+
+from . import caching, rollups, units, usage
+from .models import DiagnosticReport, ImageAttachment, MediaBlob, VideoAttachment, blob_path
+
+BATCH_SIZE = 2000
+IMAGE_BLOBS = 12
+VIDEO_BLOBS = 3
+
+STATES = ["AC", "AM", "BA", "MG", "PA", "PR", "RS", "SP"]
+PEOPLE = ["Ana Souza", "Bruno Lima", "Carla Dias", "Diego Alves", "Elisa Rocha", "Fábio Nunes"]
+COMPONENTS = [
+    "sensor térmico", "sensor de umidade", "gateway LoRa", "módulo de CO2",
+    "bateria", "painel solar", "anemômetro", "pluviômetro", "datalogger",
+]
+SYMPTOMS = [
+    "leitura intermitente", "valores fora da faixa", "sem comunicação há {h} h",
+    "reinicializações frequentes", "queda de tensão para {v} V", "oxidação nos conectores",
+    "calibração vencida", "falha após chuva forte", "ruído nas medições",
+]
+ACTIONS = [
+    "Conectores limpos e reapertados.", "Firmware atualizado para a versão 2.{n}.",
+    "Componente substituído em campo.", "Aguardando peça de reposição.",
+    "Recalibrado com padrão de referência.", "Sem intervenção; monitorar nas próximas 48 h.",
+]
+
+
+def su_identifiers(count=120, rnd=None):
+    rnd = rnd or random.Random(0)
+    return [f"SU-{rnd.choice(STATES)}-{i:03d}" for i in range(1, count + 1)]
+
+
+def make_report(rnd, sus, created_at):
+    """Um DiagnosticReport (não salvo) com texto no estilo dos relatórios de campo."""
+    component = rnd.choice(COMPONENTS)
+    symptom = rnd.choice(SYMPTOMS).format(h=rnd.randint(2, 72), v=round(rnd.uniform(3.0, 11.5), 1))
+    critical = rnd.random() < 0.18
+    lines = [
+        f"{component.capitalize()}: {symptom}.",
+        *(f"Também observado: {rnd.choice(SYMPTOMS).format(h=rnd.randint(2, 72), v=round(rnd.uniform(3.0, 11.5), 1))}."
+          for _ in range(rnd.randint(0, 3))),
+        rnd.choice(ACTIONS).format(n=rnd.randint(0, 9)),
+    ]
+    author = rnd.choice(PEOPLE)
+    return DiagnosticReport(
+        title=f"{component.capitalize()} — {symptom}"[:200],
+        su_identifier=rnd.choice(sus) if rnd.random() > 0.02 else "",
+        user_name=author,
+        user_email=author.split()[0].lower() + "@smartlab.example",
+        message="\n".join(lines),
+        category=DiagnosticReport.Category.CRITICA if critical else DiagnosticReport.Category.NORMAL,
+        created_at=created_at,
+        updated_at=created_at,
+    )
+
+
+@contextmanager
+def explicit_timestamps():
+    """Deixa o bulk_create gravar created_at/updated_at informados (sem auto_now)."""
+    fields = [DiagnosticReport._meta.get_field(name) for name in ("created_at", "updated_at")]
+    saved = [(f.auto_now, f.auto_now_add) for f in fields]
+    for f in fields:
+        f.auto_now = f.auto_now_add = False
+    try:
+        yield
+    finally:
+        for f, (auto_now, auto_now_add) in zip(fields, saved):
+            f.auto_now, f.auto_now_add = auto_now, auto_now_add
+
+
+def _synthetic_image(rnd, index):
+    img = Image.new("RGB", (800, 600), tuple(rnd.randint(40, 220) for _ in range(3)))
+    draw = ImageDraw.Draw(img)
+    for _ in range(12):
+        x, y = rnd.randint(0, 760), rnd.randint(0, 560)
+        draw.rectangle([x, y, x + rnd.randint(20, 200), y + rnd.randint(20, 150)],
+                       fill=tuple(rnd.randint(0, 255) for _ in range(3)))
+    draw.text((20, 20), f"seed #{index}", fill=(255, 255, 255))
+    buf = io.BytesIO()
+    img.save(buf, "WEBP", quality=75)
+    return buf.getvalue()
+
+
+def _synthetic_mp4(index):
+    # ftyp + moov vazio antes do mdat ("faststart"): o suficiente para ser
+    # reconhecido como MP4 pelo upload e pelo player; não tem quadros
+    ftyp = struct.pack(">I4s4sI4s4s", 24, b"ftyp", b"isom", 512, b"isom", b"mp41")
+    moov = struct.pack(">I4s", 8, b"moov")
+    payload = f"seed video {index}".encode()
+    mdat = struct.pack(">I4s", 8 + len(payload), b"mdat") + payload
+    return ftyp + moov + mdat
+
+
+def _blob(kind, data, ext, **fields):
+    sha256 = hashlib.sha256(data).hexdigest()
+    blob, _created = MediaBlob.acquire(
+        kind, sha256, lambda: default_storage.save(blob_path(kind, sha256, ext), ContentFile(data)), **fields,
+    )
+    return blob
+
+
+def media_blobs(rnd):
+    """Os blobs compartilhados pelos anexos sintéticos (criados só se ainda não existem)."""
+    images = [_blob(MediaBlob.Kind.IMAGE, _synthetic_image(rnd, i), ".webp") for i in range(IMAGE_BLOBS)]
+    videos = []
+    for i in range(VIDEO_BLOBS):
+        blob = _blob(
+            MediaBlob.Kind.VIDEO, _synthetic_mp4(i), ".mp4",
+            status=MediaBlob.Status.DONE, decision=MediaBlob.Decision.KEEP, bytes_saved=0,
+        )
+        if not blob.poster:
+            blob.poster = default_storage.save(
+                blob_path("video", blob.sha256, "-poster.webp"), ContentFile(_synthetic_image(rnd, 100 + i)),
+            )
+            blob.derived_size = blob.poster.size
+            blob.save(update_fields=["poster", "derived_size"])
+        videos.append(blob)
+    return images, videos
+
+
+def seed_reports(rows, seed=42, days=365, until=None, image_ratio=0.3, video_ratio=0.05,
+                 batch_size=BATCH_SIZE, progress=None):
+    """
+    Cria `rows` relatórios espalhados pelos últimos `days` dias até `until`
+    (padrão: agora). Uma fração `image_ratio` ganha 1–4 imagens e
+    `video_ratio`, um vídeo. `progress(feitos)` é chamado a cada lote.
+    Retorna {"reports", "images", "videos"} com o que foi criado.
+    """
+    rnd = random.Random(seed)
+    until = until or timezone.now()
+    span = timedelta(days=days).total_seconds()
+    sus = su_identifiers(rnd=random.Random(seed))
+    image_blobs, video_blobs = media_blobs(random.Random(seed))
+    totals = {"reports": 0, "images": 0, "videos": 0}
+
+    # Do mais antigo ao mais recente, como chegariam (ids crescem com created_at)
+    offsets = sorted((rnd.random() * span for _ in range(rows)), reverse=True)
+    for start in range(0, rows, batch_size):
+        batch = [make_report(rnd, sus, until - timedelta(seconds=s)) for s in offsets[start:start + batch_size]]
+        with transaction.atomic():
+            with explicit_timestamps():
+                created = DiagnosticReport.objects.bulk_create(batch, batch_size=batch_size)
+
+            images, videos = [], []
+            for report in created:
+                if rnd.random() < image_ratio:
+                    for blob in rnd.sample(image_blobs, rnd.randint(1, 4)):
+                        images.append(ImageAttachment(report=report, file=blob.file.name, blob=blob))
+                if rnd.random() < video_ratio:
+                    blob = rnd.choice(video_blobs)
+                    videos.append(VideoAttachment(
+                        report=report, file=blob.file.name, blob=blob, status=VideoAttachment.Status.DONE,
+                        decision=blob.decision, bytes_saved=0, processed_at=report.created_at,
+                    ))
+            ImageAttachment.objects.bulk_create(images, batch_size=batch_size)
+            VideoAttachment.objects.bulk_create(videos, batch_size=batch_size)
+
+        totals["reports"] += len(created)
+        totals["images"] += len(images)
+        totals["videos"] += len(videos)
+        if progress:
+            progress(totals["reports"])
+
+    _sync_ref_counts(image_blobs + video_blobs)
+    # Uma query agrupada no fim, em vez de uma atualização por (dia, SU, categoria) a cada lote
+    rollups.rebuild()
+    usage.rebuild()
+    caching.bump_list_generation()
+    units.invalidate_summary()
+    return totals
+
+
+def _sync_ref_counts(blobs):
+    """ref_count = anexos que apontam para o blob (os bulk_create não passam por acquire())."""
+    ids = [b.pk for b in blobs]
+    refs = {pk: 0 for pk in ids}
+    for model in (ImageAttachment, VideoAttachment):
+        for row in model.objects.filter(blob_id__in=ids).order_by().values("blob_id").annotate(n=Count("id")):
+            refs[row["blob_id"]] += row["n"]
+    for pk, n in refs.items():
+        MediaBlob.objects.filter(pk=pk).update(ref_count=n)
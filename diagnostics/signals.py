@@ -0,0 +1,67 @@
+import os
+
+from django.db.models.signals import post_delete, post_init, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from . import caching, mediastore, rollups, units, usage
+from .models import DiagnosticReport, ImageAttachment, MediaBlob, UploadSession, VideoAttachment
+
+
+@receiver([post_save, post_delete], sender=DiagnosticReport)
+def report_changed(sender, instance, **kwargs):
+    caching.bump_list_generation()
+    units.invalidate_summary()
+
+
+@receiver(post_init, sender=DiagnosticReport)
+def report_loaded(sender, instance, **kwargs):
+    rollups.remember_key(instance)
+
+
+@receiver([pre_save, pre_delete], sender=DiagnosticReport)
+def report_writing(sender, instance, **kwargs):
+    rollups.ensure_key(instance)
+
+
+@receiver(post_save, sender=DiagnosticReport)
+def report_saved(sender, instance, created, **kwargs):
+    rollups.record_saved(instance, created)
+
+
+@receiver(post_delete, sender=DiagnosticReport)
+def report_deleted(sender, instance, **kwargs):
+    rollups.record_deleted(instance)
+
+
+@receiver([post_save, post_delete], sender=ImageAttachment)
+@receiver([post_save, post_delete], sender=VideoAttachment)
+def attachment_changed(sender, instance, **kwargs):
+    caching.touch_report(instance.report_id)
+
+
+@receiver(post_save, sender=ImageAttachment)
+@receiver(post_save, sender=VideoAttachment)
+def attachment_saved(sender, instance, created, **kwargs):
+    if created:
+        usage.record_attachment(instance, 1)
+
+
+@receiver(post_delete, sender=ImageAttachment)
+@receiver(post_delete, sender=VideoAttachment)
+def attachment_deleted(sender, instance, **kwargs):
+    # Antes do release(): ele pode apagar o blob, de onde vem o tamanho
+    usage.record_attachment(instance, -1)
+    if instance.blob_id:
+        MediaBlob.release(instance.blob_id)
+    else:
+        # Anexo anterior aos blobs: o arquivo é só dele
+        mediastore.delete_on_commit([instance.file.name])
+
+
+@receiver(post_delete, sender=UploadSession)
+def upload_session_deleted(sender, instance, **kwargs):
+    # Completo, o arquivo já foi movido para o anexo; senão é descartado
+    try:
+        os.remove(instance.path)
+    except FileNotFoundError:
+        pass
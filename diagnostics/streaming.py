@@ -0,0 +1,55 @@
+"""
+Corpos de resposta em streaming que continuam em streaming no modo ASGI.
+
+Sob ASGI, o StreamingHttpResponse do Django esvazia um iterador síncrono de
+uma vez (`sync_to_async(list)`) antes de mandar o primeiro byte: a
+exportação inteira ou o vídeo inteiro iriam para a memória. Aqui o corpo
+vira um iterador assíncrono que busca um pedaço por vez numa thread. Sob
+WSGI fica como está (o gunicorn itera direto, ou usa sendfile no arquivo).
+"""
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+
+# Linhas da exportação por ida à thread (cada ida tem custo de troca de thread)
+LINES_PER_CHUNK = 200
+FILE_BLOCK_SIZE = 64 * 1024
+
+
+def is_asgi(request):
+    return isinstance(request, ASGIRequest)
+
+
+def lines(request, iterator, per_chunk=LINES_PER_CHUNK):
+    """
+    `iterator` (str/bytes) como corpo de StreamingHttpResponse. Em ASGI, os
+    pedaços são gerados na thread das views síncronas (thread_sensitive):
+    o cursor do `QuerySet.iterator()` fica na conexão em que foi aberto.
+    """
+    if not is_asgi(request):
+        return iterator
+    return _alines(iter(iterator), per_chunk)
+
+
+async def _alines(iterator, per_chunk):
+    def take():
+        chunk = []
+        for item in iterator:
+            chunk.append(item.encode() if isinstance(item, str) else item)
+            if len(chunk) >= per_chunk:
+                break
+        return chunk
+
+    while chunk := await sync_to_async(take)():
+        yield b"".join(chunk)
+
+
+async def file_blocks(fp, block_size=FILE_BLOCK_SIZE):
+    """Lê `fp` (até o fim, ou da faixa de um RangeFile) em blocos, numa thread, e fecha no final."""
+    try:
+        while True:
+            block = await sync_to_async(fp.read, thread_sensitive=False)(block_size)
+            if not block:
+                return
+            yield block
+    finally:
+        await sync_to_async(fp.close, thread_sensitive=False)()
@@ -0,0 +1,21 @@
+from django import template
+from django.urls import reverse
+
+from diagnostics import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def thumbnail_url(image, size="sm"):
+    """URL do derivado `size` (sm/md/lg, ou "full") de um ImageAttachment, no formato negociado pelo Accept."""
+    return reverse("diagnostics:image_thumbnail", args=[image.pk, size])
+
+
+@register.filter
+def srcset(image):
+    """Valor do atributo srcset com todos os tamanhos nomeados."""
+    return ", ".join(
+        f"{thumbnail_url(image, name)} {width}w"
+        for name, width in sorted(thumbnails.SIZES.items(), key=lambda kv: kv[1])
+    )
@@ -1,3 +1,1840 @@
-from django.test import TestCase
+import csv
+import gzip
+import io
+import json
+import os
+import runpy
+import shutil
+import subprocess
+import tempfile
+import time
+import unittest
+import uuid
+from datetime import datetime, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.staticfiles import finders
+from django.core import signing
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test.utils import CaptureQueriesContext
+from django.test import AsyncClient, AsyncRequestFactory, RequestFactory, TestCase, override_settings
+from django.urls import resolve, reverse
+from django.utils import timezone
+from PIL import Image, JpegImagePlugin
+
+from . import (
+    benchmarks, bulk, caching, export, imaging, jobs, media, mediagc, mediastore, metrics, pagination, queries,
+    resumable, rollups, search, seed, streaming, thumbnails, units, usage, video,
+)
+from .models import (
+    DiagnosticReport, ImageAttachment, MediaBlob, ProcessingJob, ReportDailyRollup, ReportMediaUsage,
+    UploadSession, VideoAttachment, blob_path,
+)
+
+UNTIL = timezone.make_aware(datetime(2026, 10, 18, 23, 59, 59))
+
+
+class MediaRootMixin:
+    """
+    MEDIA_ROOT temporário por classe, com o cache de miniaturas dentro dele
+    (DIAGNOSTICS_THUMBNAIL_CACHE_DIR vazio): blobs e derivados gerados não
+    vazam para o projeto.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_override = override_settings(MEDIA_ROOT=cls.media_root, DIAGNOSTICS_THUMBNAIL_CACHE_DIR="")
+        cls.media_override.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_override.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+
+class SeedTests(MediaRootMixin, TestCase):
+    def snapshot(self):
+        return list(
+            DiagnosticReport.objects.order_by("created_at", "id")
+            .values_list("title", "su_identifier", "category", "message", "created_at")
+        )
+
+    def test_same_seed_same_data(self):
+        seed.seed_reports(60, seed=7, until=UNTIL, batch_size=25)
+        first = self.snapshot()
+        bulk.delete_reports(DiagnosticReport.objects.all())
+        seed.seed_reports(60, seed=7, until=UNTIL, batch_size=25)
+        self.assertEqual(self.snapshot(), first)
+        self.assertEqual(len(first), 60)
+        self.assertTrue(all(created_at <= UNTIL for *_fields, created_at in first))
+
+    def test_ref_counts_and_rollups_are_consistent(self):
+        totals = seed.seed_reports(200, seed=3, until=UNTIL, image_ratio=0.5, video_ratio=0.2)
+        self.assertEqual(totals["reports"], 200)
+        self.assertEqual(ImageAttachment.objects.count(), totals["images"])
+        self.assertEqual(VideoAttachment.objects.count(), totals["videos"])
+        self.assertGreater(totals["images"], 0)
+        self.assertGreater(totals["videos"], 0)
+
+        for blob in MediaBlob.objects.annotate(n_images=Count("images"), n_videos=Count("videos")):
+            self.assertEqual(blob.ref_count, blob.n_images + blob.n_videos)
+
+        stored = sorted(ReportDailyRollup.objects.values_list("day", "su_identifier", "category", "count"))
+        rollups.rebuild()
+        rebuilt = sorted(ReportDailyRollup.objects.values_list("day", "su_identifier", "category", "count"))
+        self.assertEqual(stored, rebuilt)
+        self.assertEqual(sum(row[3] for row in stored), 200)
+
+
+class BulkDeleteTests(MediaRootMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        seed.seed_reports(120, seed=11, until=UNTIL, image_ratio=0.6, video_ratio=0.3, batch_size=50)
+
+    def snapshot(self, model, *fields):
+        return sorted(model.objects.values_list(*fields))
+
+    def test_delete_reports_keeps_derived_tables_consistent(self):
+        doomed = DiagnosticReport.objects.filter(category=DiagnosticReport.Category.NORMAL)
+        doomed_ids = list(doomed.values_list("pk", flat=True))
+        expected = len(doomed_ids)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(bulk.delete_reports(doomed), expected)
+
+        self.assertEqual(DiagnosticReport.objects.count(), 120 - expected)
+        for model in (ImageAttachment, VideoAttachment, ReportMediaUsage):
+            self.assertFalse(model.objects.filter(report_id__in=doomed_ids).exists())
+        # Sem blob órfão e ref_count = anexos que ainda usam o blob
+        for blob in MediaBlob.objects.annotate(n_images=Count("images"), n_videos=Count("videos")):
+            self.assertEqual(blob.ref_count, blob.n_images + blob.n_videos)
+            self.assertGreater(blob.ref_count, 0)
+
+        rollup_fields = ("day", "su_identifier", "category", "count")
+        usage_fields = ("report_id", "images", "videos", "bytes")
+        stored_rollups = self.snapshot(ReportDailyRollup, *rollup_fields)
+        stored_usage = self.snapshot(ReportMediaUsage, *usage_fields)
+        rollups.rebuild()
+        usage.rebuild()
+        self.assertEqual(stored_rollups, self.snapshot(ReportDailyRollup, *rollup_fields))
+        self.assertEqual(stored_usage, self.snapshot(ReportMediaUsage, *usage_fields))
+
+
+class ViewBudgetTests(MediaRootMixin, TestCase):
+    """Cada view/combinação de filtros dentro do orçamento de perf_budgets.json (base pequena, cache vazio)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed.seed_reports(300, seed=42, until=UNTIL, batch_size=100)
+
+    def test_every_case_has_a_budget(self):
+        budgets = benchmarks.load_budgets()["cases"]
+        cases = benchmarks.add_next_pages(self.client, benchmarks.build_cases())
+        self.assertEqual(sorted(set(cases) - set(budgets)), [])
+
+    def test_views_within_budget(self):
+        # Queries sempre; tempo (medido numa máquina de dev) só com DIAGNOSTICS_TEST_TIME_FACTOR,
+        # a folga sobre max_ms para a máquina que roda os testes (ex.: 3 num runner de CI)
+        factor = os.environ.get("DIAGNOSTICS_TEST_TIME_FACTOR")
+        suite = benchmarks.run_suite(runs=3, time_factor=float(factor) if factor else None)
+        self.assertGreater(len(suite["cases"]), 40)
+        for name, result in suite["cases"].items():
+            with self.subTest(case=name, path=result["path"]):
+                self.assertEqual(result["problems"], [])
+
+    def test_thumbnails_stay_in_test_media_root(self):
+        image = ImageAttachment.objects.order_by("-id").first()
+        response = self.client.get(reverse("diagnostics:image_thumbnail", args=[image.pk, "sm"]))
+        self.assertEqual(response.status_code, 200)
+        response.close()
+        self.assertTrue(str(thumbnails.cache_dir()).startswith(self.media_root))
+        self.assertTrue(any(thumbnails.cache_dir().iterdir()))
+
+    def test_compare_and_budgets_from(self):
+        previous = {"cases": {"home": {"median_ms": 10.0, "queries": 1}}}
+        current = {"cases": {
+            "home": {"median_ms": 15.0, "queries": 0},
+            "healthz": {"median_ms": 1.0, "queries": 1},
+        }}
+        self.assertEqual(benchmarks.compare(current, previous), [("home", 10.0, 15.0, 50.0, 1, 0)])
+        self.assertEqual(
+            benchmarks.budgets_from(current)["cases"]["home"], {"max_queries": 0, "max_ms": 95},
+        )
+        self.assertEqual(
+            benchmarks.check({"status": 200, "queries": 3, "median_ms": 5.0}, {"max_queries": 2, "max_ms": 100}),
+            ["3 queries (orçamento 2)"],
+        )
+        slow = {"status": 200, "queries": 1, "median_ms": 150.0}
+        self.assertEqual(benchmarks.check(slow, {"max_queries": 2, "max_ms": 100}), ["150.0 ms (orçamento 100 ms)"])
+        self.assertEqual(benchmarks.check(slow, {"max_queries": 2, "max_ms": 100}, time_factor=2), [])
+        self.assertEqual(benchmarks.check(slow, {"max_queries": 2, "max_ms": 100}, time_factor=None), [])
+
+
+@override_settings(DIAGNOSTICS_QUERY_BUDGET="raise")
+class QueryBudgetTests(MediaRootMixin, TestCase):
+    """Projeções/prefetch das views e o guarda de queries por view (metrics.QUERY_BUDGETS)."""
+
+    @classmethod
+    def setUpTestData(cls):
+        seed.seed_reports(40, seed=5, until=UNTIL, image_ratio=0.6, video_ratio=0.3)
+        cls.report = (
+            DiagnosticReport.objects.annotate(n=Count("images", distinct=True) + Count("videos", distinct=True))
+            .filter(images__isnull=False, videos__isnull=False).order_by("-n", "-id").first()
+        )
+        cls.report.message = "x" * (queries.EXCERPT_CHARS * 3)
+        cls.report.save()
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_rows_are_projected_with_media_counts(self):
+        rows = list(queries.report_rows(DiagnosticReport.objects.all()))
+        self.assertEqual(len(rows), 40)
+        for row in rows:
+            self.assertIn("message", row.get_deferred_fields())
+            self.assertEqual(row.image_count, ImageAttachment.objects.filter(report=row).count())
+            self.assertEqual(row.video_count, VideoAttachment.objects.filter(report=row).count())
+        row = next(r for r in rows if r.pk == self.report.pk)
+        self.assertEqual(len(row.excerpt), queries.EXCERPT_CHARS)
+
+    def test_list_badges_without_per_row_queries(self):
+        with self.assertNumQueries(metrics.QUERY_BUDGETS["diagnostics:list"]):
+            response = self.client.get(reverse("diagnostics:list"))
+        self.assertContains(response, 'title="Imagens"')
+        with self.assertNumQueries(metrics.QUERY_BUDGETS["diagnostics:list"]):
+            self.client.get(reverse("diagnostics:list"), {"q": "sensor", "order_by": "relevance"})
+
+    def test_detail_prefetches_media_in_order(self):
+        with self.assertNumQueries(metrics.QUERY_BUDGETS["diagnostics:detail"]):
+            response = self.client.get(reverse("diagnostics:detail", args=[self.report.pk]))
+        images = list(self.report.images.order_by("-created_at", "-id").values_list("pk", flat=True))
+        self.assertEqual([img.pk for img in response.context["media"].images], images)
+        self.assertEqual(len(response.context["media"].videos), self.report.videos.count())
+
+    def test_gallery_cache_hit_skips_media_queries(self):
+        url = reverse("diagnostics:detail", args=[self.report.pk])
+        with override_settings(DIAGNOSTICS_PAGE_CACHE_SECONDS=60):
+            self.client.get(url)
+            with self.assertNumQueries(1):
+                self.client.get(url)
+
+    def test_guard_raises_or_warns_over_budget(self):
+        url = reverse("diagnostics:list")
+        with mock.patch.dict(metrics.QUERY_BUDGETS, {"diagnostics:list": 1}):
+            with self.assertRaises(metrics.QueryBudgetExceeded):
+                self.client.get(url)
+            cache.clear()
+            with override_settings(DIAGNOSTICS_QUERY_BUDGET="warn"), self.assertLogs("diagnostics.query_budget"):
+                self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_perf_budgets_fit_view_budgets(self):
+        cases = benchmarks.add_next_pages(self.client, benchmarks.build_cases())
+        for name, budget in benchmarks.load_budgets()["cases"].items():
+            path = cases.get(name)
+            if path is None:
+                continue
+            view = resolve(path.split("?")[0]).view_name
+            with self.subTest(case=name, view=view):
+                self.assertIn(view, metrics.QUERY_BUDGETS)
+                self.assertLessEqual(budget["max_queries"], metrics.QUERY_BUDGETS[view])
+
+
+def report_data(**overrides):
+    return {
+        "title": "Sensor sem leitura", "su_identifier": "SU-AC-001", "user_name": "Ana",
+        "user_email": "ana@example.com", "message": "falha no sensor", "category": "normal", **overrides,
+    }
+
+
+@override_settings(DIAGNOSTICS_INGEST_TOKENS=["t0k"], DIAGNOSTICS_INGEST_MAX_BYTES=4096, DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+class IngestTests(TestCase):
+    url = "/diagnostics/api/reports/batch/"
+
+    def post(self, body, **headers):
+        return self.client.post(self.url, body, content_type="application/json", HTTP_AUTHORIZATION="Bearer t0k", **headers)
+
+    def test_body_above_data_upload_limit_is_accepted(self):
+        # ~2 KiB: acima do DATA_UPLOAD_MAX_MEMORY_SIZE, abaixo do limite da ingestão
+        items = [report_data(message="m" * 150) for _i in range(12)]
+        response = self.post(json.dumps(items))
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()["created"], 12)
+
+    def test_oversized_body_is_413(self):
+        response = self.post(json.dumps([report_data(message="m" * 5000)]))
+        self.assertEqual(response.status_code, 413)
+        self.assertIn("error", response.json())
+        self.assertFalse(DiagnosticReport.objects.exists())
+
+    def test_gzip_bomb_is_413(self):
+        body = gzip.compress(json.dumps([report_data(message=" " * 100_000)]).encode())
+        self.assertLess(len(body), 4096)
+        response = self.post(body, HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(DiagnosticReport.objects.exists())
+
+    def test_invalid_gzip_is_400(self):
+        response = self.post(b"not gzip", HTTP_CONTENT_ENCODING="gzip")
+        self.assertEqual(response.status_code, 400)
+
+    def test_load_reports_stop_on_error_keeps_invalid_batch_out(self):
+        lines = [report_data(title=f"r{i}") for i in range(3)] + [report_data(user_email="x"), report_data(title="r4")]
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl", delete=False) as fp:
+            fp.write("\n".join(json.dumps(line) for line in lines))
+        self.addCleanup(os.unlink, fp.name)
+        with self.assertRaises(CommandError):
+            call_command("load_reports", fp.name, batch_size=3, stop_on_error=True, stdout=StringIO(), stderr=StringIO())
+        # 1º lote (válido) gravado; o 2º, com o item inválido, inteiro fora
+        self.assertEqual(sorted(DiagnosticReport.objects.values_list("title", flat=True)), ["r0", "r1", "r2"])
+
+
+class AsgiStreamingTests(MediaRootMixin, TestCase):
+    """Exportação e mídia continuam em streaming (iterador assíncrono) quando servidas por ASGI."""
+
+    @classmethod
+    def setUpTestData(cls):
+        DiagnosticReport.objects.bulk_create([DiagnosticReport(**report_data(title=f"r{i}")) for i in range(450)])
+        cls.staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+
+    async def consume(self, response):
+        return b"".join([part async for part in response.streaming_content])
+
+    async def test_lines_are_pulled_one_chunk_at_a_time(self):
+        produced = []
+
+        def source():
+            for i in range(1000):
+                produced.append(i)
+                yield f"{i}\n"
+
+        body = streaming.lines(AsyncRequestFactory().get("/"), source(), per_chunk=100)
+        chunk = await anext(body)
+        self.assertEqual(chunk.count(b"\n"), 100)
+        self.assertEqual(len(produced), 100)
+
+    def test_wsgi_keeps_the_sync_iterator(self):
+        iterator = iter(["a"])
+        self.assertIs(streaming.lines(RequestFactory().get("/"), iterator), iterator)
+
+    async def test_export_streams_under_asgi(self):
+        client = AsyncClient()
+        await client.aforce_login(self.staff)
+        response = await client.get(reverse("diagnostics:export"), {"format": "jsonl"})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async)
+        body = await self.consume(response)
+        self.assertEqual(len(body.splitlines()), 450)
+
+    async def test_media_range_streams_under_asgi(self):
+        os.makedirs(os.path.join(self.media_root, "diagnostics"), exist_ok=True)
+        data = bytes(range(256)) * 1024
+        with open(os.path.join(self.media_root, "diagnostics", "v.mp4"), "wb") as fp:
+            fp.write(data)
+        client = AsyncClient()
+        response = await client.get("/media/diagnostics/v.mp4", headers={"range": "bytes=1000-199999"})
+        self.assertEqual(response.status_code, 206)
+        self.assertTrue(response.is_async)
+        self.assertEqual(await self.consume(response), data[1000:200000])
+        response = await client.get("/media/diagnostics/v.mp4")
+        self.assertEqual(await self.consume(response), data)
+
+
+MP4_HEAD = b"\x00\x00\x00\x18ftypmp42" + b"\x00" * 12
+
+
+class ResumableTests(MediaRootMixin, TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.partial_dir = tempfile.mkdtemp()
+        cls.partial_override = override_settings(DIAGNOSTICS_UPLOAD_PARTIAL_DIR=cls.partial_dir)
+        cls.partial_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.partial_override.disable()
+        shutil.rmtree(cls.partial_dir, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.report = DiagnosticReport.objects.create(**report_data())
+
+    def upload(self, data):
+        session = resumable.create_session("v.mp4", len(data), "video/mp4")
+        resumable.append_chunk(session, 0, io.BytesIO(data), len(data))
+        return session
+
+    @mock.patch("diagnostics.models.MAX_VIDEO_MB", 0.001)
+    def test_size_limits_per_path(self):
+        data = MP4_HEAD + b"\x01" * 4000
+        # POST único: teto MAX_VIDEO_MB (aqui ~1 KB)
+        va = VideoAttachment(report=self.report, file=SimpleUploadedFile("v.mp4", data, "video/mp4"))
+        with self.assertRaises(ValidationError):
+            va.full_clean()
+        # Upload retomável: teto próprio (DIAGNOSTICS_VIDEO_UPLOAD_MAX_MB)
+        session = self.upload(data)
+        self.assertEqual(len(resumable.finish(self.report, [session.pk])), 1)
+        with override_settings(DIAGNOSTICS_VIDEO_UPLOAD_MAX_MB=0):
+            with self.assertRaises(resumable.UploadError) as ctx:
+                resumable.create_session("v.mp4", len(data), "video/mp4")
+        self.assertEqual(ctx.exception.status, 413)
+
+    def append(self, session, offset, data, length=None):
+        with self.assertRaises(resumable.UploadError) as ctx:
+            resumable.append_chunk(session, offset, io.BytesIO(data), len(data) if length is None else length)
+        return ctx.exception
+
+    def test_out_of_order_and_repeated_chunks_get_409_with_the_current_offset(self):
+        data = MP4_HEAD + b"\x01" * 40
+        session = resumable.create_session("v.mp4", len(data), "video/mp4")
+        error = self.append(session, 20, data[20:])
+        self.assertEqual((error.status, error.offset), (409, 0))
+        self.assertEqual(resumable.append_chunk(session, 0, io.BytesIO(data[:20]), 20), 20)
+        error = self.append(session, 0, data[:20])
+        self.assertEqual((error.status, error.offset), (409, 20))
+
+        # Outro request avançou a sessão depois desta ser lida: o UPDATE condicional recusa
+        stale = UploadSession.objects.get(pk=session.pk)
+        resumable.append_chunk(session, 20, io.BytesIO(data[20:30]), 10)
+        error = self.append(stale, 20, data[20:30])
+        self.assertEqual((error.status, error.offset), (409, 30))
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).offset, 30)
+
+    def test_chunk_limits(self):
+        data = MP4_HEAD + b"\x01" * 40
+        session = resumable.create_session("v.mp4", len(data), "video/mp4")
+        self.assertEqual(self.append(session, 0, data + b"x").status, 400)
+        with mock.patch.object(resumable, "chunk_max_bytes", return_value=16):
+            self.assertEqual(self.append(session, 0, data[:17]).status, 413)
+        self.assertEqual(UploadSession.objects.get(pk=session.pk).offset, 0)
+
+    def test_non_video_first_chunk_drops_the_session(self):
+        session = resumable.create_session("v.mp4", 100, "video/mp4")
+        pk, path = session.pk, session.path
+        self.assertEqual(self.append(session, 0, b"MZ" + b"\x00" * 98).status, 415)
+        self.assertFalse(UploadSession.objects.filter(pk=pk).exists())
+        self.assertFalse(os.path.exists(path))
+        with self.assertRaises(resumable.UploadError) as ctx:
+            resumable.create_session("v.exe", 100, "application/octet-stream")
+        self.assertEqual(ctx.exception.status, 415)
+
+    def test_interrupted_chunk_keeps_what_arrived(self):
+        data = MP4_HEAD + b"\x01" * 40
+        session = resumable.create_session("v.mp4", len(data), "video/mp4")
+        error = self.append(session, 0, data[:25], length=len(data))
+        self.assertEqual((error.status, error.offset), (400, 25))
+        self.assertEqual(resumable.append_chunk(session, 25, io.BytesIO(data[25:]), len(data) - 25), len(data))
+        with open(session.path, "rb") as fp:
+            self.assertEqual(fp.read(), data)
+
+    def test_protocol_views(self):
+        data = MP4_HEAD + b"\x01" * 40
+        response = self.client.post(
+            reverse("diagnostics:upload_create"),
+            json.dumps({"filename": "v.mp4", "size": len(data), "content_type": "video/mp4"}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 201)
+        url = response["Location"]
+
+        def patch(offset, chunk):
+            return self.client.generic(
+                "PATCH", url, chunk, content_type="application/offset+octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+            )
+
+        self.assertEqual(patch(0, data[:20])["Upload-Offset"], "20")
+        response = patch(0, data[:20])
+        self.assertEqual((response.status_code, response["Upload-Offset"]), (409, "20"))
+        response = self.client.head(url)
+        self.assertEqual((response.status_code, response["Upload-Offset"], response["Upload-Length"]),
+                         (200, "20", str(len(data))))
+        self.assertEqual(patch(20, data[20:]).status_code, 204)
+
+        session = UploadSession.objects.get()
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(os.path.exists(session.path))
+        self.assertEqual(self.client.head(url).status_code, 404)
+
+    def test_finish_only_takes_complete_active_sessions(self):
+        data = MP4_HEAD + b"\x01" * 40
+        complete = self.upload(data)
+        partial = resumable.create_session("p.mp4", len(data), "video/mp4")
+        resumable.append_chunk(partial, 0, io.BytesIO(data[:20]), 20)
+        expired = self.upload(data + b"\x02")
+        UploadSession.objects.filter(pk=expired.pk).update(expires_at=timezone.now())
+
+        created = resumable.finish(self.report, ["lixo", str(uuid.uuid4()), partial.pk, expired.pk, complete.pk])
+        self.assertEqual(len(created), 1)
+        self.assertEqual(created[0].report, self.report)
+        with created[0].file.open("rb") as fp:
+            self.assertEqual(fp.read(), data)
+        # O arquivo parcial foi movido para o anexo e a sessão encerrada
+        self.assertFalse(os.path.exists(complete.path))
+        self.assertEqual(set(UploadSession.objects.values_list("pk", flat=True)), {partial.pk, expired.pk})
+
+    def test_finish_attaches_each_session_once(self):
+        session = self.upload(MP4_HEAD + b"\x01" * 40)
+        # Segundo POST com o mesmo id, que leu a sessão antes de o primeiro terminar
+        seen = list(resumable.active_sessions().filter(pk=session.pk))
+        self.assertEqual(len(resumable.finish(self.report, [session.pk])), 1)
+        with mock.patch.object(resumable, "active_sessions") as active:
+            active.return_value.filter.return_value = seen
+            self.assertEqual(resumable.finish(self.report, [session.pk]), [])
+        self.assertEqual(VideoAttachment.objects.count(), 1)
+
+    def test_failed_finish_gives_the_session_back(self):
+        session = self.upload(MP4_HEAD + b"\x01" * 40)
+        with mock.patch.object(VideoAttachment, "save", side_effect=RuntimeError("disco cheio")):
+            with self.assertRaises(RuntimeError):
+                resumable.finish(self.report, [session.pk])
+        self.assertTrue(resumable.active_sessions().filter(pk=session.pk).exists())
+        self.assertEqual(len(resumable.finish(self.report, [session.pk])), 1)
+
+
+class SearchIndexTests(TestCase):
+    """Índice FTS5 sincronizado pelos triggers e ordenado por BM25 com os pesos por coluna."""
+
+    def found(self, query):
+        return list(search.search_reports(DiagnosticReport.objects.all(), query).order_by("-search_rank", "-id")
+                    .values_list("title", flat=True))
+
+    def test_triggers_follow_insert_update_and_delete(self):
+        report = DiagnosticReport.objects.create(**report_data(title="Anemômetro travado", message="sem giro"))
+        self.assertEqual(self.found("anemometro"), ["Anemômetro travado"])
+
+        report.title = "Pluviômetro entupido"
+        report.save()
+        self.assertEqual(self.found("anemometro"), [])
+        self.assertEqual(self.found("pluviometro"), ["Pluviômetro entupido"])
+
+        DiagnosticReport.objects.filter(pk=report.pk).update(message="gateway sem sinal")
+        self.assertEqual(self.found("gateway"), ["Pluviômetro entupido"])
+        self.assertEqual(self.found("giro"), [])
+
+        report.delete()
+        self.assertEqual(self.found("pluviometro"), [])
+
+    def test_bulk_insert_and_bulk_delete_are_indexed(self):
+        DiagnosticReport.objects.bulk_create([DiagnosticReport(**report_data(title=f"datalogger {i}")) for i in range(5)])
+        self.assertEqual(len(self.found("datalogger")), 5)
+        bulk.delete_reports(DiagnosticReport.objects.filter(title__in=["datalogger 0", "datalogger 1"]))
+        self.assertEqual(sorted(self.found("datalogger")), ["datalogger 2", "datalogger 3", "datalogger 4"])
+
+    def test_bm25_ranks_title_over_message_and_all_terms_required(self):
+        DiagnosticReport.objects.create(**report_data(title="Bateria fraca", message="painel sujo"))
+        DiagnosticReport.objects.create(**report_data(title="Painel solar quebrado", message="bateria ok"))
+        DiagnosticReport.objects.create(**report_data(title="Outro", message="nada a ver com bateria"))
+        ranked = self.found("bateria")
+        self.assertEqual(len(ranked), 3)
+        self.assertEqual(ranked[0], "Bateria fraca")
+        self.assertEqual(self.found("painel")[0], "Painel solar quebrado")
+        # Todos os termos, com prefixo no último caractere de cada um
+        self.assertEqual(sorted(self.found("bat pain")), ["Bateria fraca", "Painel solar quebrado"])
+        self.assertEqual(self.found('bateria "quebrado'), ["Painel solar quebrado"])
+
+
+class CursorPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # 25 relatórios, de 5 em 5 com o mesmo created_at: o desempate é o id
+        same = [timezone.make_aware(datetime(2026, 10, day, 12)) for day in range(1, 6)]
+        reports = DiagnosticReport.objects.bulk_create(
+            [DiagnosticReport(**report_data(title=f"r{i:02d}")) for i in range(25)]
+        )
+        for i, report in enumerate(reports):
+            report.created_at = same[i // 5]
+        DiagnosticReport.objects.bulk_update(reports, ["created_at"])
+        cls.expected = list(DiagnosticReport.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+
+    def walk(self, order_by="-created_at", per_page=10):
+        pages, cursor = [], None
+        while True:
+            page = pagination.paginate(DiagnosticReport.objects.all(), order_by, cursor, per_page=per_page)
+            pages.append(page)
+            if not page.has_next:
+                return pages
+            cursor = page.next_cursor
+
+    def test_walks_every_row_once_across_ties(self):
+        for per_page in (10, 5, 25, 7):
+            with self.subTest(per_page=per_page):
+                pages = self.walk(per_page=per_page)
+                self.assertEqual([r.pk for p in pages for r in p.object_list], self.expected)
+                self.assertFalse(pages[0].has_previous)
+                self.assertFalse(pages[-1].has_next)
+                self.assertTrue(all(p.object_list for p in pages))
+
+    def test_previous_returns_the_same_page(self):
+        first, second, _third = self.walk()
+        back = pagination.paginate(DiagnosticReport.objects.all(), "-created_at", second.previous_cursor, per_page=10)
+        self.assertEqual([r.pk for r in back.object_list], [r.pk for r in first.object_list])
+        self.assertTrue(back.has_next)
+        self.assertFalse(back.has_previous)
+
+    def test_tampered_forged_or_foreign_cursors_fall_back_to_first_page(self):
+        second_cursor = self.walk()[0].next_cursor
+        forged = signing.dumps(["-created_at", "2099-01-01T00:00:00", 1, "next"], salt="outro-salt", compress=True)
+        for cursor in (second_cursor[:-2] + "xx", forged, "lixo", second_cursor.swapcase()):
+            with self.subTest(cursor=cursor):
+                page = pagination.paginate(DiagnosticReport.objects.all(), "-created_at", cursor, per_page=10)
+                self.assertEqual([r.pk for r in page.object_list], self.expected[:10])
+                self.assertFalse(page.has_previous)
+        with self.assertRaises(pagination.InvalidCursor):
+            pagination.decode_cursor(second_cursor, "title")
+        page = pagination.paginate(DiagnosticReport.objects.all(), "title", second_cursor, per_page=10)
+        self.assertEqual(page.object_list[0].title, "r00")
+
+    def test_list_view_ignores_a_bad_cursor(self):
+        response = self.client.get(reverse("diagnostics:list"), {"cursor": "nao-assinado"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r.pk for r in response.context["page_obj"].object_list], self.expected[:10])
+
+
+class MediaServeTests(MediaRootMixin, TestCase):
+    data = bytes(range(256)) * 40  # 10240 bytes
+
+    def setUp(self):
+        os.makedirs(os.path.join(self.media_root, "diagnostics"), exist_ok=True)
+        with open(os.path.join(self.media_root, "diagnostics", "v.mp4"), "wb") as fp:
+            fp.write(self.data)
+        self.url = "/media/diagnostics/v.mp4"
+
+    def get(self, path=None, **headers):
+        response = self.client.get(path or self.url, headers=headers)
+        body = b"".join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_parse_range(self):
+        self.assertIsNone(media.parse_range("", 100))
+        self.assertIsNone(media.parse_range("bytes=-", 100))
+        self.assertIsNone(media.parse_range("bytes=0-1,5-6", 100))
+        self.assertIsNone(media.parse_range("items=0-1", 100))
+        self.assertEqual(media.parse_range("bytes=0-0", 100), (0, 0))
+        self.assertEqual(media.parse_range("bytes=10-", 100), (10, 99))
+        self.assertEqual(media.parse_range("bytes=90-500", 100), (90, 99))
+        self.assertEqual(media.parse_range("bytes=-30", 100), (70, 99))
+        self.assertEqual(media.parse_range("bytes=-500", 100), (0, 99))
+        for header in ("bytes=100-", "bytes=5-4", "bytes=-0"):
+            with self.subTest(header=header), self.assertRaises(ValueError):
+                media.parse_range(header, 100)
+
+    def test_full_and_partial_responses(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.data))
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(response["Content-Length"], str(len(self.data)))
+
+        response, body = self.get(range="bytes=100-199")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.data[100:200])
+        self.assertEqual(response["Content-Range"], f"bytes 100-199/{len(self.data)}")
+        self.assertEqual(response["Content-Length"], "100")
+
+        response, body = self.get(range="bytes=-16")
+        self.assertEqual((response.status_code, body), (206, self.data[-16:]))
+
+        response, body = self.get(range="bytes=0-1,4-5")
+        self.assertEqual((response.status_code, body), (200, self.data))
+
+    def test_unsatisfiable_range_is_416(self):
+        response, _body = self.get(range=f"bytes={len(self.data)}-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.data)}")
+
+    def test_if_range_and_conditional_get(self):
+        etag = self.get()[0]["ETag"]
+        response, body = self.get(range="bytes=0-9", if_range=etag)
+        self.assertEqual((response.status_code, body), (206, self.data[:10]))
+        # Validador antigo ou fraco: o arquivo inteiro
+        for stale in ('"outro"', "W/" + etag):
+            response, body = self.get(range="bytes=0-9", if_range=stale)
+            self.assertEqual((response.status_code, body), (200, self.data))
+        self.assertEqual(self.get(if_none_match=etag)[0].status_code, 304)
+
+    def test_head_has_headers_without_body(self):
+        response = self.client.head(self.url, headers={"range": "bytes=0-9"})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(response.content, b"")
+
+    def test_path_traversal_and_non_files_are_404(self):
+        # Arquivo real ao lado do MEDIA_ROOT: alcançável só com "../"
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(self.media_root), suffix=".txt", delete=False) as fp:
+            fp.write(b"segredo")
+        self.addCleanup(os.unlink, fp.name)
+        name = os.path.basename(fp.name)
+        for path in (
+            f"/media/../{name}",
+            f"/media/%2e%2e/{name}",
+            f"/media/diagnostics/..%2f..%2f{name}",
+            f"/media/{fp.name}",
+            "/media//etc/passwd",
+            "/media/diagnostics/",
+            "/media/diagnostics/nao-existe.mp4",
+        ):
+            with self.subTest(path=path):
+                self.assertEqual(self.client.get(path).status_code, 404)
+
+    @override_settings(DIAGNOSTICS_MEDIA_SERVE="x-accel-redirect", DIAGNOSTICS_MEDIA_ACCEL_PREFIX="/protegido/")
+    def test_x_accel_redirect_leaves_the_body_to_the_proxy(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protegido/diagnostics/v.mp4")
+        self.assertEqual(response.content, b"")
+
+
+def png_upload(color, name="foto.png"):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 48), color).save(buf, "PNG")
+    return SimpleUploadedFile(name, buf.getvalue(), "image/png")
+
+
+class MediaBlobTests(MediaRootMixin, TestCase):
+    """Deduplicação por conteúdo: acquire/release mantêm ref_count e os arquivos."""
+
+    def setUp(self):
+        self.reports = [DiagnosticReport.objects.create(**report_data(title=f"r{i}")) for i in range(2)]
+
+    def test_same_content_shares_one_blob_until_the_last_reference(self):
+        with mock.patch("diagnostics.imaging.encode_variants", wraps=imaging.encode_variants) as encode:
+            first = ImageAttachment.create_batch(self.reports[0], [png_upload("red"), png_upload("red", "copia.png")])
+            second = ImageAttachment.create_batch(self.reports[1], [png_upload("red")])
+        attachments = first + second
+        # Um só conteúdo distinto: codificado uma vez, os outros anexos só ganham referência
+        self.assertEqual(encode.call_count, 1)
+        self.assertEqual(MediaBlob.objects.count(), 1)
+        blob = MediaBlob.objects.get()
+        self.assertEqual(blob.ref_count, 3)
+        self.assertTrue(all(att.blob_id == blob.pk and att.file.name == blob.file.name for att in attachments))
+        names = blob.file_names()
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            attachments[0].delete()
+            attachments[1].delete()
+        blob.refresh_from_db()
+        self.assertEqual(blob.ref_count, 1)
+        self.assertTrue(all(default_storage.exists(name) for name in names))
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            attachments[2].delete()
+            # Ainda dentro da transação: os arquivos só saem depois do commit
+            self.assertTrue(all(default_storage.exists(name) for name in names))
+        self.assertEqual(len(callbacks), 1)
+        self.assertFalse(MediaBlob.objects.exists())
+        self.assertFalse(any(default_storage.exists(name) for name in names))
+
+    def test_different_content_gets_its_own_blob(self):
+        ImageAttachment.create_batch(self.reports[0], [png_upload("red"), png_upload("blue")])
+        self.assertEqual(sorted(MediaBlob.objects.values_list("ref_count", flat=True)), [1, 1])
+
+    def test_acquire_race_reuses_the_winner_and_drops_its_own_file(self):
+        sha = "ab" * 32
+        winner = default_storage.save(blob_path("video", sha, ".mp4"), ContentFile(b"winner"))
+
+        def write():
+            # Outro request grava o mesmo conteúdo entre o SELECT e o INSERT deste
+            MediaBlob.objects.create(kind=MediaBlob.Kind.VIDEO, sha256=sha, file=winner, size=6)
+            return default_storage.save(blob_path("video", sha, ".mp4"), ContentFile(b"loser"))
+
+        blob, created = MediaBlob.acquire(MediaBlob.Kind.VIDEO, sha, write)
+        self.assertFalse(created)
+        self.assertEqual((blob.file.name, blob.ref_count), (winner, 1))
+        self.assertEqual(MediaBlob.objects.get().ref_count, 1)
+        leftovers = os.listdir(os.path.dirname(default_storage.path(winner)))
+        self.assertEqual(leftovers, [os.path.basename(winner)])
+
+    def test_release_never_goes_negative_and_release_many_deletes_orphans(self):
+        make = lambda sha, refs: MediaBlob.objects.create(  # noqa: E731
+            kind=MediaBlob.Kind.VIDEO, sha256=sha, file=f"diagnostics/blobs/videos/{sha[:2]}/{sha}.mp4", ref_count=refs,
+        )
+        a, b = make("aa" * 32, 3), make("bb" * 32, 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(MediaBlob.release_many({a.pk: 2, b.pk: 5}), 1)
+        a.refresh_from_db()
+        self.assertEqual(a.ref_count, 1)
+        self.assertFalse(MediaBlob.objects.filter(pk=b.pk).exists())
+        with self.captureOnCommitCallbacks(execute=True):
+            MediaBlob.release(a.pk)
+            MediaBlob.release(a.pk)
+        self.assertFalse(MediaBlob.objects.filter(pk=a.pk).exists())
+
+
+def atom(kind, payload=b""):
+    return (8 + len(payload)).to_bytes(4, "big") + kind + payload
+
+
+def probe_info(vcodec="h264", acodec="aac", width=1280, height=720, bit_rate=1_000_000):
+    streams = [{"codec_type": "video", "codec_name": vcodec, "pix_fmt": "yuv420p", "width": width, "height": height}]
+    if acodec:
+        streams.append({"codec_type": "audio", "codec_name": acodec})
+    return {"format": {"bit_rate": str(bit_rate)}, "streams": streams}
+
+
+class VideoPlanTests(TestCase):
+    """Decisão keep/remux/transcode a partir do ffprobe e do layout do arquivo."""
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+        self.faststart = self.write("fast.mp4", atom(b"ftyp", b"isom") + atom(b"moov") + atom(b"mdat", b"x" * 16))
+        self.tail_moov = self.write("tail.mp4", atom(b"ftyp", b"isom") + atom(b"mdat", b"x" * 16) + atom(b"moov"))
+
+    def write(self, name, data):
+        path = os.path.join(self.dir, name)
+        with open(path, "wb") as fp:
+            fp.write(data)
+        return path
+
+    def test_playable_faststart_mp4_is_kept(self):
+        self.assertEqual(video.plan(self.faststart, probe_info()), MediaBlob.Decision.KEEP)
+        self.assertEqual(video.plan(self.faststart, probe_info(acodec=None)), MediaBlob.Decision.KEEP)
+
+    def test_playable_streams_in_the_wrong_layout_are_remuxed(self):
+        mov = self.write("clip.mov", open(self.faststart, "rb").read())
+        self.assertEqual(video.plan(self.tail_moov, probe_info()), MediaBlob.Decision.REMUX)
+        self.assertEqual(video.plan(mov, probe_info()), MediaBlob.Decision.REMUX)
+
+    @override_settings(DIAGNOSTICS_VIDEO_MAX_DIMENSION=1280, DIAGNOSTICS_VIDEO_MAX_BITRATE=2_000_000)
+    def test_unplayable_or_oversized_video_is_transcoded(self):
+        for info in (
+            None,
+            probe_info(vcodec="hevc"),
+            probe_info(acodec="opus"),
+            probe_info(width=1920, height=1080),
+            probe_info(height=1920, width=1080),
+            probe_info(bit_rate=3_000_000),
+        ):
+            with self.subTest(info=info):
+                self.assertEqual(video.plan(self.faststart, info), MediaBlob.Decision.TRANSCODE)
+
+
+class VideoProcessingTests(MediaRootMixin, TestCase):
+    """process_video_blob fica sempre com o menor arquivo tocável."""
+
+    ORIGINAL = atom(b"ftyp", b"isom") + atom(b"moov") + atom(b"mdat", b"x" * 1000)
+
+    def setUp(self):
+        self.report = DiagnosticReport.objects.create(**report_data())
+        self.attachment = VideoAttachment(report=self.report, file=SimpleUploadedFile("v.mp4", self.ORIGINAL, "video/mp4"))
+        self.attachment.save()
+        self.blob = self.attachment.blob
+
+    def process(self, output_size):
+        def fake_transcode(in_path, out_path, timeout=None, copy_audio=False):
+            with open(out_path, "wb") as fp:
+                fp.write(b"y" * output_size)
+
+        with mock.patch.object(video, "probe", return_value=probe_info(bit_rate=10_000_000)), \
+                mock.patch.object(video, "transcode", side_effect=fake_transcode), \
+                mock.patch.object(video, "build_previews", return_value={}):
+            video.process_video_blob(self.blob.pk)
+        self.blob.refresh_from_db()
+        self.attachment.refresh_from_db()
+
+    def test_enqueues_one_job_per_new_blob(self):
+        VideoAttachment(report=self.report, file=SimpleUploadedFile("copia.mp4", self.ORIGINAL, "video/mp4")).save()
+        self.assertEqual(
+            list(ProcessingJob.objects.values_list("kind", "object_id")),
+            [(ProcessingJob.Kind.VIDEO_TRANSCODE, self.blob.pk)],
+        )
+
+    def test_smaller_transcode_replaces_the_original(self):
+        original = self.blob.file.path
+        self.process(output_size=100)
+        self.assertEqual(self.blob.decision, MediaBlob.Decision.TRANSCODE)
+        self.assertEqual(self.blob.bytes_saved, len(self.ORIGINAL) - 100)
+        self.assertEqual(self.blob.size, 100)
+        self.assertTrue(self.blob.file.name.endswith("-cmp.mp4"))
+        self.assertEqual((self.attachment.file.name, self.attachment.status), (self.blob.file.name, MediaBlob.Status.DONE))
+        self.assertFalse(os.path.exists(original))
+        self.assertEqual(ReportMediaUsage.objects.get(report=self.report).bytes, 100)
+
+    def test_larger_transcode_of_a_playable_video_keeps_the_original(self):
+        name = self.blob.file.name
+        self.process(output_size=len(self.ORIGINAL) + 1)
+        self.assertEqual((self.blob.decision, self.blob.bytes_saved), (MediaBlob.Decision.KEEP, 0))
+        self.assertEqual((self.blob.file.name, self.blob.status), (name, MediaBlob.Status.DONE))
+        self.assertTrue(os.path.exists(self.blob.file.path))
+        self.assertFalse([f for f in os.listdir(os.path.dirname(self.blob.file.path)) if f.endswith("-cmp.mp4")])
+
+
+class JobQueueTests(TestCase):
+    """Fila de jobs: reserva exclusiva, novas tentativas com backoff e jobs presos."""
+
+    def enqueue(self, **kwargs):
+        return ProcessingJob.enqueue(ProcessingJob.Kind.VIDEO_TRANSCODE, 42, **kwargs)
+
+    def test_claim_takes_due_jobs_once(self):
+        later = self.enqueue(run_after=timezone.now() + timedelta(minutes=5))
+        due = self.enqueue()
+        job = jobs.claim_next("w1")
+        self.assertEqual(job.pk, due.pk)
+        self.assertEqual((job.status, job.locked_by, job.attempts), (ProcessingJob.Status.PROCESSING, "w1", 1))
+        self.assertIsNotNone(job.started_at)
+        # Já reservado pelo w1 e o outro ainda não venceu
+        self.assertIsNone(jobs.claim_next("w2"))
+        later.refresh_from_db()
+        self.assertEqual(later.status, ProcessingJob.Status.PENDING)
+
+    def test_claim_skips_a_job_taken_between_select_and_update(self):
+        first, second = self.enqueue(), self.enqueue()
+        real_filter = ProcessingJob.objects.filter
+
+        def filter_after_race(*args, **kwargs):
+            if kwargs.get("pk") == first.pk:
+                # Outro worker reservou `first` depois do SELECT dos candidatos
+                real_filter(pk=first.pk).update(status=ProcessingJob.Status.PROCESSING, locked_by="w0")
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(ProcessingJob.objects, "filter", side_effect=filter_after_race):
+            job = jobs.claim_next("w1")
+        self.assertEqual(job.pk, second.pk)
+        first.refresh_from_db()
+        self.assertEqual((first.locked_by, first.attempts), ("w0", 0))
+
+    def run_failing(self, job):
+        with mock.patch("diagnostics.video.process_video_blob", side_effect=RuntimeError("boom")), \
+                mock.patch("diagnostics.video.mark_blob_failed") as mark_failed, \
+                self.assertLogs("diagnostics.jobs", "WARNING"):
+            jobs.run_job(job)
+        job.refresh_from_db()
+        return mark_failed
+
+    def test_failure_is_retried_with_backoff_until_max_attempts(self):
+        self.enqueue(max_attempts=2)
+        job = jobs.claim_next("w1")
+        before = timezone.now()
+        mark_failed = self.run_failing(job)
+        self.assertEqual((job.status, job.locked_by), (ProcessingJob.Status.PENDING, ""))
+        self.assertIn("RuntimeError: boom", job.last_error)
+        self.assertGreaterEqual(job.run_after, before + timedelta(seconds=jobs.RETRY_BACKOFF_SECONDS))
+        mark_failed.assert_not_called()
+
+        ProcessingJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        job = jobs.claim_next("w1")
+        self.assertEqual(job.attempts, 2)
+        mark_failed = self.run_failing(job)
+        self.assertEqual(job.status, ProcessingJob.Status.FAILED)
+        mark_failed.assert_called_once_with(42)
+        self.assertIsNone(jobs.claim_next("w1"))
+
+    def test_success_clears_the_error(self):
+        self.enqueue()
+        ProcessingJob.objects.update(last_error="antes")
+        job = jobs.claim_next("w1")
+        with mock.patch("diagnostics.video.process_video_blob") as handler:
+            jobs.run_job(job)
+        handler.assert_called_once_with(42)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.last_error, job.locked_by), (ProcessingJob.Status.DONE, "", ""))
+        self.assertIsNotNone(job.duration_ms)
+
+    @override_settings(DIAGNOSTICS_TRANSCODE_TIMEOUT=60)
+    def test_requeue_stale_only_returns_jobs_past_twice_the_timeout(self):
+        stale, busy = self.enqueue(), self.enqueue()
+        now = timezone.now()
+        ProcessingJob.objects.filter(pk=stale.pk).update(
+            status=ProcessingJob.Status.PROCESSING, locked_by="morto", started_at=now - timedelta(seconds=121),
+        )
+        ProcessingJob.objects.filter(pk=busy.pk).update(
+            status=ProcessingJob.Status.PROCESSING, locked_by="vivo", started_at=now - timedelta(seconds=60),
+        )
+        self.assertEqual(jobs.requeue_stale(), 1)
+        stale.refresh_from_db()
+        busy.refresh_from_db()
+        self.assertEqual((stale.status, stale.locked_by), (ProcessingJob.Status.PENDING, ""))
+        self.assertEqual((busy.status, busy.locked_by), (ProcessingJob.Status.PROCESSING, "vivo"))
+        self.assertEqual(jobs.claim_next("w1").pk, stale.pk)
+
+
+class DatabaseConfigTests(TestCase):
+    """DATABASES montado pelas variáveis de ambiente, health check e conexões do worker."""
+
+    def load_databases(self, **env):
+        base = {key: value for key, value in os.environ.items() if not key.startswith(("DATABASE_URL", "DB_"))}
+        with mock.patch.dict(os.environ, {**base, **env}, clear=True):
+            return runpy.run_path(os.path.join(settings.BASE_DIR, "app", "settings.py"))["DATABASES"]["default"]
+
+    def test_sqlite_defaults(self):
+        db = self.load_databases()
+        self.assertEqual(db["ENGINE"], "django.db.backends.sqlite3")
+        self.assertEqual((db["CONN_MAX_AGE"], db["CONN_HEALTH_CHECKS"]), (60, True))
+        self.assertEqual(db["OPTIONS"]["transaction_mode"], "IMMEDIATE")
+        self.assertIn("journal_mode=WAL", db["OPTIONS"]["init_command"])
+
+    def test_postgres_pool_replaces_persistent_connections(self):
+        url = "postgres://u:p@db:5432/diag"
+        db = self.load_databases(DATABASE_URL=url, DB_CONN_MAX_AGE="120")
+        self.assertEqual((db["ENGINE"], db["CONN_MAX_AGE"]), ("django.db.backends.postgresql", 120))
+        self.assertNotIn("pool", db.get("OPTIONS", {}))
+        self.assertFalse(db["DISABLE_SERVER_SIDE_CURSORS"])
+
+        db = self.load_databases(
+            DATABASE_URL=url, DB_POOL="true", DB_POOL_MAX_SIZE="4", DB_DISABLE_SERVER_SIDE_CURSORS="true",
+        )
+        self.assertEqual(db["CONN_MAX_AGE"], 0)
+        self.assertEqual(db["OPTIONS"]["pool"], {"min_size": 2, "max_size": 4, "timeout": 10})
+        self.assertTrue(db["DISABLE_SERVER_SIDE_CURSORS"])
+
+    def test_healthz(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("healthz"))
+        self.assertEqual((response.status_code, response.content), (200, b"ok"))
+        with mock.patch("diagnostics.views.connection.cursor", side_effect=DatabaseError("down")):
+            response = self.client.get(reverse("healthz"))
+        self.assertEqual(response.status_code, 503)
+
+    def test_worker_threads_close_their_connections_even_on_error(self):
+        with mock.patch.object(jobs, "close_old_connections") as close, \
+                mock.patch.object(jobs, "run_job", side_effect=RuntimeError("boom")):
+            with self.assertRaises(RuntimeError):
+                jobs.run_claimed(object())
+        self.assertEqual(close.call_count, 2)
+
+
+class MediaGcTests(TestCase):
+    """gc_media apaga só o que ninguém referencia; remoções de arquivo esperam o commit."""
+
+    OLD = 2 * mediagc.DEFAULT_MIN_AGE
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.enterContext(override_settings(MEDIA_ROOT=self.media_root, DIAGNOSTICS_THUMBNAIL_CACHE_DIR=""))
+        self.report = DiagnosticReport.objects.create(**report_data())
+
+    def put(self, name, age=OLD, data=b"x" * 10):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as fp:
+            fp.write(data)
+        then = time.time() - age
+        os.utime(path, (then, then))
+        return name
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_collect_removes_old_orphans_only(self):
+        sha = "cd" * 32
+        blob = MediaBlob.objects.create(
+            kind=MediaBlob.Kind.VIDEO, sha256=sha, ref_count=1,
+            file=self.put(f"diagnostics/blobs/videos/cd/{sha}.mp4"),
+            poster=self.put(f"diagnostics/blobs/videos/cd/{sha}-poster.jpg"),
+        )
+        legacy = VideoAttachment(report=self.report, file=self.put("diagnostics/videos/antigo.mp4"))
+        legacy.save()
+        orphans = [
+            self.put(f"diagnostics/blobs/videos/cd/{sha}-cmp.mp4", data=b"y" * 7),
+            self.put("diagnostics/images/2020/01/solta.webp"),
+        ]
+        fresh = self.put("diagnostics/blobs/videos/ef/upload-em-andamento.mp4", age=0)
+        kept = [blob.file.name, blob.poster.name, legacy.file.name, fresh]
+
+        seen = []
+        stats = mediagc.collect(dry_run=True, on_orphan=lambda name, size: seen.append(name))
+        self.assertEqual(sorted(seen), sorted(orphans))
+        self.assertEqual(stats, {"files": 2, "bytes": 17, "dirs": 0})
+        self.assertTrue(all(self.exists(name) for name in orphans))
+
+        stats = mediagc.collect()
+        self.assertEqual((stats["files"], stats["bytes"]), (2, 17))
+        self.assertFalse(any(self.exists(name) for name in orphans))
+        self.assertTrue(all(self.exists(name) for name in kept))
+        # images/2020/01 ficou vazio pelo próprio GC, e com ele images/2020 e images
+        self.assertEqual(stats["dirs"], 3)
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, "diagnostics/images")))
+        self.assertEqual(mediagc.collect()["files"], 0)
+
+    def test_remove_empty_dirs_respects_min_age(self):
+        root = os.path.join(self.media_root, "diagnostics")
+        old, new = os.path.join(root, "velho", "sub"), os.path.join(root, "novo")
+        os.makedirs(old)
+        os.makedirs(new)
+        then = time.time() - self.OLD
+        os.utime(old, (then, then))
+        # "sub" e, esvaziado por ele, "velho"; "novo" pode estar prestes a receber um arquivo
+        self.assertEqual(mediagc.remove_empty_dirs(root), 2)
+        self.assertFalse(os.path.exists(os.path.join(root, "velho")))
+        self.assertTrue(os.path.isdir(new))
+        self.assertEqual(mediagc.remove_empty_dirs(root, min_age=0), 1)
+        self.assertEqual(os.listdir(root), [])
+
+    def test_missing_files(self):
+        blob = MediaBlob.objects.create(
+            kind=MediaBlob.Kind.IMAGE, sha256="ab" * 32, ref_count=1, file=self.put("diagnostics/blobs/images/ab/x.webp"),
+            jpeg="diagnostics/blobs/images/ab/x.jpg",
+        )
+        legacy = VideoAttachment(report=self.report, file="diagnostics/videos/sumiu.mp4")
+        legacy.save()
+        self.assertEqual(
+            sorted(mediagc.missing_files(), key=lambda row: row[2]),
+            [(MediaBlob, blob.pk, "diagnostics/blobs/images/ab/x.jpg"),
+             (VideoAttachment, legacy.pk, "diagnostics/videos/sumiu.mp4")],
+        )
+
+    def test_files_are_deleted_only_after_commit(self):
+        name = self.put("diagnostics/videos/antigo.mp4")
+        legacy = VideoAttachment(report=self.report, file=name)
+        legacy.save()
+        pk = legacy.pk
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                legacy.delete()
+                raise RuntimeError("rollback")
+        self.assertEqual(callbacks, [])
+        self.assertTrue(self.exists(name))
+        self.assertTrue(VideoAttachment.objects.filter(pk=pk).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                VideoAttachment.objects.get(pk=pk).delete()
+            self.assertTrue(self.exists(name))
+        self.assertFalse(self.exists(name))
+
+    def test_delete_files_outside_a_transaction_and_failures(self):
+        name = self.put("diagnostics/solto.bin")
+        with mock.patch("diagnostics.mediastore.transaction.on_commit", side_effect=lambda fn, using=None: fn()):
+            mediastore.delete_on_commit([name, ""])
+        self.assertFalse(self.exists(name))
+        with mock.patch.object(default_storage, "delete", side_effect=OSError("ocupado")), \
+                self.assertLogs("diagnostics.mediastore", "WARNING"):
+            mediastore.delete_files(["diagnostics/outro.bin"])
+
+
+class MigrationTests(TestCase):
+    def test_models_have_migrations(self):
+        # Sem makemigrations no build: toda mudança de model precisa vir com a migração
+        out = StringIO()
+        call_command("makemigrations", "diagnostics", "--check", "--dry-run", stdout=out)
+        self.assertIn("No changes detected", out.getvalue())
+
+
+class StaticAssetsTests(TestCase):
+    def test_compiled_css_is_versioned(self):
+        # base.html aponta para o CSS do Tailwind gerado por build_css.sh, versionado no repositório
+        path = finders.find("css/app.css")
+        self.assertIsNotNone(path)
+        with open(path) as fp:
+            css = fp.read()
+        self.assertIn("tailwindcss v3", css)
+        self.assertIn(".container", css)
+
+
+class ProcessJobsCommandTests(TestCase):
+    """Loop do worker: manutenção periódica e erros fora do handler."""
+
+    def run_worker(self):
+        out, err = StringIO(), StringIO()
+        call_command("process_jobs", "--once", "--poll-interval", "0.01", stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_stale_jobs_are_requeued_by_the_periodic_maintenance(self):
+        with mock.patch("diagnostics.management.commands.process_jobs.MAINTENANCE_INTERVAL", 0), \
+                mock.patch.object(jobs, "requeue_stale", return_value=0) as requeue, \
+                mock.patch.object(jobs, "run_claimed", side_effect=lambda job: job):
+            for _ in range(2):
+                ProcessingJob.enqueue(ProcessingJob.Kind.VIDEO_TRANSCODE, 42)
+            self.run_worker()
+        # Uma vez na partida e de novo a cada volta do loop (intervalo zerado)
+        self.assertGreater(requeue.call_count, 1)
+
+    def test_a_failure_outside_the_handler_does_not_stop_the_worker(self):
+        first, second = (ProcessingJob.enqueue(ProcessingJob.Kind.VIDEO_TRANSCODE, n) for n in (1, 2))
+
+        def run_claimed(job):
+            if job.pk == first.pk:
+                raise DatabaseError("banco fora do ar")
+            return job
+
+        with mock.patch.object(jobs, "run_claimed", side_effect=run_claimed), \
+                self.assertLogs("diagnostics.jobs", "ERROR") as logs:
+            out, err = self.run_worker()
+        self.assertIn("banco fora do ar", "\n".join(logs.output))
+        self.assertIn("#1: resultado não registrado", err)
+        self.assertIn("video_transcode #2", out)
+
+
+class ConditionalGetTests(MediaRootMixin, TestCase):
+    """ETag/304 do detalhe e da listagem, invalidados por escritas em relatórios e anexos."""
+
+    def setUp(self):
+        cache.clear()
+        self.report = DiagnosticReport.objects.create(**report_data(title="Sensor de chuva"))
+        self.detail = reverse("diagnostics:detail", args=[self.report.pk])
+        self.list = reverse("diagnostics:list")
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_detail_is_304_until_the_report_or_its_attachments_change(self):
+        first = self.client.get(self.detail)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn("no-cache", first["Cache-Control"])
+        self.assertEqual(self.revalidate(self.detail, first["ETag"]).status_code, 304)
+
+        self.report.title = "Sensor de chuva entupido"
+        self.report.save()
+        edited = self.revalidate(self.detail, first["ETag"])
+        self.assertEqual(edited.status_code, 200)
+        self.assertContains(edited, "Sensor de chuva entupido")
+        self.assertNotEqual(edited["ETag"], first["ETag"])
+
+        ImageAttachment.create_batch(self.report, [png_upload("red")])
+        self.assertEqual(self.revalidate(self.detail, edited["ETag"]).status_code, 200)
+
+    def test_list_is_304_until_any_report_or_attachment_changes(self):
+        first = self.client.get(self.list)
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(self.revalidate(self.list, first["ETag"]).status_code, 304)
+        # Outra querystring, outra página (e outro ETag)
+        self.assertEqual(self.revalidate(self.list + "?category=critica", first["ETag"]).status_code, 200)
+
+        DiagnosticReport.objects.create(**report_data(title="Gateway sem sinal"))
+        created = self.revalidate(self.list, first["ETag"])
+        self.assertEqual(created.status_code, 200)
+        self.assertContains(created, "Gateway sem sinal")
+
+        ImageAttachment.create_batch(self.report, [png_upload("blue")])
+        self.assertEqual(self.revalidate(self.list, created["ETag"]).status_code, 200)
+
+    def test_a_batch_of_attachments_touches_the_report_once(self):
+        uploads = [png_upload(color) for color in ("red", "green", "blue", "white")]
+        with mock.patch.object(caching, "bump_list_generation", wraps=caching.bump_list_generation) as bump, \
+                CaptureQueriesContext(connection) as ctx:
+            ImageAttachment.create_batch(self.report, uploads)
+        touches = [q["sql"] for q in ctx.captured_queries
+                   if q["sql"].startswith('UPDATE "diagnostics_diagnosticreport"')]
+        self.assertEqual(len(touches), 1)
+        self.assertEqual(bump.call_count, 1)
+
+    def test_deferred_touches_still_touch_on_error(self):
+        before = DiagnosticReport.objects.get(pk=self.report.pk).updated_at
+        with self.assertRaises(RuntimeError), caching.deferred_touches():
+            with caching.deferred_touches():  # aninhado: quem toca é o de fora
+                caching.touch_report(self.report.pk)
+            self.assertEqual(DiagnosticReport.objects.get(pk=self.report.pk).updated_at, before)
+            raise RuntimeError("upload interrompido")
+        self.assertGreater(DiagnosticReport.objects.get(pk=self.report.pk).updated_at, before)
+
+
+class ImageNegotiationTests(MediaRootMixin, TestCase):
+    """Formato escolhido pelo Accept, variantes gravadas na ingestão e o redirecionamento de reserva."""
+
+    def setUp(self):
+        self.report = DiagnosticReport.objects.create(**report_data())
+
+    def negotiate(self, accept, available=imaging.FORMATS):
+        request = RequestFactory().get("/", **({"HTTP_ACCEPT": accept} if accept is not None else {}))
+        return media.negotiate_image(request, available)
+
+    def thumbnail(self, image, size, accept=None, method="get"):
+        extra = {"HTTP_ACCEPT": accept} if accept is not None else {}
+        return getattr(self.client, method)(reverse("diagnostics:image_thumbnail", args=[image.pk, size]), **extra)
+
+    def test_negotiate_image_follows_q_values(self):
+        self.assertEqual(self.negotiate("image/avif,image/webp,*/*;q=0.8"), "avif")
+        self.assertEqual(self.negotiate("image/avif;q=0.5,image/webp;q=0.9"), "webp")
+        self.assertEqual(self.negotiate("image/avif;q=0,image/webp"), "webp")
+        # Empate: o menor arquivo, na ordem de imaging.FORMATS
+        self.assertEqual(self.negotiate("image/jpeg,image/webp"), "webp")
+        self.assertEqual(self.negotiate("image/avif;q=abc,image/jpeg"), "jpeg")
+        # Só entre os disponíveis
+        self.assertEqual(self.negotiate("image/avif,image/webp", ("webp", "jpeg")), "webp")
+
+    def test_negotiate_image_falls_back_to_jpeg_without_explicit_types(self):
+        self.assertEqual(self.negotiate("*/*"), "jpeg")
+        self.assertEqual(self.negotiate("image/*"), "jpeg")
+        self.assertEqual(self.negotiate(None), "jpeg")
+        self.assertEqual(self.negotiate(""), "jpeg")
+        self.assertEqual(self.negotiate("*/*", ("webp",)), "webp")
+        self.assertIsNone(self.negotiate("*/*", ()))
+
+    def test_ingest_writes_every_variant_and_full_serves_the_negotiated_one(self):
+        image = ImageAttachment.create_batch(self.report, [png_upload("red")])[0]
+        blob = image.blob
+        for fmt in imaging.supported_formats():
+            name = blob.variant(fmt)
+            self.assertTrue(name.endswith(imaging.EXTENSIONS[fmt]), fmt)
+            with default_storage.open(name) as fp, Image.open(fp) as decoded:
+                self.assertEqual((decoded.format, decoded.size), (imaging.PIL_FORMATS[fmt], (64, 48)))
+
+        for accept, fmt in (("image/avif,image/webp,*/*", "avif"), ("image/webp,*/*", "webp"), ("*/*", "jpeg"), (None, "jpeg")):
+            if fmt not in imaging.supported_formats():
+                continue
+            response = self.thumbnail(image, "full", accept)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], imaging.CONTENT_TYPES[fmt])
+            self.assertIn("Accept", response["Vary"])
+            self.assertEqual(b"".join(response.streaming_content), default_storage.open(blob.variant(fmt)).read())
+
+    def test_thumbnails_are_encoded_in_the_negotiated_format(self):
+        image = ImageAttachment.create_batch(self.report, [png_upload("blue")])[0]
+        for fmt in imaging.supported_formats():
+            response = self.thumbnail(image, "sm", imaging.CONTENT_TYPES[fmt])
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response["Content-Type"], imaging.CONTENT_TYPES[fmt])
+            self.assertIn("Accept", response["Vary"])
+            self.assertIn("immutable", response["Cache-Control"])
+            with Image.open(io.BytesIO(b"".join(response.streaming_content))) as decoded:
+                self.assertEqual(decoded.format, imaging.PIL_FORMATS[fmt])
+                self.assertLessEqual(max(decoded.size), thumbnails.SIZES["sm"])
+            self.assertTrue(thumbnails.cache_path(image, "sm", fmt).exists())
+
+    def test_head_is_allowed(self):
+        image = ImageAttachment.create_batch(self.report, [png_upload("green")])[0]
+        for size in ("full", "sm"):
+            response = self.thumbnail(image, size, "image/webp", method="head")
+            self.assertEqual(response.status_code, 200, size)
+            self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertEqual(self.client.post(reverse("diagnostics:image_thumbnail", args=[image.pk, "sm"])).status_code, 405)
+
+    def test_undecodable_images_redirect_to_the_original(self):
+        upload = SimpleUploadedFile("foto.png", b"\x89PNG\r\n\x1a\n nao e imagem", "image/png")
+        image = ImageAttachment.create_batch(self.report, [upload])[0]
+        self.assertTrue(image.file.name.endswith(".png"))
+        self.assertEqual([image.blob.variant(fmt) for fmt in imaging.FORMATS], ["", "", ""])
+        for size in ("full", "sm"):
+            response = self.thumbnail(image, size, "image/avif,image/webp,*/*")
+            self.assertRedirects(response, image.file.url, fetch_redirect_response=False)
+
+    def test_legacy_attachments_serve_their_own_webp(self):
+        name = default_storage.save("diagnostics/images/antiga.webp", ContentFile(b"RIFF....WEBP"))
+        legacy = ImageAttachment.objects.create(report=self.report, file=name)
+        response = self.thumbnail(legacy, "full", "image/avif,image/webp,*/*")
+        self.assertEqual((response.status_code, response["Content-Type"]), (200, "image/webp"))
+        # Sem variante que o cliente aceite explicitamente, cai no próprio WEBP
+        self.assertEqual(self.thumbnail(legacy, "full", "*/*")["Content-Type"], "image/webp")
+
+        other = ImageAttachment.objects.create(
+            report=self.report, file=default_storage.save("diagnostics/images/antiga.jpg", ContentFile(b"jpg")),
+        )
+        self.assertRedirects(self.thumbnail(other, "full"), other.file.url, fetch_redirect_response=False)
+
+    def test_unknown_size_is_404(self):
+        image = ImageAttachment.create_batch(self.report, [png_upload("white")])[0]
+        self.assertEqual(self.thumbnail(image, "xl").status_code, 404)
+
+
+class MetricsTests(TestCase):
+    """Histogramas no formato do Prometheus, o middleware (WSGI e ASGI), o guarda de queries e o /metrics."""
+
+    @classmethod
+    def setUpTestData(cls):
+        DiagnosticReport.objects.bulk_create([DiagnosticReport(**report_data(title=f"r{i}")) for i in range(3)])
+        cls.staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def histogram(self, *args, **kwargs):
+        hist = metrics.Histogram(*args, **kwargs)
+        self.addCleanup(metrics.REGISTRY.remove, hist)
+        return hist
+
+    def series(self, hist, **labels):
+        key = tuple(str(labels.get(n, "")) for n in hist.labelnames)
+        counts, total, count = hist._series.get(key, [[0] * len(hist.buckets), 0.0, 0])
+        return total, count
+
+    def test_histogram_renders_cumulative_buckets(self):
+        hist = self.histogram("t_seconds", "Teste.", ["view"], buckets=(0.1, 1))
+        hist.observe(0.05, view="a")
+        hist.observe(0.5, view="a")
+        hist.observe(3, view="a")
+        self.assertEqual(hist.render().splitlines(), [
+            "# HELP t_seconds Teste.",
+            "# TYPE t_seconds histogram",
+            't_seconds_bucket{view="a",le="0.1"} 1',
+            't_seconds_bucket{view="a",le="1.0"} 2',
+            't_seconds_bucket{view="a",le="+Inf"} 3',
+            't_seconds_sum{view="a"} 3.55',
+            't_seconds_count{view="a"} 3',
+        ])
+        self.assertIn(hist.render(), metrics.render_latest())
+
+    def test_label_values_are_escaped(self):
+        hist = self.histogram("t_escape", "Teste.", ["view"], buckets=(1,))
+        hist.observe(1, view='a"b\\c\nd')
+        self.assertIn('t_escape_count{view="a\\"b\\\\c\\nd"} 1', hist.render())
+
+    def test_middleware_counts_queries_under_wsgi(self):
+        before = self.series(metrics.SQL_QUERIES, view="diagnostics:list")
+        requests = self.series(metrics.REQUEST_SECONDS, view="diagnostics:list", method="GET", status=200)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(self.client.get(reverse("diagnostics:list")).status_code, 200)
+        total, count = self.series(metrics.SQL_QUERIES, view="diagnostics:list")
+        self.assertEqual((total - before[0], count - before[1]), (len(ctx), 1))
+        self.assertEqual(self.series(metrics.REQUEST_SECONDS, view="diagnostics:list", method="GET", status=200)[1],
+                         requests[1] + 1)
+
+    async def test_middleware_counts_queries_under_asgi(self):
+        before = self.series(metrics.SQL_QUERIES, view="diagnostics:list")
+        response = await AsyncClient().get(reverse("diagnostics:list"))
+        self.assertEqual(response.status_code, 200)
+        total, count = self.series(metrics.SQL_QUERIES, view="diagnostics:list")
+        self.assertEqual(count - before[1], 1)
+        self.assertEqual(total - before[0], metrics.QUERY_BUDGETS["diagnostics:list"])
+        # O wrapper sai da conexão junto com o request
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_stages_outside_a_request_are_recorded_without_view(self):
+        before = self.series(metrics.STAGE_SECONDS, view="-", stage="teste")
+        with metrics.timed("teste"):
+            pass
+        self.assertEqual(self.series(metrics.STAGE_SECONDS, view="-", stage="teste")[1], before[1] + 1)
+
+    def test_check_query_budget_modes(self):
+        request = RequestFactory().get("/relatorios/?page=2")
+        budget = metrics.QUERY_BUDGETS["diagnostics:list"]
+        with override_settings(DIAGNOSTICS_QUERY_BUDGET="raise"):
+            metrics.check_query_budget(request, "diagnostics:list", budget)
+            metrics.check_query_budget(request, "sem-orcamento", 1000)
+            with self.assertRaisesMessage(metrics.QueryBudgetExceeded, f"{budget + 1} queries, orçamento {budget}"):
+                metrics.check_query_budget(request, "diagnostics:list", budget + 1)
+        with override_settings(DIAGNOSTICS_QUERY_BUDGET="warn"), \
+                self.assertLogs("diagnostics.query_budget", "WARNING") as logs:
+            metrics.check_query_budget(request, "diagnostics:list", budget + 1)
+        self.assertIn("/relatorios/?page=2", logs.output[0])
+        with override_settings(DIAGNOSTICS_QUERY_BUDGET="off"), self.assertNoLogs("diagnostics.query_budget"):
+            metrics.check_query_budget(request, "diagnostics:list", budget + 100)
+
+    @override_settings(DIAGNOSTICS_METRICS_TOKEN="s3cr3t")
+    def test_metrics_endpoint_requires_the_token_or_staff(self):
+        url = reverse("metrics")
+        self.assertEqual(self.client.get(url).status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer errado").status_code, 403)
+        response = self.client.get(url, HTTP_AUTHORIZATION="Bearer s3cr3t")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        self.assertContains(response, "# TYPE diagnostics_request_duration_seconds histogram")
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    @override_settings(DIAGNOSTICS_METRICS_TOKEN="")
+    def test_empty_token_never_authorizes(self):
+        self.assertEqual(self.client.get(reverse("metrics"), HTTP_AUTHORIZATION="Bearer ").status_code, 403)
+
+    def test_job_duration_summary_comes_from_the_database(self):
+        kind = ProcessingJob.Kind.VIDEO_TRANSCODE
+        for status, ms in ((ProcessingJob.Status.DONE, 1500), (ProcessingJob.Status.DONE, 250),
+                           (ProcessingJob.Status.FAILED, 4000), (ProcessingJob.Status.PENDING, None)):
+            ProcessingJob.objects.create(kind=kind, object_id=1, status=status, duration_ms=ms)
+        lines = metrics.render_latest().splitlines()
+        self.assertIn("# TYPE diagnostics_job_duration_seconds summary", lines)
+        self.assertIn('diagnostics_job_duration_seconds_sum{kind="video_transcode",status="done"} 1.750', lines)
+        self.assertIn('diagnostics_job_duration_seconds_count{kind="video_transcode",status="done"} 2', lines)
+        self.assertIn('diagnostics_job_duration_seconds_count{kind="video_transcode",status="failed"} 1', lines)
+        self.assertFalse([line for line in lines if 'status="pending"' in line])
+
+
+class ExportTests(TestCase):
+    """Exportação CSV/JSONL: cabeçalho, linhas, agregados de mídia e os filtros da busca."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = get_user_model().objects.create_user("staff", password="x", is_staff=True)
+        cls.old = DiagnosticReport.objects.create(**report_data(title="Bomba parada", su_identifier="SU-1"))
+        cls.critical = DiagnosticReport.objects.create(**report_data(
+            title="Gateway, sem \"sinal\"", category="critica", su_identifier="SU-2", message="linha 1\nlinha 2",
+        ))
+        cls.plain = DiagnosticReport.objects.create(**report_data(title="Sensor sujo", su_identifier="SU-1"))
+        DiagnosticReport.objects.filter(pk=cls.old.pk).update(created_at=timezone.make_aware(datetime(2026, 1, 10, 12)))
+        for name in ("diagnostics/images/a.webp", "diagnostics/images/b.webp"):
+            ImageAttachment.objects.create(report=cls.critical, file=name)
+        VideoAttachment.objects.create(report=cls.critical, file="diagnostics/videos/v.mp4")
+
+    def setUp(self):
+        self.client.force_login(self.staff)
+
+    def export(self, **params):
+        response = self.client.get(reverse("diagnostics:export"), params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIsInstance(response, StreamingHttpResponse)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_csv_header_and_rows(self):
+        response, body = self.export(format="csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertRegex(response["Content-Disposition"], r'^attachment; filename="diagnosticos-\d{8}-\d{4}\.csv"$')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0], export.FIELDS)
+        # Mais recentes primeiro, id como desempate
+        self.assertEqual([int(r[0]) for r in rows[1:]], [self.plain.pk, self.critical.pk, self.old.pk])
+        critical = dict(zip(rows[0], rows[2]))
+        self.assertEqual((critical["title"], critical["message"]), ('Gateway, sem "sinal"', "linha 1\nlinha 2"))
+
+    def test_jsonl_rows(self):
+        response, body = self.export(format="jsonl", order_by="created_at")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([r["id"] for r in rows], [self.old.pk, self.critical.pk, self.plain.pk])
+        self.assertEqual(list(rows[0]), export.FIELDS)
+        self.assertEqual(datetime.fromisoformat(rows[0]["created_at"]), timezone.make_aware(datetime(2026, 1, 10, 12)))
+
+    def test_media_aggregates_in_one_query(self):
+        with self.assertNumQueries(1):
+            rows = list(export.iter_rows(DiagnosticReport.objects.order_by("id"), include_media=True))
+        by_id = {r["id"]: r for r in rows}
+        critical = by_id[self.critical.pk]
+        self.assertEqual((critical["image_count"], critical["video_count"]), (2, 1))
+        self.assertEqual(sorted(critical["image_urls"]), ["/media/diagnostics/images/a.webp", "/media/diagnostics/images/b.webp"])
+        self.assertEqual(critical["video_urls"], ["/media/diagnostics/videos/v.mp4"])
+        self.assertEqual((by_id[self.plain.pk]["image_count"], by_id[self.plain.pk]["image_urls"]), (0, []))
+
+        _response, body = self.export(format="csv", media="1", category="critica")
+        rows = list(csv.DictReader(io.StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["image_count"], "2")
+        self.assertEqual(sorted(rows[0]["image_urls"].split(" ")), [
+            "http://testserver/media/diagnostics/images/a.webp", "http://testserver/media/diagnostics/images/b.webp",
+        ])
+
+    def test_group_concat_uses_string_agg_on_postgres(self):
+        from django.db.backends.postgresql.base import DatabaseWrapper
+
+        pg = DatabaseWrapper({**connection.settings_dict, "ENGINE": "django.db.backends.postgresql"}, alias="pg")
+        qs = ImageAttachment.objects.order_by().values("report").annotate(files=export.GroupConcat("file"))
+        sql, _params = qs.query.get_compiler(connection=pg).as_sql()
+        self.assertIn(f"STRING_AGG(\"diagnostics_imageattachment\".\"file\"::text, '{export.FILE_SEP}')", sql)
+        self.assertIn("GROUP_CONCAT(", str(qs.query))
+
+    def test_filters_come_from_the_query_string(self):
+        ids = lambda **params: [json.loads(line)["id"] for line in self.export(format="jsonl", **params)[1].splitlines()]  # noqa: E731
+        self.assertEqual(ids(category="critica"), [self.critical.pk])
+        self.assertEqual(ids(su="SU-1", order_by="title"), [self.old.pk, self.plain.pk])
+        self.assertEqual(ids(end_date="2026-01-31"), [self.old.pk])
+        self.assertEqual(ids(start_date="2026-02-01", order_by="-title"), [self.plain.pk, self.critical.pk])
+        self.assertEqual(ids(q="gateway"), [self.critical.pk])
+
+    def test_invalid_requests(self):
+        url = reverse("diagnostics:export")
+        self.assertEqual(self.client.get(url, {"format": "xlsx"}).status_code, 400)
+        self.assertEqual(self.client.get(url, {"start_date": "ontem"}).status_code, 400)
+        self.client.logout()
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+
+@override_settings(DIAGNOSTICS_QUERY_BUDGET="raise")
+class SmartUnitTests(TestCase):
+    """Filtro exato/por prefixo de SU, a linha do tempo e o resumo em cache."""
+
+    SUS = ["SU1", "SU10", "SU1-A", "SU2", "su1-b", "SU1\U0010fffd", ""]
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reports = {}
+        base = timezone.make_aware(datetime(2026, 10, 1, 12))
+        for i, su in enumerate(cls.SUS):
+            for n, category in enumerate(("critica", "normal", "critica")[: 1 + i % 3]):
+                report = DiagnosticReport.objects.create(**report_data(title=f"{su or 'vazia'}-{n}", su_identifier=su, category=category))
+                DiagnosticReport.objects.filter(pk=report.pk).update(created_at=base + timedelta(days=n, hours=i))
+                cls.reports.setdefault(su, []).append(report.pk)
+
+    def setUp(self):
+        cache.clear()
+
+    def sus(self, value):
+        return sorted(set(units.filter_su(DiagnosticReport.objects.all(), value).values_list("su_identifier", flat=True)))
+
+    def test_exact_value_matches_only_that_su(self):
+        self.assertEqual(self.sus("SU1"), ["SU1"])
+        self.assertEqual(self.sus("  SU10 "), ["SU10"])
+        self.assertEqual(self.sus("SU"), [])
+        self.assertEqual(self.sus(""), [""])
+
+    def test_prefix_is_a_case_sensitive_range(self):
+        self.assertEqual(self.sus("SU1*"), ["SU1", "SU1-A", "SU10", "SU1\U0010fffd"])
+        self.assertEqual(self.sus("SU1-*"), ["SU1-A"])
+        # O LIKE do SQLite ignora maiúsculas; o intervalo não
+        self.assertEqual(self.sus("su1*"), ["su1-b"])
+        self.assertEqual(self.sus("SU10*"), ["SU10"])
+        self.assertEqual(self.sus("SU3*"), [])
+        # Só o asterisco: sem filtro (inclusive as SUs vazias)
+        self.assertEqual(len(self.sus("*")), len(self.SUS))
+        self.assertEqual(self.sus("**"), self.sus("*"))
+
+    def test_prefix_filter_uses_the_su_index(self):
+        sql = str(units.filter_su(DiagnosticReport.objects.all(), "SU1*").query)
+        self.assertIn('"su_identifier" >= SU1', sql)
+        self.assertIn('"su_identifier" < SU2', sql)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM diagnostics_diagnosticreport "
+                "WHERE su_identifier >= %s AND su_identifier < %s", ["SU1", "SU2"],
+            )
+            plan = " ".join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn("USING", plan)
+
+    def test_summary_has_the_latest_report_and_counts_per_su(self):
+        rows = {row["su_identifier"]: row for row in units.latest_per_su()}
+        self.assertNotIn("", rows)
+        self.assertEqual(list(rows), sorted(rows))
+        for su in self.SUS:
+            if not su:
+                continue
+            with self.subTest(su=su):
+                pks = self.reports[su]
+                self.assertEqual(rows[su]["id"], pks[-1])
+                self.assertEqual(rows[su]["total"], len(pks))
+                self.assertEqual(rows[su]["critica"], DiagnosticReport.objects.filter(pk__in=pks, category="critica").count())
+
+    def test_summary_is_cached_until_a_report_is_written(self):
+        with self.assertNumQueries(1):
+            units.summary()
+        with self.assertNumQueries(0):
+            self.assertEqual(units.summary_for("SU2")["total"], len(self.reports["SU2"]))
+            self.assertIsNone(units.summary_for("SU9"))
+        DiagnosticReport.objects.create(**report_data(su_identifier="SU2", category="critica"))
+        with self.assertNumQueries(1):
+            row = units.summary_for("SU2")
+        self.assertEqual(row["total"], len(self.reports["SU2"]) + 1)
+
+    def test_summary_view_filters(self):
+        url = reverse("diagnostics:su_summary")
+        listed = lambda **params: [r["su_identifier"] for r in self.client.get(url, params).context["rows"]]  # noqa: E731
+        self.assertEqual(listed(), sorted(su for su in self.SUS if su))
+        self.assertEqual(listed(su="SU1"), ["SU1"])
+        self.assertEqual(listed(su="SU1*"), self.sus("SU1*"))
+        latest_critical = sorted(su for su in self.SUS if su and DiagnosticReport.objects.get(pk=self.reports[su][-1]).category == "critica")
+        self.assertEqual(listed(category="critica"), latest_critical)
+
+    def test_timeline_lists_the_su_newest_first(self):
+        DiagnosticReport.objects.bulk_create([DiagnosticReport(**report_data(title=f"extra{i}", su_identifier="SU10")) for i in range(25)])
+        units.invalidate_summary()
+        expected = list(DiagnosticReport.objects.filter(su_identifier="SU10").order_by("-created_at", "-id").values_list("pk", flat=True))
+        url = reverse("diagnostics:su_timeline", args=["SU10"])
+        seen, cursor = [], None
+        while True:
+            response = self.client.get(url, {"cursor": cursor} if cursor else {})
+            self.assertEqual(response.status_code, 200)
+            page = response.context["page_obj"]
+            seen += [r.pk for r in page.object_list]
+            if not page.has_next:
+                break
+            cursor = page.next_cursor
+        self.assertEqual(seen, expected)
+        self.assertEqual(response.context["status"]["total"], len(expected))
+
+    def test_timeline_of_unknown_or_empty_su_is_404(self):
+        self.assertEqual(self.client.get(reverse("diagnostics:su_timeline", args=["SU9"])).status_code, 404)
+        self.assertEqual(self.client.get(reverse("diagnostics:su_summary") + "/").status_code, 404)
+
+
+class ImageIngestTests(MediaRootMixin, TestCase):
+    """Lote de imagens: uma codificação por conteúdo, reserva para o que o Pillow não abre e o draft() do JPEG."""
+
+    def setUp(self):
+        self.report = DiagnosticReport.objects.create(**report_data())
+
+    def jpeg(self, size):
+        buf = io.BytesIO()
+        Image.new("RGB", size, "orange").save(buf, "JPEG")
+        return buf.getvalue()
+
+    def test_same_bytes_in_one_batch_are_encoded_once(self):
+        uploads = [png_upload("red"), png_upload("red", "de-novo.png"), png_upload("blue")]
+        with mock.patch("diagnostics.imaging.encode_batch", wraps=imaging.encode_batch) as encode_batch:
+            attachments = ImageAttachment.create_batch(self.report, uploads)
+        self.assertEqual(encode_batch.call_count, 1)
+        self.assertEqual(len(encode_batch.call_args.args[0]), 2)
+        self.assertEqual(attachments[0].blob_id, attachments[1].blob_id)
+        self.assertNotEqual(attachments[0].blob_id, attachments[2].blob_id)
+        self.assertEqual(sorted(MediaBlob.objects.values_list("ref_count", flat=True)), [1, 2])
+
+        # Conteúdo que já tem blob nem vai para o encoder
+        with mock.patch("diagnostics.imaging.encode_batch") as encode_batch:
+            ImageAttachment.create_batch(self.report, [png_upload("blue")])
+        encode_batch.assert_not_called()
+
+    def test_undecodable_upload_keeps_the_original_without_failing_the_batch(self):
+        self.addCleanup(self.shutdown_pool)
+        # workers=2: a exceção volta do processo do pool em vez de derrubar o lote
+        for workers, color in ((1, "green"), (2, "white")):
+            data = b"\x89PNG\r\n\x1a\n truncado " + color.encode()
+            bad = SimpleUploadedFile("quebrada.png", data, "image/png")
+            with self.subTest(workers=workers), override_settings(DIAGNOSTICS_IMAGE_WORKERS=workers):
+                good, kept = ImageAttachment.create_batch(self.report, [png_upload(color), bad])
+                self.assertTrue(good.file.name.endswith(".webp"))
+                self.assertTrue(kept.file.name.endswith(".png"))
+                self.assertEqual(default_storage.open(kept.file.name).read(), data)
+        self.assertIsNotNone(imaging._pool)
+
+    def shutdown_pool(self):
+        if imaging._pool is not None:
+            imaging._pool.shutdown()
+            imaging._pool = None
+
+    def test_encode_batch_returns_the_exception_in_place(self):
+        results = imaging.encode_batch([self.jpeg((40, 30)), b"lixo"], max_workers=1)
+        self.assertEqual(list(results[0]), ["webp"])
+        self.assertIsInstance(results[1], Exception)
+
+    def test_jpeg_is_decoded_at_reduced_scale(self):
+        sizes = []
+        real_draft = JpegImagePlugin.JpegImageFile.draft
+
+        def draft(img, mode, size):
+            result = real_draft(img, mode, size)
+            sizes.append(img.size)
+            return result
+
+        with mock.patch.object(JpegImagePlugin.JpegImageFile, "draft", autospec=True, side_effect=draft):
+            variants = imaging.encode_variants(self.jpeg((4000, 3000)), formats=("webp",))
+        # 1/2 é a maior redução que ainda cobre 1920x1080; o resultado final cabe na caixa
+        self.assertEqual(sizes, [(2000, 1500)])
+        with Image.open(io.BytesIO(variants["webp"])) as img:
+            self.assertEqual(img.size, (1440, 1080))
+        with Image.open(io.BytesIO(imaging.encode_webp(self.jpeg((4000, 3000)), max_size=(320, 320)))) as img:
+            self.assertEqual(img.size, (320, 240))
+
+
+class VideoPreviewTests(MediaRootMixin, TestCase):
+    """Capa e tira de prévias geradas pelo ffmpeg de verdade (pulado sem ele)."""
+
+    DURATION = 3.0
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.clip_path = os.path.join(cls.media_root, "clip.mp4")
+        try:
+            subprocess.run(
+                ["ffmpeg", "-v", "error", "-y", "-f", "lavfi", "-i", f"testsrc=duration={cls.DURATION:g}:size=320x240:rate=10",
+                 "-pix_fmt", "yuv420p", cls.clip_path],
+                check=True, timeout=60, capture_output=True,
+            )
+            with open(cls.clip_path, "rb") as fp:
+                clip = fp.read()
+        except (OSError, subprocess.SubprocessError):
+            clip = b""
+        if clip[4:8] != b"ftyp":
+            cls.tearDownClass()
+            raise unittest.SkipTest("ffmpeg indisponível")
+        cls.clip = clip
+
+    def setUp(self):
+        self.report = DiagnosticReport.objects.create(**report_data())
+        attachment = VideoAttachment(report=self.report, file=SimpleUploadedFile("v.mp4", self.clip, "video/mp4"))
+        attachment.save()
+        self.blob = attachment.blob
+
+    def webp_size(self, name):
+        with default_storage.open(name) as fp, Image.open(fp) as img:
+            self.assertEqual(img.format, "WEBP")
+            return img.size
+
+    @override_settings(DIAGNOSTICS_VIDEO_SPRITES=True)
+    def test_poster_and_sprite_are_written_and_rendered(self):
+        fields = video.build_previews(self.blob.file.path, self.blob.file.name, {"format": {"duration": f"{self.DURATION}"}})
+        self.assertEqual(set(fields), {"poster", "sprite", "sprite_frames", "derived_size"})
+        stem = os.path.splitext(self.blob.file.name)[0]
+        self.assertEqual((fields["poster"], fields["sprite"]), (f"{stem}-poster.webp", f"{stem}-sprite.webp"))
+        self.assertEqual(self.webp_size(fields["poster"]), (320, 240))
+        self.assertEqual(self.webp_size(fields["sprite"]), (video.SPRITE_FRAME_WIDTH * video.SPRITE_FRAMES, 120))
+        self.assertEqual(fields["derived_size"], default_storage.size(fields["poster"]) + default_storage.size(fields["sprite"]))
+
+        MediaBlob.objects.filter(pk=self.blob.pk).update(**fields)
+        self.blob.refresh_from_db()
+        self.assertEqual((self.blob.poster.name, self.blob.sprite.name, self.blob.sprite_frames), (
+            fields["poster"], fields["sprite"], video.SPRITE_FRAMES,
+        ))
+        response = self.client.get(reverse("diagnostics:detail", args=[self.report.pk]))
+        self.assertContains(response, f'poster="{self.blob.poster.url}"')
+        self.assertContains(response, f'data-sprite="{self.blob.sprite.url}" data-sprite-frames="{video.SPRITE_FRAMES}"')
+
+    @override_settings(DIAGNOSTICS_VIDEO_SPRITES=False)
+    def test_sprites_are_optional(self):
+        fields = video.build_previews(self.blob.file.path, self.blob.file.name, {"format": {"duration": f"{self.DURATION}"}})
+        self.assertEqual(set(fields), {"poster", "derived_size"})
+        self.assertEqual(fields["derived_size"], default_storage.size(fields["poster"]))
+
+
+@override_settings(DIAGNOSTICS_QUERY_BUDGET="raise")
+class DashboardTests(TestCase):
+    """ReportDailyRollup acompanha as escritas; painel e API leem só a rollup."""
+
+    DAY = datetime(2026, 10, 5, 12)
+
+    @classmethod
+    def setUpTestData(cls):
+        for su, category, days_ago in (("SU-A", "critica", 0), ("SU-A", "normal", 0), ("SU-A", "critica", 1),
+                                       ("SU-B", "normal", 1), ("SU-B", "normal", 9), ("", "critica", 1)):
+            report = DiagnosticReport.objects.create(**report_data(su_identifier=su, category=category))
+            created = timezone.make_aware(cls.DAY - timedelta(days=days_ago))
+            DiagnosticReport.objects.filter(pk=report.pk).update(created_at=created)
+        rollups.rebuild()
+
+    def rollup(self, day=None, su="SU-A", category="critica"):
+        row = ReportDailyRollup.objects.filter(
+            day=day or timezone.localdate(), su_identifier=su, category=category,
+        ).first()
+        return row.count if row else 0
+
+    def test_writes_update_the_days_rollup(self):
+        first = DiagnosticReport.objects.create(**report_data(su_identifier="SU-A", category="critica"))
+        self.assertEqual(self.rollup(), 1)
+        DiagnosticReport.objects.create(**report_data(su_identifier="SU-A", category="critica"))
+        self.assertEqual(self.rollup(), 2)
+
+        first.category = "normal"
+        first.save()
+        self.assertEqual((self.rollup(), self.rollup(category="normal")), (1, 1))
+        first.su_identifier = "SU-C"
+        first.save()
+        self.assertEqual((self.rollup(category="normal"), self.rollup(su="SU-C", category="normal")), (0, 1))
+
+        DiagnosticReport.objects.get(pk=first.pk).delete()
+        self.assertFalse(ReportDailyRollup.objects.filter(su_identifier="SU-C").exists())
+
+    def test_bulk_ingest_is_counted(self):
+        reports = DiagnosticReport.objects.bulk_create([DiagnosticReport(**report_data(su_identifier="SU-D")) for _ in range(3)])
+        rollups.add_reports(reports)
+        self.assertEqual(self.rollup(su="SU-D", category="normal"), 3)
+
+    def test_api_returns_the_aggregated_counts(self):
+        url = reverse("diagnostics:api_dashboard")
+        params = {"start_date": "2026-10-01", "end_date": "2026-10-05"}
+        with self.assertNumQueries(metrics.QUERY_BUDGETS["diagnostics:api_dashboard"]), \
+                CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(url, params).json()
+        self.assertFalse([q for q in ctx.captured_queries if "diagnostics_diagnosticreport" in q["sql"]])
+        self.assertEqual(data["totals"], {"critica": 3, "normal": 2, "total": 5})
+        self.assertEqual(len(data["daily"]), 5)
+        self.assertEqual(data["daily"][-1], {"day": "2026-10-05", "critica": 1, "normal": 1, "total": 2})
+        self.assertEqual(data["daily"][-2], {"day": "2026-10-04", "critica": 2, "normal": 1, "total": 3})
+        self.assertEqual(data["daily"][0]["total"], 0)
+        self.assertEqual(
+            [(r["su_identifier"], r["critica"], r["total"]) for r in data["by_su"]],
+            [("SU-A", 2, 3), ("", 1, 1), ("SU-B", 0, 1)],
+        )
+
+        with self.assertNumQueries(2):
+            data = self.client.get(url, {**params, "start_date": "2026-09-01", "su": "SU-B"}).json()
+        self.assertEqual((data["su"], data["totals"]["normal"], data["by_su"]), ("SU-B", 2, []))
+        self.assertEqual(self.client.get(url, {"start_date": "2026-10-05", "end_date": "2026-10-01"}).status_code, 400)
+
+    def test_html_shows_the_same_counts(self):
+        with self.assertNumQueries(metrics.QUERY_BUDGETS["diagnostics:dashboard"]):
+            response = self.client.get(reverse("diagnostics:dashboard"), {"start_date": "2026-10-01", "end_date": "2026-10-05"})
+        data = response.context["data"]
+        self.assertEqual(data["totals"]["total"], 5)
+        self.assertEqual(max(d["critica_pct"] + d["normal_pct"] for d in data["daily"]), 100)
+        self.assertContains(response, '<p class="text-3xl font-bold text-slate-900">5</p>', html=True)
+        self.assertContains(response, "2 / 3")
+        self.assertContains(response, "&su=SU-A")
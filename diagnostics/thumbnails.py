@@ -0,0 +1,156 @@
+"""
+Derivados (miniaturas) das imagens dos relatórios, gerados sob demanda em
+cada formato pedido (AVIF/WEBP/JPEG, conforme o Accept) e guardados num
+cache em disco limitado por tamanho, com despejo LRU (o mtime do arquivo é
+atualizado a cada acerto).
+"""
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+from PIL import Image
+
+from . import imaging, metrics
+
+# Tamanhos nomeados (largura máxima em px) usados no srcset da galeria
+SIZES = {
+    "sm": 320,
+    "md": 640,
+    "lg": 1280,
+}
+# Um degrau abaixo da qualidade da imagem cheia (imaging.QUALITY): na
+# largura da galeria a diferença não aparece e o arquivo fica bem menor
+QUALITY = {"avif": 50, "webp": 75, "jpeg": 78}
+
+# Só regrava o mtime de um acerto se ele estiver mais velho que isso (evita
+# um write de metadados por request em páginas muito acessadas)
+TOUCH_INTERVAL = 60
+# Ao estourar o limite, despeja até ficar abaixo desta fração dele
+LOW_WATER = 0.9
+
+_lock = threading.Lock()
+_approx_bytes = None
+
+
+def cache_dir():
+    """DIAGNOSTICS_THUMBNAIL_CACHE_DIR ou, sem ele, MEDIA_ROOT/cache/thumbnails do momento (segue override_settings)."""
+    configured = getattr(settings, "DIAGNOSTICS_THUMBNAIL_CACHE_DIR", "")
+    return Path(configured) if configured else Path(settings.MEDIA_ROOT) / "cache" / "thumbnails"
+
+
+def cache_limit():
+    return int(getattr(settings, "DIAGNOSTICS_THUMBNAIL_CACHE_MB", 512)) * 1024 * 1024
+
+
+def effort():
+    return getattr(settings, "DIAGNOSTICS_IMAGE_EFFORT", imaging.DEFAULT_EFFORT)
+
+
+def cache_path(attachment, size, fmt="webp"):
+    # A chave é o nome do arquivo (uuid ou hash do conteúdo): anexos que
+    # compartilham um blob compartilham o derivado, e se o arquivo mudar o
+    # derivado antigo simplesmente deixa de ser usado e sai pelo LRU.
+    stem = os.path.splitext(os.path.basename(attachment.file.name))[0]
+    return cache_dir() / f"{stem}-{size}{imaging.EXTENSIONS[fmt]}"
+
+
+def open_thumbnail(attachment, size, fmt="webp"):
+    """Abre (para leitura binária) o derivado `size` do anexo no formato `fmt`, gerando-o se ainda não existir."""
+    width = SIZES[size]
+    path = cache_path(attachment, size, fmt)
+
+    try:
+        fp = open(path, "rb")
+    except FileNotFoundError:
+        with metrics.timed("thumbnail"):
+            _generate(attachment.file.path, path, width, fmt)
+        fp = open(path, "rb")
+        # Contabiliza só depois de aberto: mesmo que o despejo remova o
+        # arquivo, o descritor continua válido até o fim da resposta.
+        _account(os.fstat(fp.fileno()).st_size)
+        return fp
+
+    if time.time() - os.fstat(fp.fileno()).st_mtime > TOUCH_INTERVAL:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+    return fp
+
+
+def _generate(src_path, dst_path, width, fmt="webp"):
+    dst_path.parent.mkdir(parents=True, exist_ok=True)
+
+    with Image.open(src_path) as img:
+        img.draft("RGB", (width, width))
+        img = img.convert("RGB")
+        img.thumbnail((width, width))
+
+        # Escrita atômica: outro processo nunca lê um derivado pela metade
+        fd, tmp = tempfile.mkstemp(dir=dst_path.parent, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                imaging.save(img, fp, fmt, QUALITY[fmt], effort())
+            os.replace(tmp, dst_path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+
+def _account(added):
+    """
+    Soma o que foi gravado numa estimativa local do tamanho do cache; quando
+    ela passa do limite, faz a varredura real e despeja os menos usados.
+    """
+    global _approx_bytes
+    with _lock:
+        if _approx_bytes is None:
+            _approx_bytes = _scan_total()
+        else:
+            _approx_bytes += added
+        if _approx_bytes > cache_limit():
+            _approx_bytes = evict()
+
+
+def _scan_total():
+    total = 0
+    with os.scandir(cache_dir()) as it:
+        for entry in it:
+            if entry.is_file():
+                total += entry.stat().st_size
+    return total
+
+
+def evict(limit=None):
+    """Remove os derivados menos recentemente usados até caber no limite. Retorna o total restante."""
+    limit = cache_limit() if limit is None else limit
+    entries = []
+    total = 0
+    with os.scandir(cache_dir()) as it:
+        for entry in it:
+            if not entry.is_file():
+                continue
+            st = entry.stat()
+            entries.append((st.st_mtime, st.st_size, entry.path))
+            total += st.st_size
+
+    if total <= limit:
+        return total
+
+    target = int(limit * LOW_WATER)
+    entries.sort()
+    for _mtime, size, path in entries:
+        if total <= target:
+            break
+        try:
+            os.remove(path)
+            total -= size
+        except FileNotFoundError:
+            total -= size
+        except OSError:
+            pass
+    return total
@@ -0,0 +1,89 @@
+"""
+Consultas por Smart Unit (`su_identifier`).
+
+* `filter_su`: filtro exato ou por prefixo (`SU-AC*`), sempre pelo índice
+  (su_identifier, -created_at, -id) de DiagnosticReport;
+* `latest_per_su`: o relatório mais recente de cada SU + totais, numa única
+  query agrupada (funções de janela). `summary()` guarda o resultado no
+  cache com uma versão que as escritas em relatórios incrementam (signals e
+  ingestão): nenhuma leitura recalcula enquanto nada mudou.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import RowNumber
+
+from . import caching
+from .models import DiagnosticReport
+
+SUMMARY_VERSION_KEY = "diagnostics:su-summary-version"
+PREFIX_WILDCARD = "*"
+
+
+def summary_cache_seconds():
+    return getattr(settings, "DIAGNOSTICS_SU_SUMMARY_CACHE_SECONDS", 3600)
+
+
+def filter_su(qs, value):
+    """
+    `SU-AC-02` → só essa SU; `SU-AC*` → as que começam com `SU-AC`. O prefixo
+    vira também um intervalo (>= prefixo e < próximo prefixo), que o banco
+    resolve pelo índice mesmo onde `LIKE` não usa índice (SQLite, Postgres
+    com collation não-C); o `startswith` só confere o que o intervalo trouxe.
+    """
+    value = (value or "").strip()
+    if not value.endswith(PREFIX_WILDCARD):
+        return qs.filter(su_identifier=value)
+    prefix = value.rstrip(PREFIX_WILDCARD)
+    if not prefix:
+        return qs
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return qs.filter(su_identifier__gte=prefix, su_identifier__lt=upper, su_identifier__startswith=prefix)
+
+
+def latest_per_su():
+    """
+    Uma linha por SU (sem as vazias), em ordem de SU: o relatório mais recente
+    (`id`, `title`, `category`, `created_at`) e as contagens `total` e `critica`.
+    """
+    by_su = {"partition_by": [F("su_identifier")]}
+    rows = (
+        DiagnosticReport.objects.exclude(su_identifier="")
+        .annotate(
+            position=Window(RowNumber(), order_by=[F("created_at").desc(), F("id").desc()], **by_su),
+            total=Window(Count("id"), **by_su),
+            critica=Window(Count("id", filter=Q(category=DiagnosticReport.Category.CRITICA)), **by_su),
+        )
+        .filter(position=1)
+        .order_by("su_identifier")
+        .values("su_identifier", "id", "title", "category", "created_at", "total", "critica")
+    )
+    return list(rows)
+
+
+def summary_version():
+    return caching.generation(SUMMARY_VERSION_KEY)
+
+
+def invalidate_summary():
+    """Chamado a cada escrita em relatórios: a próxima leitura recalcula."""
+    caching.bump_generation(SUMMARY_VERSION_KEY)
+
+
+def summary():
+    """
+    `latest_per_su()` via cache. A chave leva a versão lida *antes* da query:
+    se um relatório for gravado durante o cálculo, o resultado fica sob a
+    versão antiga e ninguém mais o lê.
+    """
+    key = f"diagnostics:su-summary:{summary_version()}"
+    rows = cache.get(key)
+    if rows is None:
+        rows = latest_per_su()
+        cache.set(key, rows, summary_cache_seconds())
+    return rows
+
+
+def summary_for(su):
+    """Linha do resumo de uma SU, ou None se ela não tem relatórios."""
+    return next((row for row in summary() if row["su_identifier"] == su), None)
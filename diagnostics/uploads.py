@@ -0,0 +1,56 @@
+"""
+Hash (SHA-256) dos uploads calculado enquanto o corpo do request é lido,
+pelos próprios upload handlers: a deduplicação (MediaBlob) não precisa reler
+o arquivo. Ver FILE_UPLOAD_HANDLERS em settings.py.
+"""
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+
+class HashingMemoryFileUploadHandler(MemoryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        # Antes do super(): o handler em memória encerra com StopFutureHandlers
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        # Só conta os bytes que este handler guarda (uploads pequenos); os
+        # grandes seguem para o handler de arquivo temporário
+        if self.activated:
+            self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        if uploaded is not None:
+            uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+class HashingTemporaryFileUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, *args, **kwargs):
+        self.hasher = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.hasher.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        uploaded = super().file_complete(file_size)
+        uploaded.sha256 = self.hasher.hexdigest()
+        return uploaded
+
+
+def file_sha256(f):
+    """SHA-256 do upload: o calculado no recebimento ou, se não houver, lendo o arquivo."""
+    digest = getattr(f, "sha256", None)
+    if digest:
+        return digest
+    hasher = hashlib.sha256()
+    for chunk in f.chunks():
+        hasher.update(chunk)
+    f.seek(0)
+    f.sha256 = hasher.hexdigest()
+    return f.sha256
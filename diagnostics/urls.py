@@ -4,5 +4,16 @@ from . import views
 urlpatterns = [
     path("", views.list_reports, name="list"),
     path("new/", views.create_report, name="new"),
+    path("export/", views.export_reports, name="export"),
+    path("dashboard/", views.dashboard, name="dashboard"),
+    path("api/dashboard/", views.dashboard_api, name="api_dashboard"),
+    path("su/", views.su_summary, name="su_summary"),
+    path("su/<path:su>/", views.su_timeline, name="su_timeline"),
+    path("api/reports/batch/", views.ingest_reports, name="api_ingest"),
+    path("uploads/", views.upload_create, name="upload_create"),
+    path("uploads/<uuid:upload_id>/", views.upload_chunk, name="upload"),
     path("<int:pk>/", views.report_detail, name="detail"),
+    path("images/<int:pk>/<slug:size>/", views.image_thumbnail, name="image_thumbnail"),
+    # Endereço antigo (com ".webp"): páginas em cache e links já compartilhados
+    path("images/<int:pk>/<slug:size>.webp", views.image_thumbnail),
 ]
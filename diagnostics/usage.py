@@ -0,0 +1,139 @@
+"""
+Quanto de mídia cada relatório ocupa (ReportMediaUsage) e o total em disco,
+consultáveis sem varrer o MEDIA_ROOT.
+
+* por relatório: anexos e bytes dos arquivos que eles usam (blob + capa e
+  prévias). Um conteúdo deduplicado conta em cada relatório que o usa;
+* total (`totals`): cada blob uma vez, que é o que o disco realmente guarda.
+  As miniaturas ficam de fora (cache com teto próprio, ver thumbnails.py).
+
+Atualização incremental, como a rollup do painel:
+
+* save/delete de um anexo: signals (`record_attachment`);
+* compressão ou nova capa de um vídeo: `blob_resized`, para os relatórios
+  que usam o blob;
+* `bulk.delete_reports` apaga as linhas junto com os relatórios;
+* `bulk_create` (seed) e dados antigos: `rebuild` (manage.py media_usage --rebuild).
+"""
+from collections import defaultdict
+
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Greatest
+
+from .models import ImageAttachment, MediaBlob, ReportMediaUsage, VideoAttachment
+
+REBUILD_BATCH_SIZE = 1000
+
+
+def blob_bytes(blob):
+    return blob.size + blob.derived_size
+
+
+def attachment_bytes(attachment):
+    """Bytes em disco do anexo: o blob com derivados ou, nos anexos anteriores aos blobs, o próprio arquivo."""
+    if attachment.blob_id:
+        return blob_bytes(attachment.blob)
+    try:
+        return default_storage.size(attachment.file.name) if attachment.file else 0
+    except OSError:
+        return 0
+
+
+def record_attachment(attachment, sign):
+    """Soma (sign=1) ou tira (sign=-1) um anexo do uso do relatório dele."""
+    images, videos = (sign, 0) if isinstance(attachment, ImageAttachment) else (0, sign)
+    apply({attachment.report_id: (images, videos, sign * attachment_bytes(attachment))})
+
+
+def apply(deltas):
+    """
+    Soma `deltas` ({report_id: (imagens, vídeos, bytes)}) nas linhas de uso.
+    Só cria a linha que falta quando chega um anexo: um delta negativo sem
+    linha é o relatório sendo apagado (a linha já saiu no CASCADE).
+    """
+    for report_id, (images, videos, size) in deltas.items():
+        if not (images or videos or size):
+            continue
+        changes = {
+            "images": Greatest(F("images") + images, 0),
+            "videos": Greatest(F("videos") + videos, 0),
+            "bytes": Greatest(F("bytes") + size, 0),
+        }
+        if ReportMediaUsage.objects.filter(report_id=report_id).update(**changes):
+            continue
+        if images <= 0 and videos <= 0:
+            continue
+        try:
+            with transaction.atomic():
+                ReportMediaUsage.objects.create(
+                    report_id=report_id, images=max(images, 0), videos=max(videos, 0), bytes=max(size, 0),
+                )
+        except IntegrityError:
+            # Outro anexo do mesmo relatório criou a linha ao mesmo tempo
+            ReportMediaUsage.objects.filter(report_id=report_id).update(**changes)
+
+
+def blob_resized(blob_id, delta):
+    """O blob `blob_id` mudou `delta` bytes (vídeo comprimido, capa nova): ajusta os relatórios que o usam."""
+    if not delta:
+        return
+    deltas = {}
+    for model in (ImageAttachment, VideoAttachment):
+        rows = model.objects.filter(blob_id=blob_id).order_by().values("report_id").annotate(n=Count("id"))
+        for row in rows:
+            images, videos, size = deltas.get(row["report_id"], (0, 0, 0))
+            deltas[row["report_id"]] = (images, videos, size + row["n"] * delta)
+    apply(deltas)
+
+
+def rebuild():
+    """Recalcula o uso de todos os relatórios a partir dos anexos e blobs. Retorna quantas linhas."""
+    usage = defaultdict(lambda: [0, 0, 0])
+    for index, model in enumerate((ImageAttachment, VideoAttachment)):
+        rows = (
+            model.objects.exclude(blob=None).order_by().values("report_id")
+            .annotate(n=Count("id"), size=Sum(F("blob__size") + F("blob__derived_size")))
+        )
+        for row in rows:
+            usage[row["report_id"]][index] += row["n"]
+            usage[row["report_id"]][2] += row["size"] or 0
+        # Anexos anteriores aos blobs: o tamanho vem do próprio arquivo
+        for report_id, name in model.objects.filter(blob=None).values_list("report_id", "file").iterator():
+            usage[report_id][index] += 1
+            try:
+                usage[report_id][2] += default_storage.size(name) if name else 0
+            except OSError:
+                pass
+
+    with transaction.atomic():
+        ReportMediaUsage.objects.all().delete()
+        ReportMediaUsage.objects.bulk_create(
+            [
+                ReportMediaUsage(report_id=report_id, images=images, videos=videos, bytes=size)
+                for report_id, (images, videos, size) in usage.items()
+            ],
+            batch_size=REBUILD_BATCH_SIZE,
+        )
+    return len(usage)
+
+
+def totals():
+    """Uso total: o que os relatórios referenciam e o que o disco guarda de fato (blobs, sem repetição)."""
+    reports = ReportMediaUsage.objects.aggregate(
+        reports=Count("pk"), images=Sum("images"), videos=Sum("videos"), bytes=Sum("bytes"),
+    )
+    blobs = MediaBlob.objects.aggregate(blobs=Count("pk"), bytes=Sum(F("size") + F("derived_size")))
+    return {
+        "reports": reports["reports"],
+        "images": reports["images"] or 0,
+        "videos": reports["videos"] or 0,
+        "referenced_bytes": reports["bytes"] or 0,
+        "blobs": blobs["blobs"],
+        "stored_bytes": blobs["bytes"] or 0,
+    }
+
+
+def top_reports(limit=10):
+    return list(ReportMediaUsage.objects.order_by("-bytes").select_related("report")[:limit])
@@ -0,0 +1,309 @@
+import json
+import logging
+import os
+import struct
+import subprocess
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from . import caching, imaging, metrics, usage
+from .models import MediaBlob, VideoAttachment
+
+logger = logging.getLogger("diagnostics.video")
+
+# O que o <video> do detail.html toca sem conversão
+PLAYABLE_VIDEO_CODECS = {"h264"}
+PLAYABLE_PIX_FMTS = {"yuv420p", "yuvj420p"}
+PLAYABLE_AUDIO_CODECS = {"aac"}
+MP4_EXTENSIONS = {".mp4", ".m4v"}
+
+# Capa e tira de prévias (DIAGNOSTICS_VIDEO_SPRITES)
+POSTER_MAX_SIZE = (1280, 720)
+SPRITE_FRAMES = 10
+SPRITE_FRAME_WIDTH = 160
+PREVIEW_TIMEOUT = 60
+
+
+def max_dimension():
+    return getattr(settings, "DIAGNOSTICS_VIDEO_MAX_DIMENSION", 1280)
+
+
+def max_bitrate():
+    return getattr(settings, "DIAGNOSTICS_VIDEO_MAX_BITRATE", 2_500_000)
+
+
+def probe(path, timeout=None):
+    """Saída JSON do ffprobe (formato + streams), ou None se não der para ler o arquivo."""
+    cmd = [
+        "ffprobe", "-v", "error",
+        "-print_format", "json",
+        "-show_format", "-show_streams",
+        path,
+    ]
+    try:
+        result = subprocess.run(cmd, check=True, timeout=timeout, capture_output=True)
+        return json.loads(result.stdout)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def _first_stream(info, codec_type):
+    return next((s for s in info.get("streams", []) if s.get("codec_type") == codec_type), None)
+
+
+def is_playable(info):
+    """H.264 (4:2:0) + AAC (ou sem áudio): qualquer navegador toca sem conversão."""
+    if not info:
+        return False
+    video = _first_stream(info, "video")
+    audio = _first_stream(info, "audio")
+    return (
+        video is not None
+        and video.get("codec_name") in PLAYABLE_VIDEO_CODECS
+        and video.get("pix_fmt") in PLAYABLE_PIX_FMTS
+        and (audio is None or audio.get("codec_name") in PLAYABLE_AUDIO_CODECS)
+    )
+
+
+def moov_before_mdat(path):
+    """
+    True se o índice (átomo `moov`) vem antes dos dados (`mdat`): o player
+    começa a tocar sem baixar o arquivo todo ("faststart").
+    """
+    try:
+        with open(path, "rb") as fp:
+            while True:
+                header = fp.read(8)
+                if len(header) < 8:
+                    return False
+                size, kind = struct.unpack(">I4s", header)
+                if kind == b"moov":
+                    return True
+                if kind == b"mdat":
+                    return False
+                if size == 1:
+                    size = struct.unpack(">Q", fp.read(8))[0] - 8
+                elif size == 0:
+                    return False
+                fp.seek(size - 8, os.SEEK_CUR)
+    except (OSError, struct.error):
+        return False
+
+
+def plan(path, info):
+    """
+    Decide o que fazer com o vídeo a partir do ffprobe:
+    * keep: já é MP4 tocável, com faststart, dentro do tamanho e bitrate;
+    * remux: streams tocáveis, mas container/ordem dos átomos não — copia
+      os streams para MP4 com +faststart (segundos, sem perda);
+    * transcode: H.264/AAC limitando a resolução a DIAGNOSTICS_VIDEO_MAX_DIMENSION.
+    """
+    if not is_playable(info):
+        return MediaBlob.Decision.TRANSCODE
+
+    video = _first_stream(info, "video")
+    longest = max(int(video.get("width") or 0), int(video.get("height") or 0))
+    bitrate = int(info.get("format", {}).get("bit_rate") or 0)
+    if longest > max_dimension() or bitrate > max_bitrate():
+        return MediaBlob.Decision.TRANSCODE
+
+    ext = os.path.splitext(path)[1].lower()
+    if ext in MP4_EXTENSIONS and moov_before_mdat(path):
+        return MediaBlob.Decision.KEEP
+    return MediaBlob.Decision.REMUX
+
+
+def _run_ffmpeg(args, out_path, timeout=None):
+    """Roda o ffmpeg; remove a saída parcial se ele falhar ou estourar o timeout."""
+    try:
+        subprocess.run(
+            ["ffmpeg", "-y", *args, out_path], check=True, timeout=timeout,
+            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+        )
+    except Exception:
+        if os.path.exists(out_path):
+            os.remove(out_path)
+        raise
+
+
+def remux(in_path, out_path, timeout=None):
+    """Copia os streams (sem recodificar) para MP4 com o `moov` no início."""
+    _run_ffmpeg([
+        "-i", in_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-c", "copy",
+        "-movflags", "+faststart",
+    ], out_path, timeout)
+
+
+def transcode(in_path, out_path, timeout=None, copy_audio=False):
+    """
+    Comprime o vídeo com ffmpeg (H.264 + AAC), com o lado maior limitado a
+    DIAGNOSTICS_VIDEO_MAX_DIMENSION (sem ampliar vídeos menores).
+    """
+    limit = max_dimension()
+    scale = (
+        f"scale=w='if(gte(iw,ih),min({limit},iw),-2)':h='if(gte(iw,ih),-2,min({limit},ih))'"
+    )
+    _run_ffmpeg([
+        "-i", in_path,
+        "-map", "0:v:0", "-map", "0:a:0?",
+        "-vf", scale,
+        "-c:v", "libx264", "-crf", "28", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+        *(["-c:a", "copy"] if copy_audio else ["-c:a", "aac", "-b:a", "96k"]),
+        "-movflags", "+faststart",
+    ], out_path, timeout)
+
+
+def _ffmpeg_jpeg(args, timeout=PREVIEW_TIMEOUT):
+    """Roda o ffmpeg com a saída de uma imagem JPEG no stdout e devolve os bytes."""
+    result = subprocess.run(
+        ["ffmpeg", "-v", "error", *args, "-frames:v", "1", "-f", "image2pipe", "-c:v", "mjpeg", "-"],
+        check=True, timeout=timeout, capture_output=True,
+    )
+    if not result.stdout:
+        raise ValueError("ffmpeg não gerou imagem")
+    return result.stdout
+
+
+def extract_poster(path, duration=None):
+    """Quadro de capa em WEBP: por volta de 1 s (ou 1/3 de vídeos mais curtos), evitando o quadro preto inicial."""
+    at = min(1.0, duration / 3) if duration else 0
+    frame = _ffmpeg_jpeg(["-ss", f"{at:.3f}", "-i", path, "-q:v", "3"])
+    return imaging.encode_webp(frame, max_size=POSTER_MAX_SIZE)
+
+
+def extract_sprite(path, duration, frames=SPRITE_FRAMES):
+    """Tira horizontal com `frames` miniaturas espaçadas ao longo do vídeo, em WEBP."""
+    vf = f"fps={frames}/{duration:.3f},scale={SPRITE_FRAME_WIDTH}:-2,tile={frames}x1"
+    sprite = _ffmpeg_jpeg(["-i", path, "-vf", vf, "-q:v", "5"])
+    return imaging.encode_webp(sprite, max_size=(SPRITE_FRAME_WIDTH * frames, SPRITE_FRAME_WIDTH))
+
+
+def build_previews(path, name, info=None):
+    """
+    Gera a capa (e a tira de prévias, se DIAGNOSTICS_VIDEO_SPRITES) do vídeo
+    `path` e grava ao lado de `name` no storage. Retorna os campos do
+    MediaBlob. Falhas aqui não derrubam o job: o vídeo só fica sem capa.
+    """
+    if info is None:
+        info = probe(path, timeout=PREVIEW_TIMEOUT)
+    duration = float((info or {}).get("format", {}).get("duration") or 0)
+    stem = os.path.splitext(name)[0].removesuffix("-cmp")
+    fields = {}
+
+    try:
+        with metrics.timed("video_poster"):
+            fields["poster"] = _replace(f"{stem}-poster.webp", extract_poster(path, duration))
+    except Exception:
+        logger.warning("capa não gerada para %s", name, exc_info=True)
+
+    if getattr(settings, "DIAGNOSTICS_VIDEO_SPRITES", False) and duration:
+        try:
+            with metrics.timed("video_sprite"):
+                fields["sprite"] = _replace(f"{stem}-sprite.webp", extract_sprite(path, duration))
+            fields["sprite_frames"] = SPRITE_FRAMES
+        except Exception:
+            logger.warning("prévias não geradas para %s", name, exc_info=True)
+    if fields:
+        fields["derived_size"] = sum(default_storage.size(fields[f]) for f in ("poster", "sprite") if f in fields)
+    return fields
+
+
+def _replace(name, data):
+    # Nome fixo (derivado do hash): uma nova tentativa sobrescreve a anterior
+    default_storage.delete(name)
+    return default_storage.save(name, ContentFile(data))
+
+
+def process_video_blob(blob_id):
+    """
+    Job `video_transcode`: decide pelo ffprobe entre manter, remuxar ou
+    comprimir o vídeo de um blob e troca o arquivo de todos os anexos que o
+    usam. Fica sempre o menor arquivo tocável. Se o blob foi liberado nesse
+    meio tempo (nenhum anexo restante), não há o que fazer.
+    """
+    blob = MediaBlob.objects.filter(pk=blob_id, kind=MediaBlob.Kind.VIDEO).first()
+    if blob is None or not blob.file or blob.status == MediaBlob.Status.DONE:
+        return
+
+    _set_status(blob.pk, MediaBlob.Status.PROCESSING)
+
+    timeout = getattr(settings, "DIAGNOSTICS_TRANSCODE_TIMEOUT", 300)
+    in_path = blob.file.path
+    original_size = os.path.getsize(in_path)
+    with metrics.timed("video_probe"):
+        info = probe(in_path, timeout=60)
+    decision = plan(in_path, info)
+
+    final_path = in_path
+    if decision != MediaBlob.Decision.KEEP:
+        base, _ext = os.path.splitext(os.path.basename(in_path))
+        out_path = os.path.join(os.path.dirname(in_path), f"{base}-cmp.mp4")
+        try:
+            with metrics.timed(f"video_{decision}"):
+                if decision == MediaBlob.Decision.REMUX:
+                    remux(in_path, out_path, timeout=timeout)
+                else:
+                    audio = _first_stream(info or {}, "audio")
+                    copy_audio = audio is not None and audio.get("codec_name") in PLAYABLE_AUDIO_CODECS
+                    transcode(in_path, out_path, timeout=timeout, copy_audio=copy_audio)
+        except Exception:
+            # Volta para a fila; a fila decide se tenta de novo ou marca como falha
+            _set_status(blob.pk, MediaBlob.Status.PENDING)
+            raise
+
+        if (
+            decision == MediaBlob.Decision.TRANSCODE
+            and is_playable(info)
+            and os.path.getsize(out_path) >= original_size
+        ):
+            # A compressão não compensou e o original já toca: fica o original
+            os.remove(out_path)
+            decision = MediaBlob.Decision.KEEP
+        else:
+            final_path = out_path
+
+    # O resultado já está no MEDIA_ROOT, ao lado do original: só troca o nome
+    new_name = f"{os.path.dirname(blob.file.name)}/{os.path.basename(final_path)}"
+    final_size = os.path.getsize(final_path)
+    result = {"decision": decision, "bytes_saved": original_size - final_size}
+    previews = build_previews(final_path, new_name, info if final_path == in_path else None)
+    updated = MediaBlob.objects.filter(pk=blob.pk).update(file=new_name, size=final_size, **result, **previews)
+    if not updated:
+        # Último anexo apagado durante a compressão
+        if final_path != in_path:
+            os.remove(final_path)
+        for field in ("poster", "sprite"):
+            if previews.get(field):
+                default_storage.delete(previews[field])
+        return
+    _set_status(blob.pk, MediaBlob.Status.DONE, file=new_name, processed_at=timezone.now(), **result)
+    usage.blob_resized(
+        blob.pk, final_size + previews.get("derived_size", blob.derived_size) - usage.blob_bytes(blob),
+    )
+
+    if final_path != in_path:
+        try:
+            if os.path.exists(in_path):
+                os.remove(in_path)
+        except OSError:
+            pass
+
+
+def mark_blob_failed(blob_id):
+    """Sem mais tentativas: mantém o original e sinaliza a falha em todos os anexos do blob."""
+    _set_status(blob_id, MediaBlob.Status.FAILED)
+
+
+def _set_status(blob_id, status, **fields):
+    """Atualiza o blob e os anexos que apontam para ele, invalidando as páginas dos relatórios."""
+    MediaBlob.objects.filter(pk=blob_id).update(status=status)
+    attachments = VideoAttachment.objects.filter(blob_id=blob_id)
+    report_ids = set(attachments.values_list("report_id", flat=True))
+    attachments.update(status=status, **fields)
+    for report_id in report_ids:
+        caching.touch_report(report_id)
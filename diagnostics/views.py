@@ -1,10 +1,29 @@
-from django.shortcuts import render, redirect, get_object_or_404
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.shortcuts import aget_object_or_404, get_object_or_404, redirect, render
 from django.core.paginator import Paginator
-from django.utils.timezone import make_aware
-from datetime import datetime, time
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden,
+    JsonResponse, StreamingHttpResponse,
+)
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods, require_POST, require_safe
+from django.db import DatabaseError, connection
+from django.utils import timezone
+from django.urls import reverse
+from django.utils.crypto import constant_time_compare
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date
+
+from .models import DiagnosticReport, ImageAttachment, VideoAttachment, image_options
+from .forms import DashboardForm, DiagnosticReportForm, DiagnosticFilterForm, ImageUploadForm, VideoUploadForm
+from . import caching, export, imaging, ingest, media, metrics, pagination, queries, resumable, rollups, streaming, thumbnails, units
 
-from .models import DiagnosticReport, ImageAttachment, VideoAttachment
-from .forms import DiagnosticReportForm, DiagnosticFilterForm, ImageUploadForm, VideoUploadForm
+# Tamanho "cheio" de image_thumbnail: a variante gravada, sem redução
+FULL_SIZE = "full"
 
 
 def create_report(request):
@@ -13,83 +32,406 @@ def create_report(request):
         if form.is_valid():
             report = form.save()
 
-            # Salva imagens, se houver
-            for f in request.FILES.getlist("images"):
-                ImageAttachment.objects.create(report=report, file=f)
+            with caching.deferred_touches():
+                # Salva imagens, se houver
+                ImageAttachment.create_batch(report, request.FILES.getlist("images"))
 
-            # Salva vídeos, se houver (valida tamanho via model validator)
-            for f in request.FILES.getlist("videos"):
-                va = VideoAttachment(report=report, file=f)
-                va.full_clean()
-                va.save()
+                # Salva vídeos, se houver (valida tamanho via model validator)
+                for f in request.FILES.getlist("videos"):
+                    va = VideoAttachment(report=report, file=f)
+                    va.full_clean()
+                    va.save()
+
+                # Vídeos já recebidos pelo upload retomável (ver resumable.py)
+                resumable.finish(report, request.POST.getlist("video_uploads"))
 
             return redirect("diagnostics:detail", pk=report.pk)
     else:
         form = DiagnosticReportForm()
 
-    return render(request, "diagnostics/form.html", {"form": form})
+    return render(request, "diagnostics/form.html", {
+        "form": form,
+        # Se o form voltar com erro, os vídeos já enviados não precisam subir de novo
+        "video_uploads": request.POST.getlist("video_uploads"),
+        "video_max_mb": resumable.max_video_upload_mb(),
+        "upload_chunk_bytes": resumable.chunk_max_bytes(),
+    })
 
 
-def report_detail(request, pk):
-    report = get_object_or_404(DiagnosticReport, pk=pk)
-    img_form = ImageUploadForm()
-    vid_form = VideoUploadForm()
+async def report_detail(request, pk):
+    """
+    View assíncrona: sob ASGI, a espera pelo banco e o trabalho com os
+    uploads (Pillow, storage) rodam em threads/processos, fora do event loop.
+    """
+    report = await aget_object_or_404(DiagnosticReport, pk=pk)
+    if request.method in ("GET", "HEAD"):
+        not_modified = caching.conditional_report_response(request, report)
+        if not_modified is not None:
+            return not_modified
 
-    if request.method == "POST":
-        if "images" in request.FILES:
-            img_form = ImageUploadForm(request.POST, request.FILES)
-            if img_form.is_valid():
-                for f in request.FILES.getlist("images"):
-                    ImageAttachment.objects.create(report=report, file=f)
-            return redirect("diagnostics:detail", pk=pk)
-
-        if "videos" in request.FILES:
-            vid_form = VideoUploadForm(request.POST, request.FILES)
-            if vid_form.is_valid():
+    if request.method == "POST" and await sync_to_async(_save_uploads)(request, report):
+        return redirect("diagnostics:detail", pk=pk)
+
+    # Anexos lazy: se o fragmento {% cache %} acertar, nem são buscados
+    response = await sync_to_async(render)(request, "diagnostics/detail.html", {
+        "report": report,
+        "media": queries.ReportMedia(report),
+        "img_form": ImageUploadForm(),
+        "vid_form": VideoUploadForm(),
+        "cache_seconds": caching.page_cache_seconds(),
+    })
+    return caching.set_report_validators(response, report)
+
+
+def _save_uploads(request, report):
+    """
+    Anexa as imagens/vídeos enviados no detalhe. Retorna True se o POST
+    trouxe arquivos (a view redireciona de volta para o detalhe).
+    """
+    if "images" in request.FILES:
+        img_form = ImageUploadForm(request.POST, request.FILES)
+        if img_form.is_valid():
+            ImageAttachment.create_batch(report, request.FILES.getlist("images"))
+        return True
+
+    if "videos" in request.FILES:
+        vid_form = VideoUploadForm(request.POST, request.FILES)
+        if vid_form.is_valid():
+            with caching.deferred_touches():
                 for f in request.FILES.getlist("videos"):
                     va = VideoAttachment(report=report, file=f)
                     va.full_clean()
                     va.save()
-            return redirect("diagnostics:detail", pk=pk)
+        return True
 
-    images = report.images.all()
-    videos = report.videos.all()
-
-    return render(request, "diagnostics/detail.html", {
-        "report": report,
-        "images": images,
-        "videos": videos,
-        "img_form": img_form,
-        "vid_form": vid_form,
-    })
+    return False
 
 
-def list_reports(request):
+@caching.cache_list_page
+async def list_reports(request):
     qs = DiagnosticReport.objects.all()
     form = DiagnosticFilterForm(request.GET or None)
+    order_by = "-created_at"
 
     if form.is_valid():
-        q = form.cleaned_data.get("q")
-        category = form.cleaned_data.get("category")
-        start_date = form.cleaned_data.get("start_date")
-        end_date = form.cleaned_data.get("end_date")
-        order_by = form.cleaned_data.get("order_by") or "-created_at"
-
-        if q:
-            qs = qs.filter(title__icontains=q)
-        if category:
-            qs = qs.filter(category=category)
-        if start_date:
-            start_dt = make_aware(datetime.combine(start_date, time.min))
-            qs = qs.filter(created_at__gte=start_dt)
-        if end_date:
-            end_dt = make_aware(datetime.combine(end_date, time.max))
-            qs = qs.filter(created_at__lte=end_dt)
-
-        qs = qs.order_by(order_by)
-
-    paginator = Paginator(qs, 10)
-    page = request.GET.get("page", 1)
-    page_obj = paginator.get_page(page)
-
-    return render(request, "diagnostics/list.html", {"form": form, "page_obj": page_obj})
+        qs, order_by = form.filter_queryset(qs)
+
+    # Querystring dos filtros, sem o estado da paginação (para montar os links)
+    params = request.GET.copy()
+    for key in ("page", "cursor"):
+        params.pop(key, None)
+    filter_params = {k: v for k, v in params.items() if k != "order_by"}
+
+    total_count = await pagination.afiltered_count(qs, filter_params)
+    context = {
+        "form": form,
+        "query_string": params.urlencode(),
+        "total_count": total_count,
+    }
+
+    # A contagem usa o queryset só com os filtros; a página, a projeção dos cartões
+    rows = queries.report_rows(qs)
+    if order_by in pagination.KEYSET_ORDERINGS:
+        context["page_obj"] = await pagination.apaginate(rows, order_by, request.GET.get("cursor"), per_page=10)
+    else:
+        # Relevância não tem chave estável: mantém paginação por página
+        rows = rows.order_by("-search_rank", "-created_at")
+        context["page_obj"] = await sync_to_async(_numbered_page)(rows, request.GET.get("page", 1), count=total_count)
+
+    return await sync_to_async(render)(request, "diagnostics/list.html", context)
+
+
+def _numbered_page(qs, number, per_page=10, count=None):
+    """Página `number` de `qs`. Com `count` (o total já calculado para o resumo), o Paginator não conta de novo."""
+    paginator = Paginator(qs, per_page)
+    if count is not None:
+        paginator.count = count
+    page = paginator.get_page(number)
+    page.object_list = list(page.object_list)
+    return page
+
+
+def _dashboard_data(form):
+    start, end, su = form.cleaned_data["start_date"], form.cleaned_data["end_date"], form.cleaned_data["su"]
+    return {
+        "start_date": start,
+        "end_date": end,
+        "su": su,
+        "totals": rollups.totals(start, end, su),
+        "daily": rollups.daily(start, end, su),
+        "by_su": [] if su else rollups.by_su(start, end),
+    }
+
+
+@require_GET
+def dashboard(request):
+    """
+    Relatórios críticos x normais por dia e por SU. Lê só a ReportDailyRollup:
+    o custo depende do período, não do tamanho de DiagnosticReport.
+    """
+    form = DashboardForm(request.GET)
+    data = _dashboard_data(form) if form.is_valid() else None
+    if data:
+        peak = max((d["total"] for d in data["daily"]), default=0) or 1
+        for d in data["daily"]:
+            d["critica_pct"] = round(d["critica"] * 100 / peak)
+            d["normal_pct"] = round(d["normal"] * 100 / peak)
+    return render(request, "diagnostics/dashboard.html", {"form": form, "data": data})
+
+
+@require_GET
+def dashboard_api(request):
+    """Os mesmos dados do painel em JSON (`?start_date=&end_date=&su=`)."""
+    form = DashboardForm(request.GET)
+    if not form.is_valid():
+        return JsonResponse({"errors": form.errors.get_json_data()}, status=400)
+    data = _dashboard_data(form)
+    return JsonResponse({
+        "start_date": data["start_date"].isoformat(),
+        "end_date": data["end_date"].isoformat(),
+        "su": data["su"] or None,
+        "totals": data["totals"],
+        "daily": [{**d, "day": d["day"].isoformat()} for d in data["daily"]],
+        "by_su": data["by_su"],
+    })
+
+
+@require_GET
+def su_summary(request):
+    """
+    Situação atual de cada SU (último relatório + totais). Vem do resumo em
+    cache (units.summary): uma query agrupada por escrita, não por request.
+    `?su=` filtra como na busca (exato ou prefixo com *); `?category=` pela
+    categoria do último relatório.
+    """
+    su = request.GET.get("su", "").strip()
+    category = request.GET.get("category", "")
+    rows = units.summary()
+    if su.endswith(units.PREFIX_WILDCARD):
+        rows = [r for r in rows if r["su_identifier"].startswith(su.rstrip(units.PREFIX_WILDCARD))]
+    elif su:
+        rows = [r for r in rows if r["su_identifier"] == su]
+    if category:
+        rows = [r for r in rows if r["category"] == category]
+    return render(request, "diagnostics/su_summary.html", {
+        "rows": rows,
+        "su": su,
+        "category": category,
+        "categories": DiagnosticReport.Category.choices,
+    })
+
+
+@require_GET
+def su_timeline(request, su):
+    """Relatórios de uma SU, do mais recente ao mais antigo, paginados por cursor (índice por SU)."""
+    status = units.summary_for(su)
+    if status is None:
+        raise Http404("SU sem relatórios")
+    qs = queries.report_rows(DiagnosticReport.objects.filter(su_identifier=su))
+    return render(request, "diagnostics/su_timeline.html", {
+        "su": su,
+        "status": status,
+        "page_obj": pagination.paginate(qs, "-created_at", request.GET.get("cursor"), per_page=20),
+    })
+
+
+@staff_member_required
+@require_GET
+def export_reports(request):
+    """
+    Exporta os relatórios com os mesmos filtros da busca (`?format=csv|jsonl`,
+    `&media=1` para incluir contagens e URLs dos anexos). A resposta é gerada
+    em streaming, sem carregar o resultado inteiro na memória.
+    """
+    fmt = request.GET.get("format", "csv")
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest("Formato inválido (use csv ou jsonl).")
+
+    form = DiagnosticFilterForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest("Filtros inválidos.")
+    qs, order_by = form.filter_queryset(DiagnosticReport.objects.all())
+    qs = export.apply_ordering(qs, order_by)
+
+    lines = export.export_lines(
+        qs, fmt,
+        include_media=request.GET.get("media") in ("1", "true"),
+        build_url=request.build_absolute_uri,
+    )
+    content_type = "text/csv; charset=utf-8" if fmt == "csv" else "application/x-ndjson; charset=utf-8"
+    response = StreamingHttpResponse(streaming.lines(request, lines), content_type=content_type)
+    filename = f"diagnosticos-{timezone.localtime():%Y%m%d-%H%M}.{fmt}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def ingest_reports(request):
+    """
+    API de ingestão em lote para as SUs/scripts de monitoramento.
+
+    POST JSON (`[...]` ou `{"reports": [...]}`), opcionalmente com
+    `Content-Encoding: gzip`, autenticado com
+    `Authorization: Bearer <token>` (DIAGNOSTICS_INGEST_TOKENS).
+    Responde com o resultado de cada item, na ordem enviada.
+    """
+    tokens = [t for t in getattr(settings, "DIAGNOSTICS_INGEST_TOKENS", []) if t]
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    if not any(constant_time_compare(auth, f"Bearer {t}") for t in tokens):
+        return JsonResponse({"error": "token inválido"}, status=401)
+
+    max_bytes = getattr(settings, "DIAGNOSTICS_INGEST_MAX_BYTES", 10 * 1024 * 1024)
+    try:
+        items = ingest.decode_body(
+            ingest.read_body(request, max_bytes),
+            request.META.get("HTTP_CONTENT_ENCODING", ""),
+            max_bytes=max_bytes,
+        )
+    except ingest.PayloadError as exc:
+        return JsonResponse({"error": str(exc)}, status=exc.status)
+
+    max_items = getattr(settings, "DIAGNOSTICS_INGEST_MAX_ITEMS", 1000)
+    if len(items) > max_items:
+        return JsonResponse({"error": f"máximo de {max_items} relatórios por lote"}, status=413)
+
+    results = ingest.ingest_batch(items)
+    created = sum(1 for r in results if r["status"] == "created")
+    return JsonResponse({
+        "created": created,
+        "failed": len(results) - created,
+        "results": results,
+    })
+
+
+@require_POST
+def upload_create(request):
+    """
+    Abre um upload retomável de vídeo (JSON `filename`, `size`,
+    `content_type`). Responde 201 com o id e a URL dos pedaços.
+    """
+    try:
+        meta = json.loads(request.body or b"{}")
+        if not isinstance(meta, dict):
+            raise ValueError
+    except ValueError:
+        return JsonResponse({"error": "JSON inválido"}, status=400)
+    try:
+        session = resumable.create_session(meta.get("filename"), meta.get("size"), meta.get("content_type"))
+    except resumable.UploadError as exc:
+        return JsonResponse({"error": str(exc)}, status=exc.status)
+
+    location = reverse("diagnostics:upload", args=[session.pk])
+    response = JsonResponse({
+        "id": str(session.pk),
+        "url": location,
+        "offset": 0,
+        "chunk_size": resumable.chunk_max_bytes(),
+        "expires_at": session.expires_at.isoformat(),
+    }, status=201)
+    response["Location"] = location
+    return response
+
+
+@require_http_methods(["HEAD", "PATCH", "DELETE"])
+def upload_chunk(request, upload_id):
+    """
+    HEAD: quanto já foi recebido (`Upload-Offset`). PATCH: próximo pedaço,
+    a partir de `Upload-Offset`. DELETE: desiste do upload.
+    """
+    session = resumable.active_sessions().filter(pk=upload_id).first()
+    if session is None:
+        return JsonResponse({"error": "upload inexistente ou expirado"}, status=404)
+
+    if request.method == "DELETE":
+        session.delete()
+        return HttpResponse(status=204)
+
+    if request.method == "PATCH":
+        try:
+            offset = int(request.headers.get("Upload-Offset", ""))
+            length = int(request.META.get("CONTENT_LENGTH") or "")
+        except ValueError:
+            return JsonResponse({"error": "Upload-Offset e Content-Length são obrigatórios"}, status=400)
+        try:
+            resumable.append_chunk(session, offset, request, length)
+        except resumable.UploadError as exc:
+            response = JsonResponse({"error": str(exc)}, status=exc.status)
+            if exc.offset is not None:
+                response["Upload-Offset"] = str(exc.offset)
+            return response
+
+    response = HttpResponse(status=200 if request.method == "HEAD" else 204)
+    response["Upload-Offset"] = str(session.offset)
+    response["Upload-Length"] = str(session.size)
+    response["Upload-Expires"] = http_date(session.expires_at.timestamp())
+    response["Cache-Control"] = "no-store"
+    return response
+
+
+@require_safe
+def image_thumbnail(request, pk, size):
+    """
+    Serve uma imagem no formato que o navegador aceita (AVIF, WEBP ou JPEG,
+    pelo `Accept`, com `Vary: Accept`): `size` = "full" entrega a variante
+    gravada na ingestão; sm/md/lg, o derivado reduzido (gerado na primeira
+    vez e guardado no cache em disco). Se o original não puder ser lido
+    pelo Pillow, redireciona para ele.
+    """
+    if size != FULL_SIZE and size not in thumbnails.SIZES:
+        raise Http404("Tamanho inválido.")
+    img = get_object_or_404(ImageAttachment.objects.select_related("blob"), pk=pk)
+
+    if size == FULL_SIZE:
+        variants = _image_variants(img)
+        fmt = media.negotiate_image(request, list(variants))
+        if fmt is None:
+            return redirect(img.file.url)
+        response = media.serve(request, variants[fmt])
+    else:
+        fmt = media.negotiate_image(request, imaging.supported_formats(image_options()["formats"]))
+        try:
+            fp = thumbnails.open_thumbnail(img, size, fmt)
+        except Exception:
+            return redirect(img.file.url)
+        response = FileResponse(fp, content_type=imaging.CONTENT_TYPES[fmt])
+        # O anexo nunca troca de arquivo depois de criado
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+    patch_vary_headers(response, ["Accept"])
+    return response
+
+
+def _image_variants(img):
+    """{formato: nome no storage} das variantes gravadas da imagem (anexos antigos: só o WEBP, se for um)."""
+    if img.blob_id:
+        return {fmt: img.blob.variant(fmt) for fmt in imaging.FORMATS if img.blob.variant(fmt)}
+    return {"webp": img.file.name} if img.file.name.endswith(".webp") else {}
+
+
+@require_GET
+def metrics_view(request):
+    """
+    Métricas no formato texto do Prometheus. Acesso com
+    `Authorization: Bearer <DIAGNOSTICS_METRICS_TOKEN>` ou usuário staff.
+    """
+    token = getattr(settings, "DIAGNOSTICS_METRICS_TOKEN", "")
+    auth = request.META.get("HTTP_AUTHORIZATION", "")
+    authorized = bool(token) and constant_time_compare(auth, f"Bearer {token}")
+    if not (authorized or request.user.is_staff):
+        return HttpResponseForbidden("Acesso negado.")
+
+    return HttpResponse(metrics.render_latest(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@require_safe
+def healthz(request):
+    """
+    Health check do Render (`healthCheckPath`): responde 200 só se o banco
+    atende a um `SELECT 1`. Sem template, sessão nem cache.
+    """
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except DatabaseError:
+        return HttpResponse("db unavailable", status=503, content_type="text/plain")
+    return HttpResponse("ok", content_type="text/plain")
@@ -3,4 +3,16 @@ set -e
 
 python manage.py migrate --noinput
 
-exec gunicorn app.wsgi:application --bind 0.0.0.0:8000 --log-file -
+# Worker da fila de mídia (compressão de vídeos) no mesmo container,
+# pois compartilha o MEDIA_ROOT com o web.
+if [ "${RUN_JOB_WORKER:-true}" = "true" ]; then
+  python manage.py process_jobs &
+fi
+
+# Workers, threads, preload e timeouts: app/gunicorn_conf.py (variáveis GUNICORN_*)
+# SERVER_MODE=asgi: views assíncronas servidas por workers uvicorn
+if [ "${SERVER_MODE:-wsgi}" = "asgi" ]; then
+  exec gunicorn app.asgi:application -c python:app.gunicorn_conf -k uvicorn_worker.UvicornWorker
+fi
+
+exec gunicorn app.wsgi:application -c python:app.gunicorn_conf
@@ -0,0 +1,13 @@
+/** Tailwind v3 (mesma versão do antigo CDN). O CSS final só tem as classes
+ * encontradas em `content` — inclusive as usadas nos <script> dos templates. */
+module.exports = {
+  content: [
+    "./templates/**/*.html",
+    "./*/templates/**/*.html",
+    "./diagnostics/templatetags/*.py",
+  ],
+  theme: {
+    extend: {},
+  },
+  plugins: [],
+};